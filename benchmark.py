@@ -0,0 +1,886 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+數據處理效能基準測試
+比較各處理步驟在放大後的數據上的執行時間
+"""
+
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from get_json_data import build_symbol_urls, fetch_many
+from json_to_dataframe import load_json_data
+from labels import forward_labels, label_columns
+from merge_financial_data import (AVAILABLE_TABLES, DAILY_TABLES_AVAILABLE, align_daily_table,
+                                  combine_aligned_columns, get_quarter_date_range, merge_quarterly_data_asof,
+                                  merge_quarterly_data_to_historical)
+from section_schema import SECTION_SCHEMAS, TECH_WINDOWS, build_section_frame
+from sequences import iter_sequences, open_sequence_shards, write_sequence_shards
+from splits import walk_forward_splits
+from table_io import FORMAT_EXTENSIONS, load_table, save_table
+from chunked_merge import merge_chunked
+from incremental import update_symbol
+from indicator_state import update_indicators
+from indicators import TECH_INDICATORS, block_columns, compute_tech_block, compute_tech_tables
+from universe import convert_universe, merge_universe, read_symbol_partitions, run_universe_parallel
+
+def time_call(func, repeat=3):
+    """執行 func repeat 次，回傳最短耗時（秒）與最後一次的結果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def legacy_row_builder(records, schema, constants=None):
+    """舊版逐筆建立 row 字典再轉為 DataFrame 的作法（作為比較基準）"""
+    constants = constants or schema.get('constants', {})
+    df_data = []
+    for record in records:
+        row = {}
+        for source, name, _ in schema['columns']:
+            row[name] = constants.get(name) if source is None else record.get(source)
+        df_data.append(row)
+    df = pd.DataFrame(df_data)
+    df['date'] = pd.to_datetime(df['date'])
+    return df.sort_values('date', ascending=schema['ascending']).reset_index(drop=True)
+
+def benchmark_conversion(json_file_path='output_data.json', scale=50, repeat=3):
+    """
+    比較逐筆 row 字典與欄位定義（欄式）兩種轉換方式的吞吐量
+
+    Args:
+        json_file_path (str): JSON 檔案路徑
+        scale (int): 將每個區段的記錄重複的倍數，用來模擬多年、多股票的數據量
+        repeat (int): 每種方式的重複執行次數（取最短耗時）
+    """
+    data = load_json_data(json_file_path)
+    print(f"=== JSON 轉 DataFrame 吞吐量（記錄放大 {scale} 倍）===")
+
+    for key, schema in SECTION_SCHEMAS.items():
+        if key == 'historicalPriceFull':
+            records = data[key]['historical'] * scale
+            constants = {'symbol': data[key].get('symbol')}
+        else:
+            records = data.get(key, []) * scale
+            constants = None
+        if not records:
+            continue
+
+        legacy_time, _ = time_call(lambda: legacy_row_builder(records, schema, constants), repeat)
+        schema_time, _ = time_call(lambda: build_section_frame(records, schema, constants), repeat)
+
+        print(f"{key:<28} 記錄數 {len(records):>8,} | 逐筆: {len(records) / legacy_time:>12,.0f} 筆/秒 "
+              f"| 欄式: {len(records) / schema_time:>12,.0f} 筆/秒 | 加速 {legacy_time / schema_time:.2f}x")
+
+def start_mock_server(latency=0.05, failure_rate=0.1, payload_size=1000):
+    """
+    啟動本機模擬資料伺服器（背景執行緒），每個請求延遲 latency 秒，並以 failure_rate 機率回傳 503
+
+    Returns:
+        ThreadingHTTPServer: 伺服器物件，使用完畢後呼叫 shutdown()
+    """
+    body = json.dumps({'historical': [{'close': float(i)} for i in range(payload_size)]}).encode('utf-8')
+
+    class MockHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            if random.random() < failure_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    class MockServer(ThreadingHTTPServer):
+        # 預設的 listen backlog 只有 5，高併發時會造成連線重送延遲
+        request_queue_size = 128
+
+    server = MockServer(('127.0.0.1', 0), MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def benchmark_batch_fetch(symbol_count=64, latency=0.05, failure_rate=0.1, worker_counts=(1, 4, 16)):
+    """
+    以本機模擬伺服器（注入延遲與失敗）測試批次下載在不同執行緒數下的擴展性
+
+    Args:
+        symbol_count (int): 模擬的股票數量
+        latency (float): 每個請求的注入延遲秒數
+        failure_rate (float): 回傳 503 的機率（會觸發重試）
+        worker_counts (tuple): 要比較的執行緒池大小
+    """
+    server = start_mock_server(latency, failure_rate)
+    try:
+        symbols = [f"{1101 + i}.TW" for i in range(symbol_count)]
+        urls = build_symbol_urls(f"http://127.0.0.1:{server.server_port}/{{symbol}}.json", symbols)
+        print(f"=== 批次下載擴展性（{symbol_count} 檔、延遲 {latency}s、失敗率 {failure_rate:.0%}）===")
+        for workers in worker_counts:
+            start = time.perf_counter()
+            results = fetch_many(urls, max_workers=workers, per_host_limit=workers,
+                                 backoff=0.01, max_backoff=0.1, verbose=False)
+            elapsed = time.perf_counter() - start
+            succeeded = sum(1 for r in results.values() if r['error'] is None)
+            latencies = sorted(r['latency'] for r in results.values())
+            print(f"執行緒 {workers:>3}: 耗時 {elapsed:6.2f}s | {symbol_count / elapsed:7.1f} 個/秒 | "
+                  f"成功 {succeeded}/{symbol_count} | 延遲中位數 {latencies[len(latencies) // 2]:.3f}s")
+    finally:
+        server.shutdown()
+
+def path_size(path):
+    """檔案或目錄（npcol）的總位元組數"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+def benchmark_table_formats(data_dir='data', scale=20, repeat=3):
+    """
+    比較各輸出格式的檔案大小與讀取延遲（以 data/ 中的表格放大 scale 倍）
+
+    Args:
+        data_dir (str): 基礎表格所在目錄
+        scale (int): 將每個表格的列數重複的倍數
+        repeat (int): 每種格式的重複讀取次數（取最短耗時）
+    """
+    frames = {os.path.splitext(os.path.basename(path))[0]: load_table(path)
+              for path in sorted(glob.glob(os.path.join(data_dir, '*.csv')))}
+    frames = {name: pd.concat([df] * scale, ignore_index=True) for name, df in frames.items()}
+    total_rows = sum(len(df) for df in frames.values())
+    print(f"=== 輸出格式比較（{len(frames)} 個表格，共 {total_rows:,} 列）===")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in FORMAT_EXTENSIONS:
+            try:
+                start = time.perf_counter()
+                paths = [save_table(df, os.path.join(tmp_dir, fmt, name), fmt) for name, df in frames.items()]
+                write_time = time.perf_counter() - start
+            except ImportError as e:
+                print(f"{fmt:<8} 略過: {e}")
+                continue
+            size = sum(path_size(path) for path in paths)
+            read_time, _ = time_call(lambda: [load_table(path) for path in paths], repeat)
+            print(f"{fmt:<8} 大小 {size / 1024 / 1024:8.2f} MB | 寫入 {write_time:6.3f}s | 讀取 {read_time:6.3f}s")
+
+def legacy_quarterly_merge(historical_df, quarterly_df, quarterly_name):
+    """舊版逐列、逐季度以 iterrows 比對日期範圍並逐格寫入的季度合併（作為比較基準）"""
+    print(f"正在合併 {quarterly_name} 數據...")
+    
+    # 獲取季度數據的所有列（除了date和symbol）
+    quarterly_cols = [col for col in quarterly_df.columns if col not in ['date', 'symbol']]
+    
+    # 批量添加新列，避免逐一添加導致的性能問題
+    new_cols = [col for col in quarterly_cols if col not in historical_df.columns]
+    if new_cols:
+        # 創建包含新列的DataFrame並一次性合併
+        new_cols_df = pd.DataFrame(index=historical_df.index, columns=new_cols)
+        new_cols_df[:] = np.nan
+        historical_df = pd.concat([historical_df, new_cols_df], axis=1)
+    
+    # 按symbol分組處理
+    for symbol in historical_df['symbol'].unique():
+        if symbol not in quarterly_df['symbol'].values:
+            continue
+            
+        print(f"  處理股票 {symbol} 的 {quarterly_name} 數據...")
+        
+        # 獲取該股票的歷史數據和季度數據
+        hist_symbol_idx = historical_df['symbol'] == symbol
+        quarterly_symbol = quarterly_df[quarterly_df['symbol'] == symbol].copy()
+        
+        # 為每一行歷史數據找到對應的季度數據
+        for idx in historical_df[hist_symbol_idx].index:
+            hist_date = historical_df.loc[idx, 'date']
+            
+            # 找到包含這個日期的季度數據
+            for _, quarterly_row in quarterly_symbol.iterrows():
+                year = quarterly_row['calendarYear']
+                quarter = quarterly_row['period']
+                
+                # 計算該季度的日期範圍
+                try:
+                    quarter_start, quarter_end = get_quarter_date_range(year, quarter)
+                    
+                    # 檢查歷史日期是否在該季度範圍內
+                    if quarter_start <= hist_date <= quarter_end:
+                        # 將季度數據複製到結果DataFrame
+                        for col in quarterly_cols:
+                            historical_df.loc[idx, col] = quarterly_row[col]
+                        break
+                        
+                except ValueError as e:
+                    print(f"    警告: {e} - 跳過該記錄")
+                    continue
+    
+    return historical_df
+
+def make_multi_symbol_data(symbol_count, years, seed=0):
+    """
+    產生多股票、多年度的模擬數據: 每檔股票每個營業日一列歷史價格，每季一筆季度數據
+
+    Returns:
+        tuple: (historical_df, quarterly_df)
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-31', periods=years * 252)
+    symbols = [f"{1101 + i}.TW" for i in range(symbol_count)]
+
+    historical_df = pd.DataFrame({
+        'date': np.tile(dates, symbol_count),
+        'symbol': np.repeat(symbols, len(dates)),
+        'close': rng.normal(100, 10, symbol_count * len(dates)),
+    })
+
+    quarters = pd.period_range(dates[0], dates[-1], freq='Q')[::-1]
+    quarterly_df = pd.DataFrame({
+        'date': np.tile((quarters.end_time + pd.Timedelta(days=30)).normalize(), symbol_count),
+        'symbol': np.repeat(symbols, len(quarters)),
+        'calendarYear': np.tile(quarters.year, symbol_count),
+        'period': np.tile([f"Q{q}" for q in quarters.quarter], symbol_count),
+    })
+    for i in range(20):
+        quarterly_df[f"metric{i}"] = rng.normal(0, 1, len(quarterly_df))
+    return historical_df, quarterly_df
+
+def benchmark_quarterly_merge(sizes=((2, 2), (10, 10), (50, 20)), legacy_limit=5000, repeat=3):
+    """
+    比較舊版逐列季度合併與向量化季度鍵合併的耗時，並確認兩者結果一致
+
+    Args:
+        sizes (tuple): (股票數, 年數) 組合
+        legacy_limit (int): 歷史數據列數超過此值時略過舊版（耗時過長）
+        repeat (int): 向量化版本的重複執行次數（取最短耗時）
+    """
+    print("=== 季度數據合併（逐列 vs 向量化）===")
+    for symbol_count, years in sizes:
+        historical_df, quarterly_df = make_multi_symbol_data(symbol_count, years)
+        with contextlib.redirect_stdout(io.StringIO()):
+            fast_time, result = time_call(
+                lambda: merge_quarterly_data_to_historical(historical_df, quarterly_df, 'bench'), repeat)
+            asof_time, _ = time_call(
+                lambda: merge_quarterly_data_asof(historical_df, quarterly_df, 'bench', max_staleness=120), repeat)
+            if len(historical_df) <= legacy_limit:
+                legacy_time, expected = time_call(
+                    lambda: legacy_quarterly_merge(historical_df, quarterly_df, 'bench'), 1)
+            else:
+                legacy_time = expected = None
+
+        label = f"{symbol_count} 檔 x {years} 年 ({len(historical_df):,} 列)"
+        if expected is None:
+            print(f"{label:<28} 逐列: {'略過':>9} | 向量化: {fast_time:8.3f}s | as-of: {asof_time:8.3f}s")
+            continue
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        print(f"{label:<28} 逐列: {legacy_time:8.2f}s | 向量化: {fast_time:8.3f}s | as-of: {asof_time:8.3f}s "
+              f"| 加速 {legacy_time / fast_time:,.0f}x")
+
+def legacy_daily_merge(historical_df, daily_df):
+    """舊版每個日資料表各自 set_index / join / reset_index 整個寬表的合併方式（作為比較基準）"""
+    result_df = historical_df.set_index(['date', 'symbol']).join(daily_df.set_index(['date', 'symbol']), how='left')
+    return result_df.reset_index()
+
+def benchmark_multi_table_merge(symbol_count=50, years=10, table_count=4, columns_per_table=14):
+    """
+    比較逐表 join（每次複製整個寬表）與一次對齊合併的耗時與記憶體峰值
+
+    Args:
+        symbol_count (int): 模擬的股票數量
+        years (int): 每檔股票的年數
+        table_count (int): 日資料表格數量
+        columns_per_table (int): 每個日資料表格的欄位數
+    """
+    historical_df, _ = make_multi_symbol_data(symbol_count, years)
+    rng = np.random.default_rng(1)
+    daily_tables = []
+    for t in range(table_count):
+        daily_df = historical_df[['date', 'symbol']].copy()
+        for c in range(columns_per_table):
+            daily_df[f"t{t}c{c}"] = rng.normal(0, 1, len(daily_df))
+        daily_tables.append(daily_df)
+
+    def sequential():
+        result_df = historical_df
+        for daily_df in daily_tables:
+            result_df = legacy_daily_merge(result_df, daily_df)
+        return result_df
+
+    def single_pass():
+        aligned = [(align_daily_table(historical_df, daily_df, 'bench'), None) for daily_df in daily_tables]
+        return combine_aligned_columns(historical_df, aligned)
+
+    print(f"=== 多表合併（{len(historical_df):,} 列 x {table_count} 個日資料表）===")
+    for label, func in (('逐表 join', sequential), ('一次對齊合併', single_pass)):
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, result = time_call(func, 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<12} 耗時 {elapsed:6.3f}s | 記憶體峰值 {peak / 1024 / 1024:8.1f} MB | 輸出 {result.shape}")
+
+def write_universe_payloads(json_file_path, payload_dir, symbol_count):
+    """以範例 JSON 為基礎，產生 symbol_count 檔不同代碼的 payload 檔案"""
+    data = load_json_data(json_file_path)
+    os.makedirs(payload_dir, exist_ok=True)
+    payloads = {}
+    for i in range(symbol_count):
+        symbol = f"{1101 + i}.TW"
+        data['historicalPriceFull']['symbol'] = symbol
+        for key, records in data.items():
+            if isinstance(records, list):
+                for record in records:
+                    if 'symbol' in record:
+                        record['symbol'] = symbol
+        payloads[symbol] = os.path.join(payload_dir, f"{symbol}.json")
+        with open(payloads[symbol], 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    return payloads
+
+def benchmark_universe(json_file_path='output_data.json', symbol_counts=(2, 8, 32)):
+    """
+    多股票資料集的轉換與分組合併耗時，確認每檔股票的成本不隨股票數量增加
+
+    Args:
+        json_file_path (str): 作為每檔股票 payload 範本的 JSON 檔案
+        symbol_counts (tuple): 要比較的股票數量
+    """
+    selected_tables = [(f"data/{key}.csv", key) for key in
+                       ('financialGrowth', 'ratios', 'cashFlowStatementGrowth')]
+    daily_tables = [(f"data/{key}.csv", key) for key in ('tech5', 'tech20', 'tech60', 'tech252')]
+    print("=== 多股票資料集（依 symbol 分區）===")
+    for symbol_count in symbol_counts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            payloads = write_universe_payloads(json_file_path, tmp_dir, symbol_count)
+            dataset_dir = os.path.join(tmp_dir, 'tables')
+            with contextlib.redirect_stdout(io.StringIO()):
+                convert_time, _ = time_call(lambda: convert_universe(payloads, dataset_dir, 'npcol'), 1)
+                merge_time, result = time_call(
+                    lambda: merge_universe(dataset_dir, selected_tables, daily_tables), 1)
+        print(f"{symbol_count:>4} 檔 | 轉換 {convert_time:7.2f}s ({convert_time / symbol_count * 1000:6.1f} ms/檔) | "
+              f"合併 {merge_time:6.2f}s ({merge_time / symbol_count * 1000:6.1f} ms/檔) | 輸出 {result.shape}")
+
+def benchmark_parallel_pipeline(json_file_path='output_data.json', symbol_count=32, worker_counts=(1, 2, 4, 8)):
+    """
+    以不同程序數執行多股票轉換與合併流程，比較總耗時與加速比
+
+    Args:
+        json_file_path (str): 作為每檔股票 payload 範本的 JSON 檔案
+        symbol_count (int): 股票數量
+        worker_counts (tuple): 要比較的程序數
+    """
+    selected_tables = [(f"data/{key}.csv", key) for key in
+                       ('financialGrowth', 'ratios', 'cashFlowStatementGrowth')]
+    daily_tables = [(f"data/{key}.csv", key) for key in ('tech5', 'tech20', 'tech60', 'tech252')]
+    print(f"=== 多程序流程（{symbol_count} 檔股票，CPU 數 {os.cpu_count()}）===")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        payloads = write_universe_payloads(json_file_path, os.path.join(tmp_dir, 'payloads'), symbol_count)
+        for workers in worker_counts:
+            run_dir = os.path.join(tmp_dir, f"w{workers}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed, manifest = time_call(lambda: run_universe_parallel(
+                    payloads, os.path.join(run_dir, 'tables'), os.path.join(run_dir, 'merged'),
+                    selected_tables, daily_tables, workers=workers, fmt='npcol'), 1)
+            baseline = baseline or elapsed
+            print(f"{workers:>3} 程序 | {elapsed:7.2f}s | 加速 {baseline / elapsed:5.2f}x | "
+                  f"{manifest['rows']} 列, {len(manifest['symbols'])} 檔")
+
+
+def truncated_payload(data, cutoff):
+    """只保留日期不晚於 cutoff 的記錄（模擬較早下載的 payload）"""
+    truncated = json.loads(json.dumps(data))
+    for key, records in truncated.items():
+        if isinstance(records, list):
+            truncated[key] = [record for record in records if str(record['date'])[:10] <= cutoff]
+    truncated['historicalPriceFull']['historical'] = [
+        record for record in truncated['historicalPriceFull']['historical'] if record['date'] <= cutoff]
+    return truncated
+
+
+def extended_history(data, scale):
+    """將日資料往前複製 scale - 1 次（每次提早 3 年）以模擬較長的歷史"""
+    extended = json.loads(json.dumps(data))
+    daily = [extended['historicalPriceFull']['historical']] + [
+        records for key, records in extended.items() if key.startswith('tech')]
+    for records in daily:
+        original = list(records)
+        for k in range(1, scale):
+            for record in original:
+                shifted = dict(record)
+                date = pd.Timestamp(record['date']) - pd.DateOffset(years=3 * k)
+                shifted['date'] = date.strftime('%Y-%m-%d') + str(record['date'])[10:]
+                records.append(shifted)
+    return extended
+
+
+def benchmark_incremental_update(json_file_path='output_data.json', scales=(1, 10), delta_days=(1, 20, 60)):
+    """
+    增量更新與完整重建的耗時比較: 先以截至 N 個交易日前的 payload 建立合併結果，再以最新的 payload 更新
+
+    Args:
+        json_file_path (str): 作為範本的 payload
+        scales (tuple): 歷史長度的倍數（日資料往前複製）
+        delta_days (tuple): 要比較的新增交易日數
+    """
+    selected_tables = list(AVAILABLE_TABLES.values())
+    daily_tables = list(DAILY_TABLES_AVAILABLE.values())
+    template = load_json_data(json_file_path)
+    symbol = template['historicalPriceFull'].get('symbol', 'TEST')
+    print("=== 增量更新 vs 完整重建 ===")
+    for scale in scales:
+        data = extended_history(template, scale)
+        dates = sorted(record['date'] for record in data['historicalPriceFull']['historical'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            latest = os.path.join(tmp_dir, 'latest.json')
+            with open(latest, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            with contextlib.redirect_stdout(io.StringIO()):
+                rebuild_time, _ = time_call(lambda: update_symbol(
+                    symbol, latest, os.path.join(tmp_dir, 'full'), selected_tables, daily_tables, 'npcol'), 1)
+            print(f"歷史 {len(dates):>5} 個交易日 | 完整重建 {rebuild_time:.3f}s")
+            for days in delta_days:
+                old_payload = os.path.join(tmp_dir, f"old{days}.json")
+                with open(old_payload, 'w', encoding='utf-8') as f:
+                    json.dump(truncated_payload(data, dates[-1 - days]), f)
+                output_dir = os.path.join(tmp_dir, f"inc{days}")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    update_symbol(symbol, old_payload, output_dir, selected_tables, daily_tables, 'npcol')
+                    update_time, result = time_call(lambda: update_symbol(
+                        symbol, latest, output_dir, selected_tables, daily_tables, 'npcol'), 1)
+                print(f"    新增 {days:>3} 個交易日 | {update_time:.3f}s | 新增 {result['appended']} 列，"
+                      f"重新對應季度數據 {result['reattached']} 列 | 相對完整重建 {rebuild_time / update_time:5.1f}x")
+
+def benchmark_chunked_merge(json_file_path='output_data.json', symbol_count=16, budgets_mb=(8, 32)):
+    """
+    比較一次合併全部股票後排序，與分塊合併 + 外部合併排序（不同記憶體預算）的耗時與記憶體峰值
+
+    Args:
+        json_file_path (str): 作為每檔股票 payload 範本的 JSON 檔案
+        symbol_count (int): 股票數量
+        budgets_mb (tuple): 分塊合併的記憶體預算（MB）
+    """
+    selected_tables = [(f"data/{key}.csv", key) for key in
+                       ('financialGrowth', 'ratios', 'cashFlowStatementGrowth')]
+    daily_tables = [(f"data/{key}.csv", key) for key in ('tech5', 'tech20', 'tech60', 'tech252')]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        payloads = write_universe_payloads(json_file_path, os.path.join(tmp_dir, 'payloads'), symbol_count)
+        dataset_dir = os.path.join(tmp_dir, 'tables')
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_universe(payloads, dataset_dir, 'npcol')
+
+        def in_memory():
+            result_df = merge_universe(dataset_dir, selected_tables, daily_tables)
+            result_df = result_df.sort_values(by=['date'], ascending=False, kind='mergesort')
+            result_df.to_csv(os.path.join(tmp_dir, 'in_memory.csv'), index=False)
+            return len(result_df)
+
+        cases = [('一次合併後排序', in_memory)] + [
+            (f"分塊合併 {budget} MB", lambda budget=budget: merge_chunked(
+                dataset_dir, selected_tables, os.path.join(tmp_dir, f"chunked{budget}.csv"), daily_tables,
+                memory_budget_mb=budget)['rows']) for budget in budgets_mb]
+        print(f"=== 分塊合併（{symbol_count} 檔股票）===")
+        for label, func in cases:
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed, rows = time_call(func, 1)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:<14} 耗時 {elapsed:6.2f}s | 記憶體峰值 {peak / 1024 / 1024:7.1f} MB | {rows:,} 列")
+
+def benchmark_partition_pruning(json_file_path='output_data.json', symbol_count=32, repeat=3):
+    """
+    比較依 symbol / 年份分區裁剪的讀取與合併，與讀取全部分區後再篩選的耗時
+
+    Args:
+        json_file_path (str): 作為每檔股票 payload 範本的 JSON 檔案
+        symbol_count (int): 股票數量
+        repeat (int): 重複次數
+    """
+    selected_tables = [(f"data/{key}.csv", key) for key in ('financialGrowth', 'ratios')]
+    daily_tables = [(f"data/{key}.csv", key) for key in ('tech20', 'tech60')]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        payloads = write_universe_payloads(json_file_path, os.path.join(tmp_dir, 'payloads'), symbol_count)
+        dataset_dir = os.path.join(tmp_dir, 'tables')
+        merged_dir = os.path.join(tmp_dir, 'merged')
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_universe(payloads, dataset_dir, 'npcol', by_year=True)
+            merge_universe(dataset_dir, selected_tables, daily_tables, output_dir=merged_dir, fmt='npcol',
+                           by_year=True)
+        symbol = sorted(payloads)[0]
+        start, end = '2023-01-01', '2023-12-31'
+
+        def full_scan():
+            df = read_symbol_partitions(merged_dir, 'merged')
+            return df[(df['symbol'] == symbol) & (df['date'] >= start) & (df['date'] <= end)]
+
+        cases = [
+            ('讀取: 全部分區後篩選', full_scan),
+            ('讀取: 分區裁剪', lambda: read_symbol_partitions(merged_dir, 'merged', [symbol], start=start, end=end)),
+            ('合併: 全部股票與年份', lambda: merge_universe(dataset_dir, selected_tables, daily_tables)),
+            ('合併: 分區裁剪', lambda: merge_universe(dataset_dir, selected_tables, daily_tables, [symbol],
+                                                 start=start, end=end)),
+        ]
+        print(f"=== 分區裁剪（{symbol_count} 檔股票，查詢 {symbol} 的 {start[:4]} 年）===")
+        for label, func in cases:
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed, result = time_call(func, repeat)
+            print(f"{label:<16} {elapsed * 1000:8.1f} ms | 輸出 {result.shape}")
+
+def make_price_data(symbol_count, years, seed=0):
+    """產生多股票的模擬 OHLCV（幾何隨機漫步），每檔股票每個營業日一列"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-31', periods=years * 252)
+    shape = (symbol_count, len(dates))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, shape), axis=1))
+    return pd.DataFrame({
+        'date': np.tile(dates, symbol_count),
+        'symbol': np.repeat([f"{1101 + i}.TW" for i in range(symbol_count)], len(dates)),
+        'open': (close * (1 + rng.normal(0, 0.005, shape))).ravel(),
+        'high': (close * (1 + rng.uniform(0, 0.02, shape))).ravel(),
+        'low': (close * (1 - rng.uniform(0, 0.02, shape))).ravel(),
+        'close': close.ravel(),
+        'volume': rng.integers(1000, 10 ** 7, symbol_count * len(dates)),
+    })
+
+def legacy_tech_indicators(prices, window):
+    """逐檔股票、逐個窗口以 pandas rolling / ewm 與逐列迴圈計算指標的作法（作為比較基準）"""
+    result = {}
+    for symbol, df in prices.groupby('symbol', sort=True):
+        close, high, low = df['close'], df['high'], df['low']
+        ema1 = close.ewm(span=window, adjust=False).mean()
+        ema2 = ema1.ewm(span=window, adjust=False).mean()
+        ema3 = ema2.ewm(span=window, adjust=False).mean()
+        highest = high.rolling(window, min_periods=1).max()
+        lowest = low.rolling(window, min_periods=1).min()
+
+        values = close.to_numpy()
+        rsi = np.zeros(len(values))
+        adx = np.zeros(len(values))
+        gain = loss = plus = minus = smoothed = 0.0
+        prev_high = prev_low = 0.0
+        for i in range(len(values)):
+            change = values[i] - values[i - 1] if i else 0.0
+            up = high.iat[i] - prev_high
+            down = prev_low - low.iat[i]
+            prev_high, prev_low = high.iat[i], low.iat[i]
+            dm_plus = up if up > down and up > 0 else 0.0
+            dm_minus = down if down > up and down > 0 else 0.0
+            if i < window:
+                gain += max(change, 0.0)
+                loss -= max(-change, 0.0)
+                plus += dm_plus
+                minus += dm_minus
+                if i < window - 1:
+                    continue
+                gain, loss, plus, minus = gain / window, loss / window, plus / window, minus / window
+            else:
+                gain += (max(change, 0.0) - gain) / window
+                loss += (max(-change, 0.0) - loss) / window
+                plus += (dm_plus - plus) / window
+                minus += (dm_minus - minus) / window
+            rsi[i] = 100 - 100 / (1 + gain / loss) if loss else 100.0
+            dx = 100 * abs(plus - minus) / (plus + minus) if plus + minus else 0.0
+            smoothed = dx / window if i == window - 1 else smoothed + (dx - smoothed) / window
+            adx[i] = smoothed
+
+        result[symbol] = pd.DataFrame({
+            'SMA': close.rolling(window, min_periods=1).mean(),
+            'EMA': ema1,
+            'WMA': close.rolling(window, min_periods=1).apply(
+                lambda x: np.dot(x, np.arange(1, len(x) + 1)) / (len(x) * (len(x) + 1) / 2), raw=True),
+            'DEMA': 2 * ema1 - ema2,
+            'TEMA': 3 * ema1 - 3 * ema2 + ema3,
+            'Williams': -100 * (highest - close) / (highest - lowest),
+            'RSI': rsi,
+            'ADX': adx,
+            'StandardDeviation': close.rolling(window, min_periods=1).std(ddof=0),
+        })
+    return pd.concat(result.values(), ignore_index=True)
+
+def benchmark_tech_indicators(symbol_count=1000, years=10, batch_size=200, legacy_symbols=4):
+    """
+    本機技術指標引擎（所有股票與窗口一起向量化）與逐檔 pandas 計算的耗時比較
+
+    Args:
+        symbol_count (int): 股票數量（分批產生與計算，限制記憶體用量）
+        years (int): 每檔股票的年數
+        batch_size (int): 每批的股票數量
+        legacy_symbols (int): 逐檔計算只執行這幾檔股票，再依股票數換算總耗時
+    """
+    print(f"=== 本機技術指標（{symbol_count} 檔 x {years} 年，窗口 {TECH_WINDOWS}）===")
+    sample = make_price_data(legacy_symbols, years, seed=1)
+    legacy_time, _ = time_call(lambda: [legacy_tech_indicators(sample, window) for window in TECH_WINDOWS], 1)
+    tables = compute_tech_tables(sample)
+    for window in TECH_WINDOWS:
+        expected = legacy_tech_indicators(sample, window)
+        for name in TECH_INDICATORS:
+            np.testing.assert_allclose(tables[f"tech{window}"][f"tech{window}{name}"], expected[name],
+                                       rtol=1e-7, atol=1e-7)
+
+    elapsed = 0.0
+    rows = 0
+    for start in range(0, symbol_count, batch_size):
+        prices = make_price_data(min(batch_size, symbol_count - start), years, seed=start)
+        batch_time, _ = time_call(lambda: compute_tech_tables(prices), 1)
+        elapsed += batch_time
+        rows += len(prices)
+    legacy_total = legacy_time / legacy_symbols * symbol_count
+    print(f"逐檔 pandas（{legacy_symbols} 檔換算）: {legacy_total:8.1f}s")
+    print(f"向量化引擎: {elapsed:8.2f}s | {rows / elapsed:,.0f} 列/秒 | 加速 {legacy_total / elapsed:,.0f}x")
+
+def benchmark_streaming_indicators(years=10, steps=20):
+    """
+    逐日追加一個交易日時，以保存的指標狀態串流更新，與每次重新批次計算整段歷史的耗時比較，
+    並確認串流結果與批次計算一致
+
+    Args:
+        years (int): 歷史長度（年）
+        steps (int): 追加的交易日數
+    """
+    prices = make_price_data(1, years, seed=2)
+    expected = compute_tech_tables(prices)
+    history = len(prices) - steps
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        build_time, first = time_call(lambda: update_indicators(tmp_dir, prices.iloc[:history]), 1)
+        streamed = {name: [table] for name, table in first.items()}
+        stream_time = 0.0
+        batch_time = 0.0
+        for end in range(history + 1, len(prices) + 1):
+            elapsed, new_rows = time_call(lambda: update_indicators(tmp_dir, prices.iloc[end - 1:end]), 1)
+            stream_time += elapsed
+            elapsed, _ = time_call(lambda: compute_tech_tables(prices.iloc[:end]), 1)
+            batch_time += elapsed
+            for name, table in new_rows.items():
+                streamed[name].append(table)
+
+    for name, tables in streamed.items():
+        pd.testing.assert_frame_equal(pd.concat(tables, ignore_index=True), expected[name], check_exact=False,
+                                      rtol=1e-9, atol=1e-9)
+    print(f"=== 技術指標串流更新（{history:,} 個交易日的歷史，逐日追加 {steps} 日）===")
+    print(f"建立狀態 {build_time:.3f}s | 每日串流更新（含讀寫狀態檔）{stream_time / steps * 1000:6.2f} ms | "
+          f"每日重新批次計算 {batch_time / steps * 1000:6.2f} ms | 加速 {batch_time / stream_time:,.1f}x")
+
+def benchmark_tech_windows(symbol_count=200, years=10, windows=(3, 10, 20, 50, 120, 252)):
+    """
+    比較每個窗口各自計算一個 tech 表格再逐表 join，與所有窗口共用一次計算、輸出一個寬表再 join 一次的耗時，
+    並確認兩者的指標數值一致
+
+    Args:
+        symbol_count (int): 模擬的股票數量
+        years (int): 每檔股票的年數
+        windows (tuple): 任意窗口組合
+    """
+    prices = make_price_data(symbol_count, years, seed=3)
+    historical_df = prices[['date', 'symbol', 'close']]
+    columns = block_columns(windows)
+
+    def per_window():
+        result_df = historical_df
+        for window in windows:
+            table = compute_tech_tables(prices, (window,))[f"tech{window}"]
+            result_df = legacy_daily_merge(result_df, table[['date', 'symbol'] +
+                                                            [f"tech{window}{name}" for name in TECH_INDICATORS]])
+        return result_df
+
+    def shared_pass():
+        block = compute_tech_block(prices, windows)
+        aligned = [(align_daily_table(historical_df, block, 'tech'), None)]
+        return combine_aligned_columns(historical_df, aligned)
+
+    print(f"=== 任意窗口技術指標（{symbol_count} 檔股票 x {years} 年，窗口 {windows}）===")
+    results = {}
+    for label, func in (('逐窗口計算 + 逐表 join', per_window), ('共用一次計算 + 一次合併', shared_pass)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, results[label] = time_call(func, 1)
+        print(f"{label:<16} 耗時 {elapsed:6.3f}s | 輸出 {results[label].shape}")
+    expected, result = results.values()
+    np.testing.assert_allclose(result[columns].to_numpy(), expected[columns].to_numpy(), rtol=1e-9, atol=1e-9)
+
+def legacy_forward_labels(df, targets):
+    """逐檔股票、逐列迴圈查找未來價格計算報酬與標籤的作法（作為比較基準）"""
+    result = {}
+    for horizon, threshold in targets:
+        return_column, label_column = label_columns(horizon, threshold)
+        returns = pd.Series(np.nan, index=df.index)
+        for _, group in df.groupby('symbol'):
+            group = group.sort_values('date')
+            prices = group['adjClose'].tolist()
+            for i, index in enumerate(group.index):
+                if i + horizon < len(prices):
+                    returns[index] = prices[i + horizon] / prices[i] - 1
+        result[return_column] = returns
+        result[label_column] = np.where(returns.isna(), np.nan, returns >= threshold)
+    return pd.DataFrame(result, index=df.index)
+
+def benchmark_forward_labels(symbol_count=1000, years=10, horizons=(5, 20, 60, 90), thresholds=(0.05, 0.1, 0.2),
+                             legacy_symbols=2):
+    """
+    前瞻報酬標籤: 所有 (期間, 門檻) 組合以位移陣列一次計算，與逐列迴圈的耗時比較，並確認結果一致
+
+    Args:
+        symbol_count (int): 股票數量
+        years (int): 每檔股票的年數
+        horizons (tuple): 期間（交易日數）
+        thresholds (tuple): 門檻
+        legacy_symbols (int): 逐列迴圈只執行這幾檔股票，再依股票數換算總耗時
+    """
+    targets = [(horizon, threshold) for horizon in horizons for threshold in thresholds]
+    prices = make_price_data(symbol_count, years, seed=4).rename(columns={'close': 'adjClose'})
+    # 合併結果依日期由新到舊排列
+    prices = prices.sort_values('date', ascending=False, kind='stable').reset_index(drop=True)
+
+    sample = prices[prices['symbol'].isin(prices['symbol'].unique()[:legacy_symbols])]
+    legacy_time, expected = time_call(lambda: legacy_forward_labels(sample, targets), 1)
+    pd.testing.assert_frame_equal(forward_labels(sample, targets)[expected.columns], expected)
+
+    elapsed, labels = time_call(lambda: forward_labels(prices, targets))
+    legacy_total = legacy_time / legacy_symbols * symbol_count
+    print(f"=== 前瞻報酬標籤（{len(prices):,} 列，{len(targets)} 組 (期間, 門檻)）===")
+    print(f"逐列迴圈（{legacy_symbols} 檔換算）: {legacy_total:8.1f}s")
+    print(f"向量化: {elapsed:8.3f}s | 加速 {legacy_total / elapsed:,.0f}x | "
+          f"無標籤的尾端列 {int(labels[label_columns(max(horizons), thresholds[0])[1]].isna().sum()):,}")
+
+def legacy_sequences(df, features, target, lookback):
+    """逐檔股票以 shift 串接 lookback 份特徵再 reshape 的作法（每一列複製 lookback 次，作為比較基準）"""
+    result = []
+    for _, group in df.groupby('symbol'):
+        group = group.sort_values('date')
+        lagged = pd.concat([group[features].shift(k) for k in range(lookback, 0, -1)], axis=1)
+        values = lagged.to_numpy(dtype='float32')[lookback:].reshape(-1, lookback, len(features))
+        targets = group[target].to_numpy()[lookback:]
+        valid = ~np.isnan(targets)
+        result.append((values[valid], targets[valid]))
+    return result
+
+def benchmark_sequences(symbol_count=100, years=10, feature_count=30, lookback=60, legacy_symbols=10):
+    """
+    LSTM 訓練序列: 窗口視圖與 shift 串接（每列複製 lookback 次）的耗時與記憶體峰值比較，以及分片寫出的耗時
+
+    Args:
+        symbol_count (int): 股票數量
+        years (int): 每檔股票的年數
+        feature_count (int): 特徵數量
+        lookback (int): 回看期間
+        legacy_symbols (int): shift 串接只執行這幾檔股票，再依股票數換算
+    """
+    df = make_price_data(symbol_count, years, seed=5).rename(columns={'close': 'adjClose'})
+    rng = np.random.default_rng(5)
+    features = [f"f{i}" for i in range(feature_count)]
+    for name in features:
+        df[name] = rng.normal(0, 1, len(df))
+    target = label_columns(90, 0.1)[1]
+    df[target] = forward_labels(df, [(90, 0.1)])[target]
+
+    def measure(func):
+        tracemalloc.start()
+        elapsed, result = time_call(func, 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak, result
+
+    sample = df[df['symbol'].isin(df['symbol'].unique()[:legacy_symbols])]
+    legacy_time, legacy_peak, expected = measure(lambda: legacy_sequences(sample, features, target, lookback))
+    view_time, view_peak, views = measure(lambda: list(iter_sequences(df, features, target, lookback)))
+    for (X, y), (_, windows, targets, _) in zip(expected, views):
+        np.testing.assert_array_equal(windows, X)
+        np.testing.assert_array_equal(targets, y)
+    samples = sum(len(windows) for _, windows, _, _ in views)
+    tensor_mb = samples * lookback * feature_count * 4 / 1024 / 1024
+
+    print(f"=== LSTM 訓練序列（{len(df):,} 列 x {feature_count} 個特徵，回看 {lookback} 日，"
+          f"{samples:,} 個樣本 = {tensor_mb:,.0f} MB）===")
+    scale = symbol_count / legacy_symbols
+    print(f"shift 串接（{legacy_symbols} 檔換算）: 耗時 {legacy_time * scale:7.2f}s | "
+          f"記憶體峰值 {legacy_peak * scale / 1024 / 1024:8.1f} MB")
+    print(f"窗口視圖:              耗時 {view_time:7.2f}s | 記憶體峰值 {view_peak / 1024 / 1024:8.1f} MB")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_time, write_peak, manifest = measure(
+            lambda: write_sequence_shards(df, os.path.join(tmp_dir, 'sequences'), features, target, lookback,
+                                          shard_mb=64))
+        shards = open_sequence_shards(os.path.join(tmp_dir, 'sequences'))
+        assert len(shards) == samples
+    print(f"分片寫出:              耗時 {write_time:7.2f}s | 記憶體峰值 {write_peak / 1024 / 1024:8.1f} MB | "
+          f"{len(manifest['shards'])} 個分片")
+
+def legacy_walk_forward(df, n_splits, horizon, embargo):
+    """每個 fold 以日期篩選切出訓練 / 驗證 DataFrame（複製特徵數據），並以 groupby shift 計算標籤結束日做 purge"""
+    dates = np.sort(df['date'].unique())
+    test_size = len(dates) // (n_splits + 1)
+    first_test = len(dates) - n_splits * test_size
+    label_end = df.sort_values('date').groupby('symbol')['date'].shift(-horizon).reindex(df.index)
+    folds = []
+    for split in range(n_splits):
+        test_start = first_test + split * test_size
+        train_df = df[label_end < dates[test_start - embargo]]
+        test_df = df[(df['date'] >= dates[test_start]) & (df['date'] <= dates[test_start + test_size - 1]) &
+                     label_end.notna()]
+        folds.append((train_df, test_df))
+    return folds
+
+def benchmark_walk_forward(symbol_count=500, years=10, feature_count=20, n_splits=10, horizon=90, embargo=5):
+    """
+    Walk-forward 切分: 整數索引陣列與每個 fold 切出 DataFrame 的耗時與記憶體峰值比較，並確認切出的列相同
+
+    Args:
+        symbol_count (int): 股票數量
+        years (int): 每檔股票的年數
+        feature_count (int): 特徵數量
+        n_splits (int): fold 數量
+        horizon (int): 標籤期間（交易日數）
+        embargo (int): embargo 交易日數
+    """
+    df = make_price_data(symbol_count, years, seed=6)
+    rng = np.random.default_rng(6)
+    for i in range(feature_count):
+        df[f"f{i}"] = rng.normal(0, 1, len(df))
+    df = df.sort_values('date', ascending=False, kind='stable').reset_index(drop=True)
+
+    print(f"=== Walk-forward 切分（{len(df):,} 列 x {df.shape[1]} 欄，{n_splits} 個 fold，"
+          f"期間 {horizon}、embargo {embargo}）===")
+    results = {}
+    for label, func in (('切出 DataFrame', lambda: legacy_walk_forward(df, n_splits, horizon, embargo)),
+                        ('整數索引陣列', lambda: list(walk_forward_splits(df, n_splits, horizon, embargo)))):
+        tracemalloc.start()
+        elapsed, results[label] = time_call(func, 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<14} 耗時 {elapsed:6.2f}s | 記憶體峰值 {peak / 1024 / 1024:8.1f} MB")
+    for (train_df, test_df), (train, test) in zip(*results.values()):
+        np.testing.assert_array_equal(train_df.index.to_numpy(), train)
+        np.testing.assert_array_equal(test_df.index.to_numpy(), test)
+
+if __name__ == "__main__":
+    benchmark_conversion()
+    benchmark_batch_fetch()
+    benchmark_table_formats()
+    benchmark_quarterly_merge()
+    benchmark_multi_table_merge()
+    benchmark_universe()
+    benchmark_parallel_pipeline()
+    benchmark_incremental_update()
+    benchmark_chunked_merge()
+    benchmark_partition_pruning()
+    benchmark_tech_indicators()
+    benchmark_streaming_indicators()
+    benchmark_tech_windows()
+    benchmark_forward_labels()
+    benchmark_sequences()
+    benchmark_walk_forward()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分塊（out-of-core）合併模組
+資料集大於記憶體時，依 symbol 分區每次只合併一批股票，每批合併完成後立即排序並寫成暫存的已排序段（run），
+最後以外部合併排序（external merge sort）依序讀取各段的一小塊數據，串流寫出依日期排序的最終結果。
+任何時刻記憶體中只有一批股票的合併數據，或各段目前讀取的數據塊，兩者都受記憶體預算限制
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from merge_financial_data import AVAILABLE_TABLES, DAILY_TABLES_AVAILABLE, merge_selected_data
+from table_io import npcol_frame, open_npcol, save_table
+from universe import PartitionedTables, in_date_range, list_symbols
+
+# 預設記憶體預算（MB）
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+# 合併一批股票時，輸入表格、對齊後的欄位與輸出寬表同時存在，峰值記憶體約為輸出大小的倍數
+MERGE_OVERHEAD = 4
+
+
+def frame_bytes(df):
+    """DataFrame 佔用的記憶體（含字串內容）"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def sort_keys(df, ascending=False):
+    """排序鍵: 日期的 int64 值，由新到舊排序時取負值，使所有段都依鍵值由小到大排列"""
+    keys = pd.to_datetime(df['date']).to_numpy().astype('datetime64[ns]').astype(np.int64)
+    return keys if ascending else -keys
+
+
+def iter_symbol_chunks(dataset_dir, selected_tables, daily_tables, symbols, memory_budget, start=None, end=None,
+                       **merge_options):
+    """
+    依記憶體預算逐批合併股票
+
+    第一批只合併一檔股票，之後依已合併數據每檔股票的平均大小決定每批的股票數量；
+    指定 start / end 時只讀取範圍內的年份分區
+
+    Yields:
+        pd.DataFrame: 一批股票的合併結果
+    """
+    position = 0
+    batch_size = 1
+    while position < len(symbols):
+        batch = symbols[position:position + batch_size]
+        position += len(batch)
+        result_df = merge_selected_data(selected_tables, daily_tables, historical_file='historicalPriceFull',
+                                        tables=PartitionedTables(dataset_dir, batch, start, end), **merge_options)
+        if start is not None or end is not None:
+            result_df = result_df[in_date_range(result_df['date'], start, end)].reset_index(drop=True)
+        bytes_per_symbol = max(1, frame_bytes(result_df) // len(batch))
+        batch_size = max(1, memory_budget // (MERGE_OVERHEAD * bytes_per_symbol))
+        yield result_df
+
+
+class SortedRun:
+    """一個已排序的暫存段（npcol 目錄），以記憶體映射分塊讀取"""
+
+    def __init__(self, path, index):
+        self.path = path
+        self.index = index
+        self.keys = np.load(os.path.join(path, 'keys.npy'), mmap_mode='r')
+        self.arrays = open_npcol(path, mmap=True)
+        self.position = 0
+        self.rows = len(self.keys)
+        self.row_bytes = 0
+
+    def read(self, start, stop):
+        """讀取 [start, stop) 範圍的列（只有這些列會載入記憶體）"""
+        return npcol_frame(self.arrays, slice(start, stop))
+
+
+def write_run(df, run_dir, index, ascending=False):
+    """將一批合併結果依排序鍵排序（穩定排序）後寫成暫存段，並另存排序鍵"""
+    keys = sort_keys(df, ascending)
+    order = np.argsort(keys, kind='stable')
+    df = df.iloc[order].reset_index(drop=True)
+    path = save_table(df, os.path.join(run_dir, f"run{index:05d}"), 'npcol')
+    np.save(os.path.join(path, 'keys.npy'), keys[order])
+    run = SortedRun(path, index)
+    run.row_bytes = max(1, frame_bytes(df) // max(1, len(df)))
+    return run
+
+
+def merge_runs(runs, columns, memory_budget):
+    """
+    外部合併排序: 每段從目前位置起取一個視窗（只讀取排序鍵），輸出所有不大於「各段視窗最後一筆的最小鍵」的列
+
+    各段之間鍵值相同時依段的順序輸出（與將所有批次串接後做穩定排序的結果相同）；
+    每次輸出的列數不超過 段數 x 視窗大小，只有要輸出的列會從記憶體映射讀入
+
+    Yields:
+        pd.DataFrame: 依排序鍵排列的連續數據塊
+    """
+    runs = [run for run in runs if run.rows]
+    if not runs:
+        return
+    row_bytes = max(run.row_bytes for run in runs)
+    # 輸出的數據塊在串接與重新排序時約複製兩次
+    block_rows = max(1, memory_budget // (2 * len(runs) * row_bytes))
+
+    while runs:
+        windows = {run.index: (run.position, min(run.rows, run.position + block_rows)) for run in runs}
+
+        # 邊界: 仍有後續數據的段中，視窗最後一筆的 (鍵, 段序號) 最小值
+        bounds = [(int(run.keys[windows[run.index][1] - 1]), run.index) for run in runs
+                  if windows[run.index][1] < run.rows]
+        bound = min(bounds) if bounds else None
+
+        frames = []
+        keys = []
+        run_ids = []
+        for run in runs:
+            start, stop = windows[run.index]
+            run_keys = np.asarray(run.keys[start:stop])
+            if bound is None:
+                count = len(run_keys)
+            elif run.index < bound[1]:
+                count = int(np.searchsorted(run_keys, bound[0], side='right'))
+            else:
+                count = int(np.searchsorted(run_keys, bound[0], side='left'))
+                if run.index == bound[1]:
+                    count = len(run_keys)
+            if count == 0:
+                continue
+            frames.append(run.read(start, start + count).reindex(columns=columns))
+            keys.append(run_keys[:count])
+            run_ids.append(np.full(count, run.index))
+            run.position = start + count
+
+        runs = [run for run in runs if run.position < run.rows]
+        if frames:
+            order = np.lexsort((np.concatenate(run_ids), np.concatenate(keys)))
+            yield pd.concat(frames, ignore_index=True).take(order).reset_index(drop=True)
+
+
+def merge_chunked(dataset_dir, selected_tables, output_file, daily_tables=None, symbols=None,
+                  memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, dropna=False, ascending=False, tmp_dir=None,
+                  start=None, end=None, **merge_options):
+    """
+    分塊合併資料集中的股票，結果依日期排序後串流寫入 CSV
+
+    Args:
+        dataset_dir (str): universe.convert_universe 產生的資料集目錄
+        selected_tables (list): 季度表格 (路徑, 名稱) 列表
+        output_file (str): 輸出的 CSV 檔案
+        daily_tables (list): 日資料表格 (路徑, 名稱) 列表
+        symbols (list): 只合併這些股票（None 表示全部）
+        memory_budget_mb (int): 記憶體預算（MB），決定每批的股票數量與外部排序每次讀取的數據塊大小
+        dropna (bool): 是否移除包含 NaN 值的行（逐批處理）
+        ascending (bool): 是否依日期由舊到新排序（預設與 merge_financial_data.main 相同，由新到舊）
+        tmp_dir (str): 暫存段的目錄（None 表示系統暫存目錄）
+        start, end: 只合併此日期範圍（包含兩端）的交易日
+        **merge_options: 傳給 merge_selected_data 的其他參數（quarterly_mode、max_staleness、columns）
+
+    Returns:
+        dict: {'rows': 輸出列數, 'columns': 欄位列表, 'runs': 暫存段數量}
+    """
+    memory_budget = int(memory_budget_mb * 1024 * 1024)
+    symbols = list(symbols) if symbols is not None else list_symbols(dataset_dir)
+    run_dir = tempfile.mkdtemp(prefix='merge_runs_', dir=tmp_dir)
+    try:
+        # 第一階段: 逐批合併並寫成已排序的暫存段
+        runs = []
+        columns = []
+        for result_df in iter_symbol_chunks(dataset_dir, selected_tables, daily_tables, symbols, memory_budget,
+                                            start, end, **merge_options):
+            if dropna:
+                result_df = result_df.dropna()
+            columns.extend(col for col in result_df.columns if col not in columns)
+            runs.append(write_run(result_df, run_dir, len(runs), ascending))
+            print(f"已完成第 {len(runs)} 批（{result_df['symbol'].nunique()} 檔股票，{len(result_df):,} 列）")
+            del result_df
+
+        # 第二階段: 外部合併排序，逐塊寫入輸出檔案
+        directory = os.path.dirname(output_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_output = output_file + '.tmp'
+        rows = 0
+        with open(tmp_output, 'w', encoding='utf-8', newline='') as f:
+            f.write(','.join(columns) + '\n')
+            for block in merge_runs(runs, columns, memory_budget):
+                block.to_csv(f, index=False, header=False)
+                rows += len(block)
+        os.replace(tmp_output, output_file)
+        print(f"已依日期排序寫出 {rows:,} 列到: {output_file}（{len(runs)} 個暫存段）")
+        return {'rows': rows, 'columns': columns, 'runs': len(runs)}
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def main():
+    """
+    以分塊方式合併資料集中所有股票的全部財務數據與技術指標
+    """
+    dataset_dir = input("請輸入資料集目錄（universe.py 轉換後的 tables 目錄）: ").strip()
+    output_file = input("請輸入輸出檔案（預設為 merged_universe_data.csv）: ").strip() or 'merged_universe_data.csv'
+    budget_input = input(f"記憶體預算 MB（預設為 {DEFAULT_MEMORY_BUDGET_MB}）: ").strip()
+    memory_budget_mb = int(budget_input) if budget_input.isdigit() else DEFAULT_MEMORY_BUDGET_MB
+
+    if not list_symbols(dataset_dir):
+        print(f"❌ {dataset_dir} 中沒有股票分區")
+        return
+    merge_chunked(dataset_dir, list(AVAILABLE_TABLES.values()), output_file,
+                  list(DAILY_TABLES_AVAILABLE.values()), memory_budget_mb=memory_budget_mb)
+
+
+if __name__ == "__main__":
+    main()
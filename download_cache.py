@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下載快取模組
+以 ETag / Last-Modified 發送條件式請求，並以 sha256 判斷內容是否變更，
+快取總大小超過上限時依最近使用時間（LRU）淘汰
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from get_json_data import download_json_to_file
+
+# 預設快取目錄與大小上限
+DEFAULT_CACHE_DIR = '.download_cache'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+INDEX_FILE = 'index.json'
+
+
+class DownloadCache:
+    """
+    以 URL 為 key 的磁碟下載快取
+
+    index.json 為每個 URL 記錄: 檔名、etag、last_modified、sha256、bytes、last_access
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        """讀取快取索引，並移除檔案已不存在的項目"""
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"警告: 快取索引無法讀取，重新建立 ({e})")
+            return {}
+        return {url: entry for url, entry in index.items()
+                if os.path.exists(os.path.join(self.cache_dir, entry['file']))}
+
+    def _save_index(self):
+        """以暫存檔替換的方式寫入索引，避免中斷時損毀（暫存檔名唯一，共用快取目錄的程序不會互相覆寫）"""
+        fd, tmp_path = tempfile.mkstemp(prefix=INDEX_FILE + '.', suffix='.tmp', dir=self.cache_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def entry_path(self, url):
+        """回傳 URL 對應的快取檔案路徑"""
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def total_bytes(self):
+        """目前快取內容的總大小"""
+        return sum(entry['bytes'] for entry in self.index.values())
+
+    def fetch(self, url, session=None, timeout=60, raise_errors=False):
+        """
+        以條件式請求下載 URL，內容未變更時直接使用快取
+
+        Args:
+            url (str): 要下載的 URL
+            session (requests.Session): 共用的 Session
+            timeout (float): 連線與讀取逾時秒數
+            raise_errors (bool): 下載失敗時拋出 requests 的例外（見 download_json_to_file），而不是回傳 None
+
+        Returns:
+            dict: {'path', 'sha256', 'bytes', 'status', 'changed'}，失敗時回傳 None
+                  changed 為 False 表示伺服器回應 304 或內容 sha256 與快取相同
+        """
+        path = self.entry_path(url)
+        with self.lock:
+            entry = self.index.get(url)
+            if entry and not os.path.exists(path):
+                # 快取檔案已被刪除（例如其他程序淘汰），不能再以 304 沿用
+                del self.index[url]
+                entry = None
+
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        # 每次下載使用各自的暫存檔，同時下載同一個 URL 的執行緒或共用快取目錄的程序不會互相覆寫；
+        # 確認內容後才替換快取檔案
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.download', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            download = download_json_to_file(url, tmp_path, resume=False, timeout=timeout,
+                                             session=session, headers=headers, raise_errors=raise_errors)
+            if not download:
+                return None
+
+            with self.lock:
+                if download['status'] == 304 and entry:
+                    changed = False
+                    entry['last_access'] = time.time()
+                else:
+                    changed = not entry or entry['sha256'] != download['sha256']
+                    if changed:
+                        os.replace(tmp_path, path)
+                    entry = {
+                        'file': os.path.basename(path),
+                        'etag': download['etag'],
+                        'last_modified': download['last_modified'],
+                        'sha256': download['sha256'],
+                        'bytes': download['bytes'],
+                        'last_access': time.time(),
+                    }
+                    self.index[url] = entry
+                self._evict(keep=url)
+                self._save_index()
+        finally:
+            # 未使用的暫存檔（304、內容未變更或下載失敗）不保留，暫存檔名每次不同，無法續傳
+            for leftover in (tmp_path, tmp_path + '.part', tmp_path + '.part.meta'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        return {'path': path, 'sha256': entry['sha256'], 'bytes': entry['bytes'],
+                'status': download['status'], 'changed': changed}
+
+    def _evict(self, keep=None):
+        """依最近使用時間由舊到新淘汰項目，直到總大小不超過上限（keep 指定的 URL 不淘汰）"""
+        total = self.total_bytes()
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if url == keep:
+                continue
+            file_path = os.path.join(self.cache_dir, entry['file'])
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            total -= entry['bytes']
+            del self.index[url]
+            print(f"快取已滿，淘汰: {url[:80]}")
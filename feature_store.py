@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記憶體映射特徵庫模組
+將合併後的數據依 (symbol, date) 排序後，每個欄位存成獨立的 .npy 檔案，並以 manifest.json
+記錄欄位、型別與 symbol/date 索引。讀取時以唯讀記憶體映射開啟，只有實際存取的欄位會載入記憶體，
+多個程序開啟同一個特徵庫時共用作業系統的同一份頁面快取
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = 'manifest.json'
+STORE_VERSION = 1
+
+
+def _column_values(series):
+    """將欄位轉為可記憶體映射的 NumPy 陣列，回傳 (陣列, kind, 額外資訊)"""
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.name == 'symbol':
+        categorical = pd.Categorical(series)
+        codes = categorical.codes.astype(np.int32)
+        return codes, 'category', {'categories': [str(c) for c in categorical.categories]}
+    # 逐格寫入產生的 object 欄位（例如季度合併的數值欄位）先還原為原生型別
+    series = series.infer_objects()
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_numeric_dtype(series.dtype):
+        # 可為空的整數（Int64 等）以 float64 + NaN 保存
+        series = series.astype('float64')
+    if series.dtype == object:
+        mask = series.isna().to_numpy()
+        values = series.where(~mask, '').astype(str).to_numpy(dtype=str)
+        return values, 'str', {'mask': mask if mask.any() else None}
+    return series.to_numpy(), 'native', {}
+
+
+def write_feature_store(df, store_dir):
+    """
+    將 DataFrame 寫成記憶體映射特徵庫
+
+    數據會先依 symbol、date 排序，manifest 中記錄每個 symbol 的列範圍與日期範圍
+
+    Args:
+        df (pd.DataFrame): 合併後的數據（需包含 symbol 與 date 欄位）
+        store_dir (str): 特徵庫目錄
+
+    Returns:
+        dict: manifest 內容
+    """
+    for col in ('symbol', 'date'):
+        if col not in df.columns:
+            raise ValueError(f"特徵庫需要 {col} 欄位")
+
+    df = df.sort_values(['symbol', 'date'], kind='mergesort').reset_index(drop=True)
+
+    tmp_dir = store_dir.rstrip('/') + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        values, kind, extra = _column_values(df[name])
+        entry = {'name': name, 'file': f"c{i:04d}.npy", 'kind': kind, 'dtype': str(values.dtype)}
+        np.save(os.path.join(tmp_dir, entry['file']), values)
+        if kind == 'category':
+            entry['categories'] = extra['categories']
+        if extra.get('mask') is not None:
+            entry['mask'] = f"c{i:04d}.mask.npy"
+            np.save(os.path.join(tmp_dir, entry['mask']), extra['mask'])
+        columns.append(entry)
+
+    # symbol 索引: 每個 symbol 在排序後數據中的連續列範圍
+    symbols = {}
+    symbol_values = df['symbol'].astype(str).to_numpy()
+    boundaries = np.flatnonzero(symbol_values[1:] != symbol_values[:-1]) + 1
+    starts = np.concatenate(([0], boundaries)) if len(df) else np.array([], dtype=int)
+    stops = np.concatenate((boundaries, [len(df)])) if len(df) else np.array([], dtype=int)
+    dates = df['date']
+    for start, stop in zip(starts, stops):
+        symbols[symbol_values[start]] = {
+            'start': int(start),
+            'stop': int(stop),
+            'first_date': str(dates.iloc[start].date()),
+            'last_date': str(dates.iloc[stop - 1].date()),
+        }
+
+    manifest = {
+        'version': STORE_VERSION,
+        'rows': len(df),
+        'columns': columns,
+        'index': {'columns': ['symbol', 'date'], 'symbols': symbols},
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.replace(tmp_dir, store_dir)
+    return manifest
+
+
+class FeatureStore:
+    """
+    唯讀的記憶體映射特徵庫
+
+    欄位在第一次存取時才以 mmap 開啟；column() 回傳的陣列直接對應磁碟檔案，不會複製數據
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != STORE_VERSION:
+            raise ValueError(f"不支援的特徵庫版本: {self.manifest.get('version')}")
+        self.entries = {entry['name']: entry for entry in self.manifest['columns']}
+        self.arrays = {}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    @property
+    def columns(self):
+        return [entry['name'] for entry in self.manifest['columns']]
+
+    @property
+    def dtypes(self):
+        return {entry['name']: entry['dtype'] for entry in self.manifest['columns']}
+
+    @property
+    def symbols(self):
+        return list(self.manifest['index']['symbols'])
+
+    def column(self, name):
+        """回傳欄位的記憶體映射陣列（category 欄位回傳整數代碼）"""
+        if name not in self.arrays:
+            entry = self.entries[name]
+            self.arrays[name] = np.load(os.path.join(self.store_dir, entry['file']), mmap_mode='r')
+        return self.arrays[name]
+
+    def rows(self, symbol=None, start=None, end=None):
+        """
+        依 symbol 與日期範圍回傳列的 slice（數據依 symbol、date 排序，因此結果必為連續範圍）
+
+        Args:
+            symbol (str): 股票代碼（None 表示全部；指定日期時必須指定 symbol）
+            start (str or datetime): 起始日期（包含）
+            end (str or datetime): 結束日期（包含）
+        """
+        if symbol is None:
+            if start is not None or end is not None:
+                raise ValueError("依日期篩選時必須指定 symbol")
+            return slice(0, len(self))
+
+        info = self.manifest['index']['symbols'].get(symbol)
+        if info is None:
+            return slice(0, 0)
+        lo, hi = info['start'], info['stop']
+        if start is None and end is None:
+            return slice(lo, hi)
+
+        dates = self.column('date')[lo:hi]
+        if start is not None:
+            lo += int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left'))
+        if end is not None:
+            hi = info['start'] + int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side='right'))
+        return slice(lo, max(lo, hi))
+
+    def _series_values(self, name, rows):
+        """取出欄位在 rows 範圍內的值，數值欄位保持為記憶體映射的視圖"""
+        entry = self.entries[name]
+        values = self.column(name)[rows]
+        if entry['kind'] == 'category':
+            return pd.Categorical.from_codes(values, entry['categories'])
+        if entry['kind'] == 'str':
+            values = values.astype(object)
+            if entry.get('mask'):
+                mask = np.load(os.path.join(self.store_dir, entry['mask']), mmap_mode='r')[rows]
+                values[mask] = None
+        return values
+
+    def to_frame(self, columns=None, symbol=None, start=None, end=None):
+        """
+        以零複製方式組成 DataFrame（數值欄位直接引用記憶體映射，只有被讀到的頁面會載入）
+
+        Args:
+            columns (list): 要取出的欄位（None 表示全部）
+            symbol (str): 只取該股票的列
+            start, end: 日期範圍（包含），需搭配 symbol
+
+        Returns:
+            pd.DataFrame: 唯讀數據（需要修改時請先 copy()）
+        """
+        columns = self.columns if columns is None else list(columns)
+        missing = [name for name in columns if name not in self.entries]
+        if missing:
+            raise KeyError(f"特徵庫中沒有這些欄位: {missing}")
+        rows = self.rows(symbol, start, end)
+        return pd.DataFrame({name: self._series_values(name, rows) for name in columns}, copy=False)
+
+
+def open_feature_store(store_dir):
+    """開啟特徵庫"""
+    return FeatureStore(store_dir)
@@ -1,5 +1,22 @@
 import requests
 import json
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from json_stream_reader import summarize_json_sections
+
+# 串流下載時每次寫入磁碟的位元組數
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# 批次下載時視為暫時性錯誤、會重試的 HTTP 狀態碼
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 def fetch_json_from_url(url):
     """
@@ -30,34 +47,337 @@ def fetch_json_from_url(url):
         print(f"JSON 解析失敗: {e}")
         return None
 
+def hash_file(file_path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """逐塊計算檔案的 sha256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest
+
+def read_part_validators(part_path):
+    """讀取部分檔案旁記錄的 ETag / Last-Modified（沒有記錄時回傳空字典）"""
+    try:
+        with open(part_path + '.meta', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def write_part_validators(part_path, validators):
+    """在部分檔案旁記錄本次下載的 ETag / Last-Modified，續傳時用於 If-Range"""
+    with open(part_path + '.meta', 'w', encoding='utf-8') as f:
+        json.dump(validators, f)
+
+def remove_part_file(part_path):
+    """刪除部分檔案與其 ETag / Last-Modified 記錄"""
+    for path in (part_path, part_path + '.meta'):
+        if os.path.exists(path):
+            os.remove(path)
+
+def if_range_value(validators):
+    """If-Range 只接受強 ETag 或 Last-Modified，都沒有時回傳 None（無法確認遠端內容未變更）"""
+    etag = validators.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return validators.get('last_modified')
+
+def download_json_to_file(url, file_path, chunk_size=DOWNLOAD_CHUNK_SIZE, resume=True, timeout=60, session=None,
+                          headers=None, raise_errors=False):
+    """
+    將 URL 的內容串流寫入檔案，同時計算 sha256，不在記憶體中解析 JSON
+    
+    下載中的內容寫入 file_path + '.part'，並在 file_path + '.part.meta' 記錄該次回應的 ETag / Last-Modified；
+    若部分檔案已存在且 resume 為 True，會以 HTTP Range 加上 If-Range 請求從中斷處繼續下載。
+    只有回應為 206 且 Content-Range 從部分檔案的結尾開始時才接續寫入，遠端內容已變更、
+    伺服器不支援續傳或部分檔案沒有驗證資訊時都從頭重新下載，避免拼接出不同版本的內容。
+    
+    Args:
+        url (str): 要下載的 URL
+        file_path (str): 儲存的檔案路徑
+        chunk_size (int): 每次寫入磁碟的位元組數
+        resume (bool): 是否續傳先前中斷的下載
+        timeout (float): 連線與讀取逾時秒數
+        session (requests.Session): 共用的連線 Session（None 表示使用單次連線）
+        headers (dict): 額外的請求標頭（例如 If-None-Match 條件式請求）
+        raise_errors (bool): 失敗時拋出 requests 的例外（HTTPError 帶有回應狀態碼），而不是回傳 None
+        
+    Returns:
+        dict: {'path', 'status', 'sha256', 'bytes', 'resumed_from', 'etag', 'last_modified'}，
+              失敗時回傳 None；伺服器回應 304 時 status 為 304 且不寫入檔案
+    """
+    part_path = file_path + '.part'
+    offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+    request_headers = dict(headers or {})
+    if offset:
+        if_range = if_range_value(read_part_validators(part_path))
+        if if_range:
+            request_headers['Range'] = f'bytes={offset}-'
+            request_headers['If-Range'] = if_range
+        else:
+            print("部分檔案沒有 ETag / Last-Modified 記錄，無法確認遠端內容未變更，重新下載")
+            offset = 0
+    http = session or requests
+    
+    try:
+        with http.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+            if offset and response.status_code == 416:
+                # 部分檔案已是完整內容（或比遠端更大），重新下載以確保正確
+                print("續傳範圍無效，重新下載")
+                remove_part_file(part_path)
+                return download_json_to_file(url, file_path, chunk_size, resume=False, timeout=timeout,
+                                             session=session, headers=headers, raise_errors=raise_errors)
+            
+            response.raise_for_status()
+            
+            validators = {'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+            if response.status_code == 304:
+                # 條件式請求: 遠端內容未變更
+                return {'path': file_path, 'status': 304, 'sha256': None, 'bytes': 0, 'resumed_from': 0,
+                        **validators}
+            
+            content_range = response.headers.get('Content-Range', '')
+            if offset and response.status_code == 206 and content_range.startswith(f'bytes {offset}-'):
+                # 續傳: If-Range 確認遠端內容未變更，先把已下載的部分納入雜湊
+                digest = hash_file(part_path, chunk_size)
+                mode = 'ab'
+                print(f"從第 {offset:,} 位元組續傳")
+            elif offset and response.status_code == 206:
+                # 回應的範圍與部分檔案的結尾不符，無法接續
+                print(f"續傳範圍不符（{content_range}），重新下載")
+                remove_part_file(part_path)
+                return download_json_to_file(url, file_path, chunk_size, resume=False, timeout=timeout,
+                                             session=session, headers=headers, raise_errors=raise_errors)
+            else:
+                # 遠端內容已變更（If-Range 不符時回應 200）、伺服器忽略 Range 或沒有部分檔案，從頭下載
+                if offset:
+                    print("遠端內容已變更或不支援續傳，重新下載")
+                digest = hashlib.sha256()
+                mode = 'wb'
+                offset = 0
+                
+            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+            if mode == 'wb':
+                write_part_validators(part_path, validators)
+            total = offset
+            with open(part_path, mode) as f:
+                for block in response.iter_content(chunk_size=chunk_size):
+                    if block:
+                        f.write(block)
+                        digest.update(block)
+                        total += len(block)
+                        
+        os.replace(part_path, file_path)
+        remove_part_file(part_path)
+        return {'path': file_path, 'status': response.status_code, 'sha256': digest.hexdigest(), 'bytes': total,
+                'resumed_from': offset, **validators}
+        
+    except requests.exceptions.RequestException as e:
+        print(f"下載失敗: {e}")
+        if os.path.exists(part_path):
+            print(f"已保留部分檔案 {part_path}，下次執行可續傳")
+        if raise_errors:
+            raise
+        return None
+
+def create_session(pool_size=16):
+    """
+    建立可在多執行緒間共用的 requests.Session，連線池大小與同時連線數一致
+    
+    Args:
+        pool_size (int): 每個主機保留的連線數
+        
+    Returns:
+        requests.Session: 共用的 Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def build_symbol_urls(url_template, symbols):
+    """
+    依股票代碼產生下載網址
+    
+    Args:
+        url_template (str): 含 {symbol} 的網址樣板，例如 'https://host/data/{symbol}.json'
+        symbols (list): 股票代碼列表，例如 ['1101.TW', '2330.TW']
+        
+    Returns:
+        dict: {股票代碼: 網址}
+    """
+    return {symbol: url_template.format(symbol=symbol) for symbol in symbols}
+
+def backoff_delay(attempt, backoff=0.5, max_backoff=30.0):
+    """指數退避加上完整抖動（full jitter）: 0 到 min(max_backoff, backoff * 2^attempt) 之間的隨機秒數"""
+    return random.uniform(0, min(max_backoff, backoff * (2 ** attempt)))
+
+def fetch_with_retry(session, url, host_limit, timeout=30, retries=3, backoff=0.5, max_backoff=30.0, file_path=None,
+                     cache=None):
+    """
+    在主機併發限制下下載單一網址，遇到逾時、連線錯誤或暫時性狀態碼時重試
+    
+    Args:
+        session (requests.Session): 共用的 Session
+        url (str): 要下載的網址
+        host_limit (threading.Semaphore): 該主機的併發限制
+        timeout (float): 連線與讀取逾時秒數
+        retries (int): 失敗後的最大重試次數
+        backoff (float): 指數退避的基準秒數
+        max_backoff (float): 單次等待的上限秒數
+        file_path (str): 若指定，串流寫入該檔案而不是解析 JSON
+        cache (DownloadCache): 若指定，透過下載快取發送條件式請求（結果為快取檔案路徑）
+        
+    Returns:
+        dict: {'url', 'data', 'path', 'status', 'bytes', 'changed', 'latency', 'attempts', 'error'}
+    """
+    result = {'url': url, 'data': None, 'path': None, 'status': None, 'bytes': 0, 'changed': True,
+              'latency': None, 'attempts': 0, 'error': None}
+    start = time.perf_counter()
+    
+    for attempt in range(retries + 1):
+        result['attempts'] = attempt + 1
+        retryable = True
+        
+        with host_limit:
+            try:
+                if cache is not None:
+                    download = cache.fetch(url, session=session, timeout=timeout, raise_errors=True)
+                    result.update(path=download['path'], status=download['status'], bytes=download['bytes'],
+                                  changed=download['changed'], error=None)
+                    break
+                elif file_path:
+                    download = download_json_to_file(url, file_path, timeout=timeout, session=session,
+                                                     raise_errors=True)
+                    result.update(path=download['path'], status=download['status'], bytes=download['bytes'],
+                                  error=None)
+                    break
+                else:
+                    response = session.get(url, timeout=timeout)
+                    result['status'] = response.status_code
+                    if response.status_code in RETRY_STATUS_CODES:
+                        result['error'] = f"HTTP {response.status_code}"
+                    else:
+                        response.raise_for_status()
+                        result['bytes'] = len(response.content)
+                        result['data'] = response.json()
+                        result['error'] = None
+                        break
+            except requests.exceptions.HTTPError as e:
+                # 串流下載與快取的 raise_for_status: 只有暫時性狀態碼重試
+                result['status'] = e.response.status_code if e.response is not None else None
+                result['error'] = str(e)
+                retryable = result['status'] in RETRY_STATUS_CODES
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                # 串流下載中途斷線也視為暫時性錯誤（下次嘗試會續傳）
+                result['error'] = str(e)
+            except requests.exceptions.RequestException as e:
+                # 4xx 等非暫時性錯誤不重試
+                result['error'] = str(e)
+                retryable = False
+            except json.JSONDecodeError as e:
+                result['error'] = f"JSON 解析失敗: {e}"
+                retryable = False
+                
+        if not retryable or attempt == retries:
+            break
+        time.sleep(backoff_delay(attempt, backoff, max_backoff))
+        
+    result['latency'] = time.perf_counter() - start
+    return result
+
+def fetch_many(urls, max_workers=8, per_host_limit=4, timeout=30, retries=3, backoff=0.5,
+               max_backoff=30.0, output_dir=None, session=None, cache=None, verbose=True):
+    """
+    以共用 Session 與有上限的執行緒池批次下載多個網址
+    
+    Args:
+        urls (dict | list): {名稱: 網址}（例如 build_symbol_urls 的結果）或網址列表
+        max_workers (int): 執行緒池大小（同時進行的下載數上限）
+        per_host_limit (int): 對同一主機同時連線的上限
+        timeout (float): 每次請求的逾時秒數
+        retries (int): 每個網址的最大重試次數
+        backoff (float): 指數退避的基準秒數
+        max_backoff (float): 單次等待的上限秒數
+        output_dir (str): 若指定，每個網址串流寫入 output_dir/{名稱}.json，而不是解析到記憶體
+        session (requests.Session): 共用的 Session（None 表示自動建立）
+        cache (DownloadCache): 若指定，所有網址經由下載快取取得，未變更的內容不會重新下載
+        verbose (bool): 是否顯示每個網址的延遲與整體吞吐量
+        
+    Returns:
+        dict: {名稱: fetch_with_retry 的結果}
+    """
+    if not isinstance(urls, dict):
+        urls = {url: url for url in urls}
+        
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=max(max_workers, per_host_limit))
+        
+    # 每個主機一個 Semaphore，限制對同一主機的同時連線數
+    host_limits = {}
+    for url in urls.values():
+        host = urlsplit(url).netloc
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(per_host_limit)
+            
+    def fetch_one(name, url):
+        file_path = os.path.join(output_dir, f"{name}.json") if output_dir else None
+        return name, fetch_with_retry(session, url, host_limits[urlsplit(url).netloc], timeout,
+                                      retries, backoff, max_backoff, file_path, cache)
+                                      
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(executor.map(lambda item: fetch_one(*item), urls.items()))
+    finally:
+        if own_session:
+            session.close()
+    elapsed = time.perf_counter() - start
+    
+    if verbose:
+        print_fetch_report(results, elapsed)
+        
+    return results
+
+def print_fetch_report(results, elapsed):
+    """顯示批次下載的每個網址延遲與整體吞吐量"""
+    succeeded = [r for r in results.values() if r['error'] is None]
+    total_bytes = sum(r['bytes'] for r in succeeded)
+    
+    for name, r in results.items():
+        status = ('✅' if r['changed'] else '✅ (未變更)') if r['error'] is None else f"❌ {r['error']}"
+        print(f"  {name}: {r['latency']:.3f}s, {r['bytes']:,} bytes, 嘗試 {r['attempts']} 次 {status}")
+        
+    elapsed = max(elapsed, 1e-9)
+    print(f"成功 {len(succeeded)}/{len(results)}，耗時 {elapsed:.2f}s，"
+          f"吞吐量 {len(results) / elapsed:.1f} 個/秒，{total_bytes / elapsed / 1024 / 1024:.2f} MB/秒")
+
+def print_json_summary(json_file_path):
+    """串流統計並顯示 JSON 檔案的結構"""
+    for path, count in summarize_json_sections(json_file_path).items():
+        if count is None:
+            print(f"- {path}")
+        else:
+            print(f"- {path}: list")
+            print(f"  長度: {count}")
+
 if __name__ == "__main__":
     # 你的 Notion URL
     notion_url = "https://file.notion.so/f/f/d70b900c-92f2-4d32-870b-1fa0d80e953b/2cc1982f-a835-4d84-9002-318758475632/output_clean_date_technical.json?table=block&id=f447ef6f-695d-45bb-9e49-f6a9c2e5ddd0&spaceId=d70b900c-92f2-4d32-870b-1fa0d80e953b&expirationTimestamp=1757541600000&signature=tMAguhh67Khr95BrN0qd39SPDMimj3gtXdsbwGQNwmA&downloadName=output_clean_date_technical.json"
     
-    # 獲取 JSON 資料
-    data = fetch_json_from_url(notion_url)
+    # 直接串流下載到本地檔案，不在記憶體中解析後重新輸出
+    result = download_json_to_file(notion_url, 'output_data.json')
     
-    if data:
+    if result:
         print("成功獲取 JSON 資料!")
+        print(f"資料已保存到 {result['path']} ({result['bytes']:,} bytes, sha256={result['sha256']})")
         
         # 顯示 JSON 結構
         print("\nJSON 結構:")
-        for key in data.keys():
-            print(f"- {key}: {type(data[key])}")
-            if isinstance(data[key], list):
-                print(f"  長度: {len(data[key])}")
-            elif isinstance(data[key], dict):
-                print(f"  鍵數量: {len(data[key])}")
-        
-        # 美化輸出整個 JSON (可選，如果資料很大可能會很長)
-        print("\n完整 JSON 資料 (前1000個字符):")
-        json_str = json.dumps(data, indent=2, ensure_ascii=False)
-        print(json_str[:1000] + "..." if len(json_str) > 1000 else json_str)
-        
-        # 如果你想要保存到本地檔案
-        with open('output_data.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print("\n資料已保存到 output_data.json")
+        print_json_summary(result['path'])
         
     else:
-        print("無法獲取 JSON 資料")
\ No newline at end of file
+        print("無法獲取 JSON 資料")
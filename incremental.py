@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量更新模組
+每檔股票在合併結果分區中記錄已合併到的最後交易日（high-water mark）與各季度表格已見過的公告日:
+
+    output_dir/symbol=<股票代碼>/merged.<副檔名>            第一次完整合併的結果
+    output_dir/symbol=<股票代碼>/merged-part<序號>.<副檔名>  之後每次追加的新列
+    output_dir/symbol=<股票代碼>/incremental.json           增量狀態
+
+每次更新只轉換並合併日期晚於 high-water mark 的日資料（historicalPriceFull、tech*），結果寫成新的分段；
+只有出現新公告的季度記錄時，才重新對應受影響交易日的季度欄位。更新耗時只與新增的資料量成正比
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from json_to_dataframe import process_all_data_streaming
+from merge_financial_data import (AVAILABLE_TABLES, DAILY_TABLES_AVAILABLE, align_quarterly_table,
+                                  combine_aligned_columns, merge_selected_data, quarterly_period_keys, table_key)
+from table_io import DEFAULT_FORMAT, ask_format, load_table, save_table
+from universe import discover_payloads, list_symbols, part_name, partition_dir
+
+STATE_FILE = 'incremental.json'
+MERGED_NAME = 'merged'
+
+# 第一次合併時，最近幾個日曆季度的交易日另外寫成一個分段，之後出現新公告時只需改寫這個較小的分段
+RECENT_QUARTERS = 2
+
+
+def read_state(symbol_dir):
+    """讀取股票分區的增量狀態，尚未建立時回傳 None"""
+    path = os.path.join(symbol_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_state(symbol_dir, state):
+    """以暫存檔替換的方式寫入增量狀態（分段檔案全部寫完後才更新，中斷時不會記錄不完整的分段）"""
+    path = os.path.join(symbol_dir, STATE_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def filing_dates(quarterly_df):
+    """季度表格中所有記錄的公告日（YYYY-MM-DD 字串，排序後）"""
+    if quarterly_df is None or 'date' not in quarterly_df.columns:
+        return []
+    dates = pd.to_datetime(quarterly_df['date']).dropna()
+    return sorted(set(dates.dt.strftime('%Y-%m-%d')))
+
+
+def reattach_start(quarterly_df, new_dates, quarterly_mode):
+    """
+    新公告的季度記錄最早會影響到的交易日
+
+    日曆季度模式影響該記錄所屬季度的第一天起；as-of 模式影響公告日當天起
+    """
+    rows = quarterly_df[pd.to_datetime(quarterly_df['date']).dt.strftime('%Y-%m-%d').isin(new_dates)]
+    if quarterly_mode == 'asof':
+        return pd.to_datetime(rows['date']).min()
+    keys = quarterly_period_keys(rows)
+    keys = keys[keys >= 0]
+    if len(keys) == 0:
+        return None
+    key = int(keys.min())
+    return pd.Timestamp(year=key // 4, month=key % 4 * 3 + 1, day=1)
+
+
+def payload_tables(payload_path, symbol, selected_tables, daily_tables, since=None):
+    """
+    轉換 payload 為合併用的表格提供者
+
+    payload 中沒有（或增量轉換後沒有新記錄）的表格以空表格代替，避免 merge_selected_data 改從磁碟讀取同名表格
+    """
+    tables = process_all_data_streaming(payload_path, symbol=symbol, since=since)
+    for source, _ in selected_tables:
+        tables.setdefault(table_key(source), pd.DataFrame(columns=['date', 'symbol', 'calendarYear', 'period']))
+    for source, _ in daily_tables or []:
+        tables.setdefault(table_key(source), pd.DataFrame(columns=['date', 'symbol']))
+    return tables
+
+
+def part_entry(path, df):
+    """分段在增量狀態中的記錄"""
+    dates = pd.to_datetime(df['date'])
+    return {'file': os.path.basename(path), 'rows': len(df),
+            'first_date': str(dates.min().date()), 'last_date': str(dates.max().date())}
+
+
+def write_part(symbol_dir, state, df, fmt):
+    """將 DataFrame 依日期排序後寫成下一個分段，回傳分段記錄"""
+    df = df.sort_values('date', kind='mergesort').reset_index(drop=True)
+    number = state['next_part']
+    state['next_part'] += 1
+    path = save_table(df, os.path.join(symbol_dir, part_name(MERGED_NAME, number)), fmt)
+    return part_entry(path, df)
+
+
+def remove_part(symbol_dir, entry):
+    """刪除分段檔案（npcol 為目錄）"""
+    path = os.path.join(symbol_dir, entry['file'])
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def load_parts(symbol_dir, entries):
+    """依序讀取並串接分段"""
+    return pd.concat([load_table(os.path.join(symbol_dir, entry['file'])) for entry in entries], ignore_index=True)
+
+
+def recent_start(high_water):
+    """最近 RECENT_QUARTERS 個日曆季度（含 high_water 所在季度）的第一天"""
+    key = high_water.year * 4 + (high_water.month - 1) // 3 - (RECENT_QUARTERS - 1)
+    return pd.Timestamp(year=key // 4, month=key % 4 * 3 + 1, day=1)
+
+
+def merge_options_key(quarterly_mode, max_staleness, columns):
+    """影響合併結果的選項；與狀態中記錄的不同時必須完整重建"""
+    return {'quarterly_mode': quarterly_mode, 'max_staleness': max_staleness,
+            'columns': list(columns) if columns is not None else None}
+
+
+def rebuild_symbol(symbol, payload_path, output_dir, selected_tables, daily_tables, fmt, options):
+    """完整轉換並合併一檔股票，清除舊的分段並建立新的增量狀態"""
+    symbol_dir = partition_dir(output_dir, symbol)
+    if os.path.isdir(symbol_dir):
+        shutil.rmtree(symbol_dir)
+    os.makedirs(symbol_dir)
+
+    tables = payload_tables(payload_path, symbol, selected_tables, daily_tables)
+    merged = merge_selected_data(selected_tables, daily_tables, historical_file='historicalPriceFull',
+                                 tables=tables, **options)
+    state = {'options': options, 'next_part': 0, 'parts': [], 'columns': list(merged.columns),
+             'filings': {table_key(source): filing_dates(tables.get(table_key(source)))
+                         for source, _ in selected_tables}}
+    dates = pd.to_datetime(merged['date'])
+    recent = dates >= recent_start(dates.max())
+    for rows in (merged[~recent], merged[recent]):
+        if len(rows):
+            state['parts'].append(write_part(symbol_dir, state, rows, fmt))
+    state['high_water'] = state['parts'][-1]['last_date']
+    write_state(symbol_dir, state)
+    return {'mode': 'rebuild', 'appended': len(merged), 'reattached': 0}
+
+
+def update_symbol(symbol, payload_path, output_dir, selected_tables, daily_tables=None, fmt=DEFAULT_FORMAT,
+                  quarterly_mode='calendar', max_staleness=None, columns=None):
+    """
+    以增量方式更新一檔股票的合併結果
+
+    1. 只轉換日期晚於 high-water mark 的日資料列，與季度表格合併後寫成新的分段
+    2. 季度表格出現新的公告日時，讀回受影響的分段，重新對應這些交易日的季度欄位後改寫為一個分段
+    3. 新分段不小於前一個追加分段時與其合併（依大小分層壓實），分段數量與每列被改寫的次數都只隨追加次數對數成長
+    4. 尚無增量狀態或合併選項改變時，完整重建該股票
+
+    Args:
+        symbol (str): 股票代碼
+        payload_path (str): 此股票最新的 payload（JSON 或快照）
+        output_dir (str): 合併結果的分區目錄
+        selected_tables (list): 季度表格 (路徑, 名稱) 列表
+        daily_tables (list): 日資料表格 (路徑, 名稱) 列表
+        fmt (str): 分段輸出格式
+        quarterly_mode, max_staleness, columns: 傳給 merge_selected_data 的合併選項
+
+    Returns:
+        dict: {'mode': 'rebuild' / 'append' / 'unchanged', 'appended': 新增列數, 'reattached': 重新對應季度欄位的列數}
+    """
+    options = merge_options_key(quarterly_mode, max_staleness, columns)
+    symbol_dir = partition_dir(output_dir, symbol)
+    state = read_state(symbol_dir)
+    if state is None or state['options'] != options:
+        if state is not None:
+            print(f"{symbol}: 合併選項與上次不同，完整重建")
+        return rebuild_symbol(symbol, payload_path, output_dir, selected_tables, daily_tables, fmt, options)
+
+    high_water = pd.Timestamp(state['high_water'])
+    tables = payload_tables(payload_path, symbol, selected_tables, daily_tables, since=high_water)
+    delta = tables.get('historicalPriceFull')
+    delta_rows = 0 if delta is None else len(delta)
+
+    # 比對各季度表格的公告日，找出新公告最早影響到的已合併交易日
+    start = None
+    filings = {}
+    for source, _ in selected_tables:
+        name = table_key(source)
+        filings[name] = filing_dates(tables.get(name))
+        new_dates = sorted(set(filings[name]) - set(state['filings'].get(name, [])))
+        if new_dates:
+            table_start = reattach_start(tables[name], new_dates, quarterly_mode)
+            if table_start is not None and table_start <= high_water and (start is None or table_start < start):
+                start = table_start
+
+    if delta_rows == 0 and start is None:
+        state['filings'] = filings
+        write_state(symbol_dir, state)
+        return {'mode': 'unchanged', 'appended': 0, 'reattached': 0}
+
+    frames = []
+    if delta_rows:
+        frames.append(merge_selected_data(selected_tables, daily_tables, historical_file='historicalPriceFull',
+                                          tables=tables, quarterly_mode=quarterly_mode,
+                                          max_staleness=max_staleness, columns=columns))
+
+    # 新公告影響已合併的交易日: 只讀回 last_date 在影響範圍內的分段，重新對應季度欄位
+    reattached = 0
+    rewrite = []
+    if start is not None:
+        rewrite = [entry for entry in state['parts'] if pd.Timestamp(entry['last_date']) >= start]
+        existing = load_parts(symbol_dir, rewrite)
+        affected = existing['date'] >= start
+        rows = existing[affected]
+        aligned_tables = []
+        for source, table_name in selected_tables:
+            quarterly_df = tables[table_key(source)]
+            output_columns = [col for col in quarterly_df.columns if col in existing.columns]
+            aligned_tables.append(align_quarterly_table(rows, quarterly_df, table_name, quarterly_mode,
+                                                        max_staleness, output_columns))
+        frames.insert(0, pd.concat([existing[~affected], combine_aligned_columns(rows, aligned_tables)]))
+        reattached = int(affected.sum())
+
+    # 欄位順序與第一次合併相同；新出現的欄位附加在最後
+    combined = pd.concat(frames, ignore_index=True)
+    extra = [col for col in combined.columns if col not in state['columns']]
+    if extra:
+        print(f"{symbol}: 警告: 新增的數據包含之前沒有的欄位 {extra}，之前的分段中為缺失值")
+        state['columns'].extend(extra)
+    combined = combined.reindex(columns=state['columns'])
+
+    # 依大小分層壓實: 由後往前併入列數不大於目前累積列數的追加分段（第一個分段不併入）
+    kept = [entry for entry in state['parts'] if entry not in rewrite]
+    merged_parts = []
+    while len(kept) > 1 and kept[-1]['rows'] <= len(combined) + sum(entry['rows'] for entry in merged_parts):
+        merged_parts.insert(0, kept.pop())
+    if merged_parts:
+        combined = pd.concat([load_parts(symbol_dir, merged_parts), combined], ignore_index=True)
+        rewrite.extend(merged_parts)
+
+    new_entry = write_part(symbol_dir, state, combined, fmt)
+    state['parts'] = [entry for entry in state['parts'] if entry not in rewrite] + [new_entry]
+    state['parts'].sort(key=lambda entry: entry['first_date'])
+    state['high_water'] = max(state['high_water'], new_entry['last_date'])
+    state['filings'] = filings
+    write_state(symbol_dir, state)
+    for entry in rewrite:
+        remove_part(symbol_dir, entry)
+    return {'mode': 'append', 'appended': delta_rows, 'reattached': reattached}
+
+
+def update_universe(payloads, output_dir, selected_tables, daily_tables=None, fmt=DEFAULT_FORMAT, **merge_options):
+    """
+    以增量方式更新多檔股票的合併結果（結果可用 universe.read_symbol_partitions(output_dir, 'merged') 讀取）
+
+    Args:
+        payloads (dict): {股票代碼: 最新 payload 路徑}
+        output_dir (str): 合併結果的分區目錄
+        selected_tables (list): 季度表格 (路徑, 名稱) 列表
+        daily_tables (list): 日資料表格 (路徑, 名稱) 列表
+        fmt (str): 分段輸出格式
+        **merge_options: 傳給 merge_selected_data 的其他參數（quarterly_mode、max_staleness、columns）
+
+    Returns:
+        dict: {股票代碼: update_symbol 的結果}，失敗的股票不會出現在結果中
+    """
+    results = {}
+    for i, (symbol, payload_path) in enumerate(sorted(payloads.items()), 1):
+        try:
+            # 合併過程的逐表訊息不輸出，只顯示每檔股票的摘要
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[symbol] = update_symbol(symbol, payload_path, output_dir, selected_tables, daily_tables,
+                                                fmt, **merge_options)
+            result = results[symbol]
+            print(f"[{i}/{len(payloads)}] {symbol}: {result['mode']}，新增 {result['appended']} 列"
+                  + (f"，重新對應季度數據 {result['reattached']} 列" if result['reattached'] else ""))
+        except Exception as e:
+            print(f"[{i}/{len(payloads)}] {symbol}: 更新失敗 ({e})")
+    return results
+
+
+def main():
+    """
+    以 payload 目錄中每檔股票最新的 payload 增量更新合併結果
+    """
+    payload_dir = input("請輸入 payload 目錄（每檔股票一個 {symbol}.json）: ").strip()
+    output_dir = input("請輸入合併結果目錄（預設為 universe/incremental）: ").strip() or 'universe/incremental'
+    fmt = ask_format()
+
+    payloads = discover_payloads(payload_dir)
+    if not payloads:
+        print(f"❌ {payload_dir} 中沒有 payload 檔案")
+        return
+
+    results = update_universe(payloads, output_dir, list(AVAILABLE_TABLES.values()),
+                              list(DAILY_TABLES_AVAILABLE.values()), fmt=fmt)
+    appended = sum(result['appended'] for result in results.values())
+    print(f"完成 {len(results)}/{len(payloads)} 檔股票，共新增 {appended:,} 列"
+          f"（目前共 {len(list_symbols(output_dir))} 檔股票）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技術指標串流更新模組
+每檔股票保存所有 tech{窗口} 指標的計算狀態（滾動加總、EMA 延續值、Wilder 平均與窗口緩衝區）:
+
+    dataset_dir/symbol=<股票代碼>/indicators.json
+
+新增一個交易日時只以該日的 OHLCV 更新狀態，每個窗口的每個指標都是常數時間，不需要重新計算整段歷史。
+計算規則與 indicators.compute_tech_tables 相同，串流結果與批次重新計算一致（只有浮點誤差）
+"""
+
+import json
+import math
+import os
+from collections import deque
+
+import pandas as pd
+
+from indicators import PRICE_FIELDS, TECH_INDICATORS
+from section_schema import TECH_WINDOWS
+from universe import PartitionedTable, list_symbols, partition_dir
+
+INDICATOR_STATE_FILE = 'indicators.json'
+
+# 每個 tech{窗口} 表格的欄位後綴（date、symbol 之後）
+TECH_SUFFIXES = [suffix for _, suffix in PRICE_FIELDS] + list(TECH_INDICATORS)
+
+
+class WindowState:
+    """單一窗口的指標狀態"""
+
+    def __init__(self, window):
+        self.window = window
+        # 窗口內以第一筆收盤價平移後的收盤價，與其加總、平方和及線性加權和
+        self.closes = deque(maxlen=window)
+        self.total = 0.0
+        self.squares = 0.0
+        self.weighted = 0.0
+        # 單調佇列: [(交易日序號, 價格)]，佇列頭為窗口內的最高價 / 最低價
+        self.highs = deque()
+        self.lows = deque()
+        self.ema = None
+        # 起始日之前為累計總和，之後為 Wilder 平均
+        self.gain = 0.0
+        self.loss = 0.0
+        self.plus = 0.0
+        self.minus = 0.0
+        self.adx = 0.0
+
+    def update(self, day, high, low, close, shifted, change, dm_plus, dm_minus):
+        """
+        加入第 day 個交易日（從 0 起算）
+
+        Returns:
+            dict: {指標: 值}
+        """
+        n = self.window
+        count = len(self.closes)
+        if count == n:
+            # 每個舊值的權重減 1，最舊的一筆（權重 1）移出窗口
+            self.weighted += n * shifted - self.total
+            dropped = self.closes[0]
+            self.total -= dropped
+            self.squares -= dropped * dropped
+        else:
+            count += 1
+            self.weighted += count * shifted
+        self.closes.append(shifted)
+        if (day + 1) % n == 0:
+            # 每 n 日由緩衝區重新精確加總一次（攤提後仍為常數時間），避免逐日加減累積捨入誤差
+            self.total = math.fsum(self.closes)
+            self.squares = math.fsum(value * value for value in self.closes)
+            self.weighted = math.fsum(k * value for k, value in enumerate(self.closes, 1))
+        else:
+            self.total += shifted
+            self.squares += shifted * shifted
+        mean = self.total / count
+
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((day, high))
+        while self.highs[0][0] <= day - n:
+            self.highs.popleft()
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((day, low))
+        while self.lows[0][0] <= day - n:
+            self.lows.popleft()
+        highest = self.highs[0][1]
+        spread = highest - self.lows[0][1]
+
+        alpha = 2 / (n + 1)
+        if self.ema is None:
+            self.ema = [close, close, close]
+        else:
+            self.ema[0] += alpha * (close - self.ema[0])
+            self.ema[1] += alpha * (self.ema[0] - self.ema[1])
+            self.ema[2] += alpha * (self.ema[1] - self.ema[2])
+        ema1, ema2, ema3 = self.ema
+
+        gain = max(change, 0.0)
+        loss = max(-change, 0.0)
+        rsi = adx = 0.0
+        if day < n:
+            self.gain += gain
+            self.loss -= loss
+            self.plus += dm_plus
+            self.minus += dm_minus
+            if day == n - 1:
+                self.gain /= n
+                self.loss /= n
+                self.plus /= n
+                self.minus /= n
+        else:
+            self.gain += (gain - self.gain) / n
+            self.loss += (loss - self.loss) / n
+            self.plus += (dm_plus - self.plus) / n
+            self.minus += (dm_minus - self.minus) / n
+        if day >= n - 1:
+            rsi = 100 - 100 / (1 + self.gain / self.loss) if self.loss != 0 else 100.0
+            total = self.plus + self.minus
+            dx = 100 * abs(self.plus - self.minus) / total if total > 0 else 0.0
+            self.adx = dx / n if day == n - 1 else self.adx + (dx - self.adx) / n
+            adx = self.adx
+
+        return {
+            'SMA': mean,
+            'EMA': ema1,
+            'WMA': self.weighted / (count * (count + 1) / 2),
+            'DEMA': 2 * ema1 - ema2,
+            'TEMA': 3 * ema1 - 3 * ema2 + ema3,
+            'Williams': -100 * (highest - close) / spread if spread > 0 else 0.0,
+            'RSI': rsi,
+            'ADX': adx,
+            'StandardDeviation': max(self.squares / count - mean * mean, 0.0) ** 0.5,
+        }
+
+    def to_dict(self):
+        """轉為可寫入 JSON 的字典"""
+        state = dict(vars(self))
+        for key in ('closes', 'highs', 'lows'):
+            state[key] = list(state[key])
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """由 to_dict 的結果還原"""
+        window_state = cls(state['window'])
+        for key, value in state.items():
+            setattr(window_state, key, value)
+        window_state.closes = deque(state['closes'], maxlen=state['window'])
+        window_state.highs = deque(tuple(item) for item in state['highs'])
+        window_state.lows = deque(tuple(item) for item in state['lows'])
+        return window_state
+
+
+class IndicatorState:
+    """一檔股票所有窗口的指標狀態，以及已處理到的最後交易日（high-water mark）"""
+
+    def __init__(self, windows=TECH_WINDOWS):
+        self.days = 0
+        self.last_date = None
+        self.reference = None
+        self.prev_high = 0.0
+        self.prev_low = 0.0
+        self.prev_close = None
+        self.windows = {window: WindowState(window) for window in windows}
+
+    def update(self, date, open_, high, low, close, volume):
+        """
+        加入一個交易日，回傳該日所有 tech{窗口} 欄位的值
+
+        Returns:
+            dict: {'tech{窗口}{後綴}': 值}
+        """
+        if self.reference is None:
+            self.reference = close
+        change = close - self.prev_close if self.prev_close is not None else 0.0
+        # 與資料來源一致，第一日的前一日最高價與最低價視為 0
+        up = high - self.prev_high
+        down = self.prev_low - low
+        dm_plus = up if up > down and up > 0 else 0.0
+        dm_minus = down if down > up and down > 0 else 0.0
+        shifted = close - self.reference
+
+        prices = {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+        row = {}
+        for window, window_state in self.windows.items():
+            for source, suffix in PRICE_FIELDS:
+                row[f"tech{window}{suffix}"] = prices[source]
+            values = window_state.update(self.days, high, low, close, shifted, change, dm_plus, dm_minus)
+            values['SMA'] += self.reference
+            values['WMA'] += self.reference
+            for name in TECH_INDICATORS:
+                row[f"tech{window}{name}"] = values[name]
+
+        self.days += 1
+        self.last_date = pd.Timestamp(date).strftime('%Y-%m-%d')
+        self.prev_high = high
+        self.prev_low = low
+        self.prev_close = close
+        return row
+
+    def to_dict(self):
+        """轉為可寫入 JSON 的字典"""
+        state = {key: value for key, value in vars(self).items() if key != 'windows'}
+        state['windows'] = [window_state.to_dict() for window_state in self.windows.values()]
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """由 to_dict 的結果還原"""
+        indicator_state = cls(windows=())
+        for key, value in state.items():
+            if key != 'windows':
+                setattr(indicator_state, key, value)
+        for window_state in state['windows']:
+            indicator_state.windows[window_state['window']] = WindowState.from_dict(window_state)
+        return indicator_state
+
+
+def read_indicator_state(symbol_dir):
+    """讀取股票分區的指標狀態，尚未建立時回傳 None"""
+    path = os.path.join(symbol_dir, INDICATOR_STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return IndicatorState.from_dict(json.load(f))
+
+
+def write_indicator_state(symbol_dir, state):
+    """以暫存檔替換的方式寫入指標狀態"""
+    os.makedirs(symbol_dir, exist_ok=True)
+    path = os.path.join(symbol_dir, INDICATOR_STATE_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def stream_tech_tables(state, prices):
+    """
+    將 prices 中晚於 high-water mark 的交易日依序加入狀態
+
+    Args:
+        state (IndicatorState): 股票的指標狀態（會被更新）
+        prices (pd.DataFrame): 該股票的 historicalPriceFull 表格（可包含已處理過的交易日）
+
+    Returns:
+        dict: {'tech{窗口}': 新增交易日的 DataFrame}，欄位與 compute_tech_tables 相同
+    """
+    df = prices.sort_values('date', kind='stable')
+    if state.last_date is not None:
+        df = df[pd.to_datetime(df['date']) > pd.Timestamp(state.last_date)]
+
+    rows = pd.DataFrame([state.update(*values) for values in zip(df['date'], df['open'], df['high'], df['low'],
+                                                                   df['close'], df['volume'])])
+    tables = {}
+    for window in state.windows:
+        columns = [f"tech{window}{suffix}" for suffix in TECH_SUFFIXES]
+        table = rows.reindex(columns=columns)
+        table.insert(0, 'date', pd.to_datetime(df['date']).to_numpy())
+        table.insert(1, 'symbol', df['symbol'].to_numpy())
+        tables[f"tech{window}"] = table
+    return tables
+
+
+def update_indicators(symbol_dir, prices, windows=TECH_WINDOWS):
+    """
+    以股票的最新歷史價格更新指標狀態（尚無狀態時從第一個交易日開始建立）
+
+    Returns:
+        dict: {'tech{窗口}': 新增交易日的 DataFrame}
+    """
+    state = read_indicator_state(symbol_dir) or IndicatorState(windows)
+    tables = stream_tech_tables(state, prices)
+    write_indicator_state(symbol_dir, state)
+    return tables
+
+
+def main():
+    """
+    以資料集中各股票的 historicalPriceFull 更新指標狀態，並顯示最新一個交易日的指標
+    """
+    dataset_dir = input("請輸入資料集目錄（universe.py 轉換後的 tables 目錄）: ").strip()
+    symbols = list_symbols(dataset_dir)
+    if not symbols:
+        print(f"❌ {dataset_dir} 中沒有股票分區")
+        return
+
+    for symbol in symbols:
+        table = PartitionedTable(dataset_dir, 'historicalPriceFull', [symbol])
+        if not table.files:
+            print(f"⚠️ {symbol} 沒有 historicalPriceFull 表格，略過")
+            continue
+        new_tables = update_indicators(partition_dir(dataset_dir, symbol), table.load(None))
+        new_rows = next(iter(new_tables.values()))
+        if new_rows.empty:
+            print(f"{symbol}: 沒有新的交易日")
+            continue
+        latest = {name: rows[f"{name}RSI"].iloc[-1] for name, rows in new_tables.items()}
+        print(f"{symbol}: 新增 {len(new_rows)} 個交易日，最新 RSI " +
+              ", ".join(f"{name} {value:.2f}" for name, value in latest.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技術指標計算模組
+由 historicalPriceFull 的 OHLCV 在本機計算與遠端 tech5 / tech20 / tech60 / tech252 區段相同的
+SMA、EMA、WMA、DEMA、TEMA、Williams、RSI、ADX 與 StandardDeviation 欄位。
+
+所有股票先轉為 (股票數, 交易日數) 的二維陣列（每檔股票靠左對齊，不足補 NaN）:
+滾動指標以累積和與區塊前後綴極值一次算出所有窗口；遞迴指標（EMA 鏈、Wilder 平滑）只逐日迭代一次，
+每一步同時更新所有股票與所有窗口的狀態
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from section_schema import TECH_FIELDS, TECH_WINDOWS
+from table_io import find_table, load_table, save_table
+
+# 計算的指標（tech{窗口}{指標} 欄位後綴，與 TECH_FIELDS 中 OHLCV 之後的欄位相同）
+TECH_INDICATORS = ('SMA', 'EMA', 'WMA', 'DEMA', 'TEMA', 'Williams', 'RSI', 'ADX', 'StandardDeviation')
+
+# 直接複製為 tech{窗口}Open 等欄位的價格欄位
+PRICE_FIELDS = [(source, suffix) for source, suffix, _ in TECH_FIELDS if suffix not in TECH_INDICATORS]
+
+
+def price_panel(prices, fields=('open', 'high', 'low', 'close')):
+    """
+    將（可含多檔股票的）歷史價格轉為二維陣列
+
+    Returns:
+        tuple: (依 symbol、date 排序的價格表, (股票序號, 交易日序號), {欄位: (股票數, 最長交易日數) 陣列})
+    """
+    df = prices.sort_values(['symbol', 'date'], kind='stable').reset_index(drop=True)
+    codes, _ = pd.factorize(df['symbol'])
+    counts = np.bincount(codes)
+    starts = np.cumsum(counts) - counts
+    position = np.arange(len(df)) - np.repeat(starts, counts)
+
+    panels = {}
+    for field in fields:
+        panel = np.full((len(counts), counts.max() if len(counts) else 0), np.nan)
+        panel[codes, position] = df[field].to_numpy(dtype='float64')
+        panels[field] = panel
+    return df, (codes, position), panels
+
+
+def normalize_windows(windows):
+    """檢查並去除重複的窗口（保留順序）"""
+    windows = list(dict.fromkeys(int(window) for window in windows))
+    if not windows or min(windows) < 1:
+        raise ValueError(f"窗口必須是正整數: {windows}")
+    return windows
+
+
+def prefix_sums(x):
+    """
+    沿交易日方向的累積和（前面補一個 0），所有窗口共用；任一窗口的滾動加總都是兩個累積和相減
+
+    累積和以延伸精度（long double）計算，避免長歷史的累積值吃掉窗口內的有效位數
+    """
+    total = np.zeros((x.shape[0], x.shape[1] + 1), dtype=np.longdouble)
+    np.cumsum(x, axis=1, out=total[:, 1:])
+    return total
+
+
+def window_sum(prefix, window):
+    """由共用的累積和取出 window 日的滾動加總，前 window - 1 日以已有的數據計算"""
+    days = prefix.shape[1] - 1
+    start = np.maximum(np.arange(1, days + 1) - window, 0)
+    return (prefix[:, 1:] - prefix[:, start]).astype('float64')
+
+
+def max_table(x, max_window):
+    """
+    滾動最大值的稀疏表（所有窗口共用）: 第 k 層為每個位置起長度 2^k 的區間最大值，由上一層錯開 2^(k-1) 的兩個視圖取最大值
+
+    序列前面補 max_window - 1 個 -inf，使前 window - 1 日以已有的數據計算
+    """
+    pad = max_window - 1
+    levels = [np.concatenate([np.full((x.shape[0], pad), -np.inf), x], axis=1)]
+    while 2 ** len(levels) <= max_window:
+        previous = levels[-1]
+        half = 2 ** (len(levels) - 1)
+        levels.append(np.maximum(previous[:, :-half], previous[:, half:]))
+    return levels
+
+
+def window_max(levels, window, days):
+    """由稀疏表取出 window 日的滾動最大值: 窗口的最大值為頭尾兩個（可重疊的）2^k 長度區間的最大值"""
+    pad = levels[0].shape[1] - days
+    k = window.bit_length() - 1
+    length = 2 ** k
+    level = levels[k]
+    head = pad - window + 1
+    tail = pad - length + 1
+    return np.maximum(level[:, head:head + days], level[:, tail:tail + days])
+
+
+def rolling_indicators(panels, windows):
+    """
+    SMA、WMA、Williams 與 StandardDeviation（前 window - 1 日以已有的數據計算）
+
+    累積和與滾動最大 / 最小值的稀疏表只計算一次，所有窗口共用
+
+    Returns:
+        dict: {指標: (股票數, 交易日數, 窗口數) 陣列}
+    """
+    close = panels['close']
+    stocks, days = close.shape
+
+    # 以第一筆收盤價為基準平移，避免累積和與平方和的數值抵消
+    reference = close[:, :1]
+    shifted = close - reference
+    day = np.arange(days, dtype='float64')
+    sums = prefix_sums(shifted)
+    squares = prefix_sums(shifted * shifted)
+    products = prefix_sums(shifted * day)
+    highs = max_table(panels['high'], max(windows))
+    lows = max_table(-panels['low'], max(windows))
+
+    outputs = {name: np.empty((stocks, days, len(windows))) for name in ('SMA', 'WMA', 'Williams',
+                                                                          'StandardDeviation')}
+    for w, window in enumerate(windows):
+        count = np.minimum(day + 1, window)
+        total = window_sum(sums, window)
+        mean = total / count
+        variance = window_sum(squares, window) / count - mean * mean
+        # 加權: 窗口內第 k 日（由舊到新，k = 1..count）權重為 k
+        weighted = window_sum(products, window) - (day - count) * total
+
+        highest = window_max(highs, window, days)
+        spread = highest + window_max(lows, window, days)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            williams = np.where(spread > 0, -100 * (highest - close) / spread, 0.0)
+
+        outputs['SMA'][:, :, w] = mean + reference
+        outputs['WMA'][:, :, w] = weighted / (count * (count + 1) / 2) + reference
+        outputs['Williams'][:, :, w] = williams
+        outputs['StandardDeviation'][:, :, w] = np.sqrt(np.maximum(variance, 0))
+    return outputs
+
+
+def directional_movement(panels):
+    """
+    每日的 +DM / -DM；與資料來源一致，第一日的前一日最高價與最低價視為 0
+    """
+    high = panels['high']
+    low = panels['low']
+    up = high - np.concatenate([np.zeros((len(high), 1)), high[:, :-1]], axis=1)
+    down = np.concatenate([np.zeros((len(low), 1)), low[:, :-1]], axis=1) - low
+    plus = np.where((up > down) & (up > 0), up, 0.0)
+    minus = np.where((down > up) & (down > 0), down, 0.0)
+    return plus, minus
+
+
+def recursive_indicators(panels, windows):
+    """
+    EMA、DEMA、TEMA、RSI 與 ADX: 逐日迭代一次，每一步以 (股票數, 窗口數) 的陣列同時更新所有股票與窗口
+
+    與資料來源一致:
+    - EMA 以第一日收盤價為起點，alpha = 2 / (窗口 + 1)
+    - RSI 在第 window 日（序號 window - 1）以前 window - 1 日的漲幅總和 / window 與跌幅（負值）總和 / window 起始，
+      之後以 Wilder 平滑更新（跌幅取正值），之前為 0
+    - ADX 的 +DM / -DM 以前 window 日總和 / window 起始後 Wilder 平滑（DI 的 TR 分母在 DX 中互相抵消），
+      ADX 以第一個 DX / window 起始（資料來源的起始值無法重現，差異每日以 (window - 1) / window 衰減），之前為 0
+    """
+    close = panels['close']
+    stocks, days = close.shape
+    n = np.asarray(windows, dtype='float64')
+    alpha = 2 / (n + 1)
+
+    change = np.diff(close, axis=1, prepend=np.nan)
+    gain = np.where(change > 0, change, 0.0)
+    loss = np.where(change < 0, -change, 0.0)
+    plus, minus = directional_movement(panels)
+
+    # 各窗口的起始值（第 window - 1 日）
+    seed_day = np.minimum(np.asarray(windows) - 1, max(days - 1, 0))
+    seed_gain = np.cumsum(gain, axis=1)[:, seed_day] / n
+    seed_loss = -np.cumsum(loss, axis=1)[:, seed_day] / n
+    seed_plus = np.cumsum(plus, axis=1)[:, seed_day] / n
+    seed_minus = np.cumsum(minus, axis=1)[:, seed_day] / n
+
+    # 輸出先以 (交易日數, 股票數, 窗口數) 排列，每一步寫入連續的記憶體
+    shape = (days, stocks, len(windows))
+    outputs = {name: np.zeros(shape) for name in ('EMA', 'DEMA', 'TEMA', 'RSI', 'ADX')}
+    ema1 = ema2 = ema3 = None
+    avg_gain = np.zeros((stocks, len(windows)))
+    avg_loss = np.zeros_like(avg_gain)
+    avg_plus = np.zeros_like(avg_gain)
+    avg_minus = np.zeros_like(avg_gain)
+    adx = np.zeros_like(avg_gain)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for day in range(days):
+            price = close[:, day, None]
+            if day == 0:
+                ema1 = np.repeat(price, len(windows), axis=1)
+                ema2 = ema1.copy()
+                ema3 = ema1.copy()
+            else:
+                ema1 = ema1 + alpha * (price - ema1)
+                ema2 = ema2 + alpha * (ema1 - ema2)
+                ema3 = ema3 + alpha * (ema2 - ema3)
+            outputs['EMA'][day] = ema1
+            outputs['DEMA'][day] = 2 * ema1 - ema2
+            outputs['TEMA'][day] = 3 * ema1 - 3 * ema2 + ema3
+
+            # 起始日之前的狀態不會被輸出，所有窗口一律更新，到起始日再以起始值覆蓋
+            avg_gain += (gain[:, day, None] - avg_gain) / n
+            avg_loss += (loss[:, day, None] - avg_loss) / n
+            avg_plus += (plus[:, day, None] - avg_plus) / n
+            avg_minus += (minus[:, day, None] - avg_minus) / n
+            seeding = day == n - 1
+            if seeding.any():
+                avg_gain[:, seeding] = seed_gain[:, seeding]
+                avg_loss[:, seeding] = seed_loss[:, seeding]
+                avg_plus[:, seeding] = seed_plus[:, seeding]
+                avg_minus[:, seeding] = seed_minus[:, seeding]
+
+            rsi = np.where(avg_loss != 0, 100 - 100 / (1 + avg_gain / avg_loss), 100.0)
+            total = avg_plus + avg_minus
+            dx = np.where(total > 0, 100 * np.abs(avg_plus - avg_minus) / total, 0.0)
+            adx += (dx - adx) / n
+            if seeding.any():
+                adx[:, seeding] = dx[:, seeding] / n[seeding]
+
+            if day < n.max() - 1:
+                active = day >= n - 1
+                rsi = np.where(active, rsi, 0.0)
+                adx_out = np.where(active, adx, 0.0)
+            else:
+                adx_out = adx
+            outputs['RSI'][day] = rsi
+            outputs['ADX'][day] = adx_out
+    return {name: values.transpose(1, 0, 2) for name, values in outputs.items()}
+
+
+def compute_indicators(panels, windows=TECH_WINDOWS):
+    """
+    一次計算所有窗口的全部指標
+
+    Returns:
+        dict: {指標: (股票數, 交易日數, 窗口數) 陣列}
+    """
+    windows = normalize_windows(windows)
+    result = recursive_indicators(panels, windows)
+    result.update(rolling_indicators(panels, windows))
+    return result
+
+
+def block_columns(windows):
+    """寬表中指標欄位的名稱與順序: 依窗口分組，每組依 TECH_INDICATORS 的順序"""
+    return [f"tech{window}{name}" for window in windows for name in TECH_INDICATORS]
+
+
+def compute_tech_block(prices, windows=TECH_WINDOWS):
+    """
+    一次計算任意窗口組合的全部指標，輸出一個寬表
+
+    所有指標欄位位於同一個連續的 float64 二維陣列（單一 pandas 區塊），可直接作為一個日資料表格傳給
+    merge_selected_data 的 daily_tables，只需一次對齊，不需要每個窗口各自一個表格與一次 join
+
+    Args:
+        prices (pd.DataFrame): historicalPriceFull 表格（date、symbol 與 OHLCV 欄位，可含多檔股票）
+        windows (iterable): 任意窗口大小（例如 (3, 10, 20, 50, 120, 252)）
+
+    Returns:
+        pd.DataFrame: date、symbol 與 tech{窗口}{指標} 欄位，依 symbol、date 排序
+    """
+    windows = normalize_windows(windows)
+    df, (codes, position), panels = price_panel(prices)
+    values = compute_indicators(panels, windows)
+
+    block = np.empty((len(df), len(windows) * len(TECH_INDICATORS)))
+    for i, name in enumerate(TECH_INDICATORS):
+        # 每個指標一次取出所有列與窗口: (列數, 窗口數)
+        block[:, i::len(TECH_INDICATORS)] = values.pop(name)[codes, position]
+    result = pd.DataFrame(block, columns=block_columns(windows), copy=False)
+    result.insert(0, 'date', df['date'].to_numpy())
+    result.insert(1, 'symbol', df['symbol'].to_numpy())
+    return result
+
+
+def compute_tech_tables(prices, windows=TECH_WINDOWS):
+    """
+    由歷史價格計算 tech{窗口} 表格（與遠端 tech 區段相同的分表格式）
+
+    Args:
+        prices (pd.DataFrame): historicalPriceFull 表格（date、symbol 與 OHLCV 欄位，可含多檔股票）
+        windows (iterable): 窗口大小
+
+    Returns:
+        dict: {'tech{窗口}': DataFrame}，欄位與順序與 JSON 轉換的 tech 表格相同，依 symbol、date 排序
+    """
+    windows = normalize_windows(windows)
+    block = compute_tech_block(prices, windows)
+    df = prices.sort_values(['symbol', 'date'], kind='stable')
+
+    tables = {}
+    for window in windows:
+        columns = {'date': block['date'].to_numpy(), 'symbol': block['symbol'].to_numpy()}
+        for source, suffix in PRICE_FIELDS:
+            columns[f"tech{window}{suffix}"] = df[source].to_numpy()
+        for name in TECH_INDICATORS:
+            columns[f"tech{window}{name}"] = block[f"tech{window}{name}"].to_numpy()
+        tables[f"tech{window}"] = pd.DataFrame(columns)
+    return tables
+
+
+def compare_tech_tables(computed, reference, warmup=0):
+    """
+    比較計算結果與參考表格（例如 data/tech*.csv）
+
+    Args:
+        computed (pd.DataFrame): compute_tech_tables 產生的表格
+        reference (pd.DataFrame): 同名的參考表格
+        warmup (int): 每檔股票略過的前幾個交易日（ADX 的起始值與資料來源不同，需要一段時間收斂）
+
+    Returns:
+        dict: {欄位: 最大絕對誤差}
+    """
+    merged = computed.merge(reference, on=['date', 'symbol'], suffixes=('', '_ref'))
+    merged = merged[merged.groupby('symbol').cumcount() >= warmup]
+    return {col: float(np.nanmax(np.abs(merged[col].to_numpy(dtype='float64')
+                                        - merged[f"{col}_ref"].to_numpy(dtype='float64')), initial=0))
+            for col in computed.columns if f"{col}_ref" in merged.columns}
+
+
+def main():
+    """
+    由 data/historicalPriceFull 計算技術指標，與現有的 tech 表格比較後（可選）寫出
+    """
+    data_dir = input("請輸入數據目錄（預設為 data）: ").strip() or 'data'
+    price_path = find_table(os.path.join(data_dir, 'historicalPriceFull.csv'))
+    if price_path is None:
+        print(f"❌ {data_dir} 中沒有 historicalPriceFull 表格")
+        return
+
+    prices = load_table(price_path)
+    tables = compute_tech_tables(prices)
+    for name, table in tables.items():
+        reference_path = find_table(os.path.join(data_dir, f"{name}.csv"))
+        if reference_path is None:
+            continue
+        errors = compare_tech_tables(table, load_table(reference_path))
+        worst = max(errors, key=errors.get)
+        print(f"{name}: 最大誤差 {errors[worst]:.3g}（{worst}）")
+
+    output_dir = input("請輸入輸出目錄（留空則不寫出）: ").strip()
+    if output_dir:
+        for name, table in tables.items():
+            print(f"已寫出: {save_table(table, os.path.join(output_dir, f'{name}.csv'))}")
+
+        windows_input = input("其他窗口組合（以逗號分隔，例如 3,10,20,50,120,252；留空則略過）: ").strip()
+        if windows_input:
+            block = compute_tech_block(prices, [window for window in windows_input.split(',') if window.strip()])
+            print(f"已寫出: {save_table(block, os.path.join(output_dir, 'tech.csv'))}（{block.shape[1] - 2} 個指標欄位）")
+
+
+if __name__ == "__main__":
+    main()
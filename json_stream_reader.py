@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 串流讀取模組
+逐一走訪頂層 key，將陣列區段以固定大小的批次交出，記憶體用量只與批次大小有關
+"""
+
+import json
+
+# 每次從檔案讀取的字元數
+DEFAULT_READ_SIZE = 1 << 16
+
+# 每個批次的記錄數
+DEFAULT_CHUNK_SIZE = 1000
+
+_WHITESPACE = ' \t\n\r'
+
+
+class JsonStream:
+    """
+    以緩衝區方式逐步解析 JSON 文字的輔助類別
+    只保留尚未解析的部分，單一值（一筆記錄）才會完整進入記憶體
+    """
+
+    def __init__(self, file, read_size=DEFAULT_READ_SIZE):
+        self.file = file
+        self.read_size = read_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        """讀取更多文字到緩衝區，並丟棄已解析的部分；到達檔尾時回傳 False"""
+        if self.eof:
+            return False
+        text = self.file.read(self.read_size)
+        if not text:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """跳過空白並回傳下一個字元（檔尾時回傳空字串）"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        """確認下一個字元為 char 並略過"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON 格式錯誤: 預期 '{char}'，實際為 '{found}'（位置 {self.pos}）")
+        self.pos += 1
+
+    def decode_value(self):
+        """解析下一個完整的 JSON 值"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # 數字可能剛好被緩衝區截斷，必須確認後面還有其他字元
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_object_keys(self):
+        """走訪目前物件的每個 key，呼叫端必須在每次迭代中讀取對應的值"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"JSON 格式錯誤: 物件中出現非預期字元 '{char}'")
+
+    def iter_array_chunks(self, chunk_size):
+        """將目前陣列的元素以 chunk_size 為單位分批交出"""
+        self.expect('[')
+        chunk = []
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            chunk.append(self.decode_value())
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                break
+            if char != ',':
+                raise ValueError(f"JSON 格式錯誤: 陣列中出現非預期字元 '{char}'")
+        if chunk:
+            yield chunk
+
+
+def iter_json_sections(json_file_path, chunk_size=DEFAULT_CHUNK_SIZE, read_size=DEFAULT_READ_SIZE):
+    """
+    串流走訪 JSON 檔案的頂層區段
+
+    陣列區段（例如 financialGrowth、tech5）會以記錄批次交出；
+    物件區段（例如 historicalPriceFull）會再往下一層，以 "父鍵.子鍵" 作為路徑，
+    其中的陣列同樣分批交出（例如 historicalPriceFull.historical），其他值則整個交出。
+
+    Args:
+        json_file_path (str): JSON 檔案路徑
+        chunk_size (int): 每個批次的最大記錄數
+        read_size (int): 每次從檔案讀取的字元數
+
+    Yields:
+        tuple: (區段路徑, 記錄批次 list 或單一值)
+    """
+    with open(json_file_path, 'r', encoding='utf-8') as file:
+        stream = JsonStream(file, read_size)
+        for key in stream.iter_object_keys():
+            char = stream.peek()
+            if char == '[':
+                for chunk in stream.iter_array_chunks(chunk_size):
+                    yield key, chunk
+            elif char == '{':
+                for sub_key in stream.iter_object_keys():
+                    path = f"{key}.{sub_key}"
+                    if stream.peek() == '[':
+                        for chunk in stream.iter_array_chunks(chunk_size):
+                            yield path, chunk
+                    else:
+                        yield path, stream.decode_value()
+            else:
+                yield key, stream.decode_value()
+
+
+def summarize_json_sections(json_file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    串流統計每個區段的記錄數（非陣列的值記為 None），不需要載入整份 JSON
+
+    Returns:
+        dict: {區段路徑: 記錄數或 None}
+    """
+    summary = {}
+    for path, payload in iter_json_sections(json_file_path, chunk_size):
+        if isinstance(payload, list):
+            summary[path] = summary.get(path, 0) + len(payload)
+        else:
+            summary[path] = None
+    return summary
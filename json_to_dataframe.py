@@ -3,10 +3,28 @@ import sys
 import os
 import pandas as pd
 
+from json_stream_reader import DEFAULT_CHUNK_SIZE
+from snapshot_store import iter_sections
+from section_schema import SECTION_SCHEMAS, build_section_frame, is_daily_section
+from table_io import save_table
+
+
+def convert_historical_price_full(section):
+    """
+    將已解析的 historicalPriceFull 數據轉換為 DataFrame
+    
+    Args:
+        section (dict): JSON 中 historicalPriceFull 區段（含 symbol 與 historical）
+    
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由舊到新）
+    """
+    return build_section_frame(section['historical'], SECTION_SCHEMAS['historicalPriceFull'],
+                               constants={'symbol': section.get('symbol', None)})
 
 def process_historical_price_full(json_file_path):
     """
-    將 JSON 檔案中的 historicalPriceFull 數據轉換為 DataFrame
+    將 JSON 檔案中的 historicalPriceFull 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -14,50 +32,24 @@ def process_historical_price_full(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_historical_price_full(data['historicalPriceFull'])
+
+def convert_financial_growth(financial_growth_data):
+    """
+    將已解析的 financialGrowth 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得歷史價格數據
-    historical_data = data['historicalPriceFull']['historical']
-    symbol = data['historicalPriceFull'].get('symbol', None)
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in historical_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': symbol,
-            'open': record.get('open'),
-            'high': record.get('high'),
-            'low': record.get('low'),
-            'close': record.get('close'),
-            'adjClose': record.get('adjClose'),
-            'volume': record.get('volume'),
-            'unadjustedVolume': record.get('unadjustedVolume'),
-            'change': record.get('change'),
-            'changePercent': record.get('changePercent'),
-            'vwap': record.get('vwap'),
-            'label': record.get('label'),
-            'changeOverTime': record.get('changeOverTime')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # 按日期排序（由舊到新）
-    df = df.sort_values('date').reset_index(drop=True)
+    Args:
+        financial_growth_data (list): JSON 中 financialGrowth 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由新到舊）
+    """
+    return build_section_frame(financial_growth_data, SECTION_SCHEMAS['financialGrowth'])
 
 def process_financial_growth(json_file_path):
     """
-    將 JSON 檔案中的 financialGrowth 數據轉換為 DataFrame
+    將 JSON 檔案中的 financialGrowth 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -65,74 +57,24 @@ def process_financial_growth(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_financial_growth(data['financialGrowth'])
+
+def convert_ratios(ratios_data):
+    """
+    將已解析的 ratios 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得財務成長數據
-    financial_growth_data = data['financialGrowth']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in financial_growth_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': record.get('symbol'),
-            'calendarYear': record.get('calendarYear'),
-            'period': record.get('period'),
-            'revenueGrowth': record.get('revenueGrowth'),
-            'grossProfitGrowth': record.get('grossProfitGrowth'),
-            'ebitgrowth': record.get('ebitgrowth'),
-            'operatingIncomeGrowth': record.get('operatingIncomeGrowth'),
-            'netIncomeGrowth': record.get('netIncomeGrowth'),
-            'epsgrowth': record.get('epsgrowth'),
-            'epsdilutedGrowth': record.get('epsdilutedGrowth'),
-            'weightedAverageSharesGrowth': record.get('weightedAverageSharesGrowth'),
-            'weightedAverageSharesDilutedGrowth': record.get('weightedAverageSharesDilutedGrowth'),
-            'dividendsperShareGrowth': record.get('dividendsperShareGrowth'),
-            'operatingCashFlowGrowth': record.get('operatingCashFlowGrowth'),
-            'freeCashFlowGrowth': record.get('freeCashFlowGrowth'),
-            'tenYRevenueGrowthPerShare': record.get('tenYRevenueGrowthPerShare'),
-            'fiveYRevenueGrowthPerShare': record.get('fiveYRevenueGrowthPerShare'),
-            'threeYRevenueGrowthPerShare': record.get('threeYRevenueGrowthPerShare'),
-            'tenYOperatingCFGrowthPerShare': record.get('tenYOperatingCFGrowthPerShare'),
-            'fiveYOperatingCFGrowthPerShare': record.get('fiveYOperatingCFGrowthPerShare'),
-            'threeYOperatingCFGrowthPerShare': record.get('threeYOperatingCFGrowthPerShare'),
-            'tenYNetIncomeGrowthPerShare': record.get('tenYNetIncomeGrowthPerShare'),
-            'fiveYNetIncomeGrowthPerShare': record.get('fiveYNetIncomeGrowthPerShare'),
-            'threeYNetIncomeGrowthPerShare': record.get('threeYNetIncomeGrowthPerShare'),
-            'tenYShareholdersEquityGrowthPerShare': record.get('tenYShareholdersEquityGrowthPerShare'),
-            'fiveYShareholdersEquityGrowthPerShare': record.get('fiveYShareholdersEquityGrowthPerShare'),
-            'threeYShareholdersEquityGrowthPerShare': record.get('threeYShareholdersEquityGrowthPerShare'),
-            'tenYDividendperShareGrowthPerShare': record.get('tenYDividendperShareGrowthPerShare'),
-            'fiveYDividendperShareGrowthPerShare': record.get('fiveYDividendperShareGrowthPerShare'),
-            'threeYDividendperShareGrowthPerShare': record.get('threeYDividendperShareGrowthPerShare'),
-            'receivablesGrowth': record.get('receivablesGrowth'),
-            'inventoryGrowth': record.get('inventoryGrowth'),
-            'assetGrowth': record.get('assetGrowth'),
-            'bookValueperShareGrowth': record.get('bookValueperShareGrowth'),
-            'debtGrowth': record.get('debtGrowth'),
-            'rdexpenseGrowth': record.get('rdexpenseGrowth'),
-            'sgaexpensesGrowth': record.get('sgaexpensesGrowth')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由新到舊）
-        df = df.sort_values('date', ascending=False).reset_index(drop=True)
+    Args:
+        ratios_data (list): JSON 中 ratios 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由新到舊）
+    """
+    return build_section_frame(ratios_data, SECTION_SCHEMAS['ratios'])
 
 def process_ratios(json_file_path):
     """
-    將 JSON 檔案中的 ratios 數據轉換為 DataFrame
+    將 JSON 檔案中的 ratios 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -140,94 +82,24 @@ def process_ratios(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_ratios(data['ratios'])
+
+def convert_cash_flow_growth(cash_flow_growth_data):
+    """
+    將已解析的 cashFlowStatementGrowth 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得比率數據
-    ratios_data = data['ratios']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in ratios_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': record.get('symbol'),
-            'calendarYear': record.get('calendarYear'),
-            'period': record.get('period'),
-            'currentRatio': record.get('currentRatio'),
-            'quickRatio': record.get('quickRatio'),
-            'cashRatio': record.get('cashRatio'),
-            'daysOfSalesOutstanding': record.get('daysOfSalesOutstanding'),
-            'daysOfInventoryOutstanding': record.get('daysOfInventoryOutstanding'),
-            'operatingCycle': record.get('operatingCycle'),
-            'daysOfPayablesOutstanding': record.get('daysOfPayablesOutstanding'),
-            'cashConversionCycle': record.get('cashConversionCycle'),
-            'grossProfitMargin': record.get('grossProfitMargin'),
-            'operatingProfitMargin': record.get('operatingProfitMargin'),
-            'pretaxProfitMargin': record.get('pretaxProfitMargin'),
-            'netProfitMargin': record.get('netProfitMargin'),
-            'effectiveTaxRate': record.get('effectiveTaxRate'),
-            'returnOnAssets': record.get('returnOnAssets'),
-            'returnOnEquity': record.get('returnOnEquity'),
-            'returnOnCapitalEmployed': record.get('returnOnCapitalEmployed'),
-            'netIncomePerEBT': record.get('netIncomePerEBT'),
-            'ebtPerEbit': record.get('ebtPerEbit'),
-            'ebitPerRevenue': record.get('ebitPerRevenue'),
-            'debtRatio': record.get('debtRatio'),
-            'debtEquityRatio': record.get('debtEquityRatio'),
-            'longTermDebtToCapitalization': record.get('longTermDebtToCapitalization'),
-            'totalDebtToCapitalization': record.get('totalDebtToCapitalization'),
-            'interestCoverage': record.get('interestCoverage'),
-            'cashFlowToDebtRatio': record.get('cashFlowToDebtRatio'),
-            'companyEquityMultiplier': record.get('companyEquityMultiplier'),
-            'receivablesTurnover': record.get('receivablesTurnover'),
-            'payablesTurnover': record.get('payablesTurnover'),
-            'inventoryTurnover': record.get('inventoryTurnover'),
-            'fixedAssetTurnover': record.get('fixedAssetTurnover'),
-            'assetTurnover': record.get('assetTurnover'),
-            'operatingCashFlowPerShare': record.get('operatingCashFlowPerShare'),
-            'freeCashFlowPerShare': record.get('freeCashFlowPerShare'),
-            'cashPerShare': record.get('cashPerShare'),
-            'payoutRatio': record.get('payoutRatio'),
-            'operatingCashFlowSalesRatio': record.get('operatingCashFlowSalesRatio'),
-            'freeCashFlowOperatingCashFlowRatio': record.get('freeCashFlowOperatingCashFlowRatio'),
-            'cashFlowCoverageRatios': record.get('cashFlowCoverageRatios'),
-            'shortTermCoverageRatios': record.get('shortTermCoverageRatios'),
-            'capitalExpenditureCoverageRatio': record.get('capitalExpenditureCoverageRatio'),
-            'dividendPaidAndCapexCoverageRatio': record.get('dividendPaidAndCapexCoverageRatio'),
-            'dividendPayoutRatio': record.get('dividendPayoutRatio'),
-            'priceBookValueRatio': record.get('priceBookValueRatio'),
-            'priceToBookRatio': record.get('priceToBookRatio'),
-            'priceToSalesRatio': record.get('priceToSalesRatio'),
-            'priceEarningsRatio': record.get('priceEarningsRatio'),
-            'priceToFreeCashFlowsRatio': record.get('priceToFreeCashFlowsRatio'),
-            'priceToOperatingCashFlowsRatio': record.get('priceToOperatingCashFlowsRatio'),
-            'priceCashFlowRatio': record.get('priceCashFlowRatio'),
-            'priceEarningsToGrowthRatio': record.get('priceEarningsToGrowthRatio'),
-            'priceSalesRatio': record.get('priceSalesRatio'),
-            'dividendYield': record.get('dividendYield'),
-            'enterpriseValueMultiple': record.get('enterpriseValueMultiple'),
-            'priceFairValue': record.get('priceFairValue')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由新到舊）
-        df = df.sort_values('date', ascending=False).reset_index(drop=True)
+    Args:
+        cash_flow_growth_data (list): JSON 中 cashFlowStatementGrowth 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由新到舊）
+    """
+    return build_section_frame(cash_flow_growth_data, SECTION_SCHEMAS['cashFlowStatementGrowth'])
 
 def process_cash_flow_growth(json_file_path):
     """
-    將 JSON 檔案中的 cashFlowStatementGrowth 數據轉換為 DataFrame
+    將 JSON 檔案中的 cashFlowStatementGrowth 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -235,70 +107,24 @@ def process_cash_flow_growth(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_cash_flow_growth(data['cashFlowStatementGrowth'])
+
+def convert_income_growth(income_growth_data):
+    """
+    將已解析的 incomeStatementGrowth 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得現金流量成長數據
-    cash_flow_growth_data = data['cashFlowStatementGrowth']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in cash_flow_growth_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': record.get('symbol'),
-            'calendarYear': record.get('calendarYear'),
-            'period': record.get('period'),
-            'cf_growthNetIncome': record.get('growthNetIncome'),
-            'cf_growthDepreciationAndAmortization': record.get('growthDepreciationAndAmortization'),
-            'growthDeferredIncomeTax': record.get('growthDeferredIncomeTax'),
-            'growthStockBasedCompensation': record.get('growthStockBasedCompensation'),
-            'growthChangeInWorkingCapital': record.get('growthChangeInWorkingCapital'),
-            'growthAccountsReceivables': record.get('growthAccountsReceivables'),
-            'cf_growthInventory': record.get('growthInventory'),
-            'growthAccountsPayables': record.get('growthAccountsPayables'),
-            'growthOtherWorkingCapital': record.get('growthOtherWorkingCapital'),
-            'growthOtherNonCashItems': record.get('growthOtherNonCashItems'),
-            'growthNetCashProvidedByOperatingActivites': record.get('growthNetCashProvidedByOperatingActivites'),
-            'growthInvestmentsInPropertyPlantAndEquipment': record.get('growthInvestmentsInPropertyPlantAndEquipment'),
-            'growthAcquisitionsNet': record.get('growthAcquisitionsNet'),
-            'growthPurchasesOfInvestments': record.get('growthPurchasesOfInvestments'),
-            'growthSalesMaturitiesOfInvestments': record.get('growthSalesMaturitiesOfInvestments'),
-            'growthOtherInvestingActivites': record.get('growthOtherInvestingActivites'),
-            'growthNetCashUsedForInvestingActivites': record.get('growthNetCashUsedForInvestingActivites'),
-            'growthDebtRepayment': record.get('growthDebtRepayment'),
-            'growthCommonStockIssued': record.get('growthCommonStockIssued'),
-            'growthCommonStockRepurchased': record.get('growthCommonStockRepurchased'),
-            'growthDividendsPaid': record.get('growthDividendsPaid'),
-            'growthOtherFinancingActivites': record.get('growthOtherFinancingActivites'),
-            'growthNetCashUsedProvidedByFinancingActivities': record.get('growthNetCashUsedProvidedByFinancingActivities'),
-            'growthEffectOfForexChangesOnCash': record.get('growthEffectOfForexChangesOnCash'),
-            'growthNetChangeInCash': record.get('growthNetChangeInCash'),
-            'growthCashAtEndOfPeriod': record.get('growthCashAtEndOfPeriod'),
-            'growthCashAtBeginningOfPeriod': record.get('growthCashAtBeginningOfPeriod'),
-            'growthOperatingCashFlow': record.get('growthOperatingCashFlow'),
-            'growthCapitalExpenditure': record.get('growthCapitalExpenditure'),
-            'growthFreeCashFlow': record.get('growthFreeCashFlow')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由新到舊）
-        df = df.sort_values('date', ascending=False).reset_index(drop=True)
+    Args:
+        income_growth_data (list): JSON 中 incomeStatementGrowth 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由新到舊）
+    """
+    return build_section_frame(income_growth_data, SECTION_SCHEMAS['incomeStatementGrowth'])
 
 def process_income_growth(json_file_path):
     """
-    將 JSON 檔案中的 incomeStatementGrowth 數據轉換為 DataFrame
+    將 JSON 檔案中的 incomeStatementGrowth 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -306,66 +132,24 @@ def process_income_growth(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_income_growth(data['incomeStatementGrowth'])
+
+def convert_balance_sheet_growth(balance_sheet_growth_data):
+    """
+    將已解析的 balanceSheetStatementGrowth 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得損益表成長數據
-    income_growth_data = data['incomeStatementGrowth']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in income_growth_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': record.get('symbol'),
-            'calendarYear': record.get('calendarYear'),
-            'period': record.get('period'),
-            'growthRevenue': record.get('growthRevenue'),
-            'growthCostOfRevenue': record.get('growthCostOfRevenue'),
-            'growthGrossProfit': record.get('growthGrossProfit'),
-            'growthGrossProfitRatio': record.get('growthGrossProfitRatio'),
-            'growthResearchAndDevelopmentExpenses': record.get('growthResearchAndDevelopmentExpenses'),
-            'growthGeneralAndAdministrativeExpenses': record.get('growthGeneralAndAdministrativeExpenses'),
-            'growthSellingAndMarketingExpenses': record.get('growthSellingAndMarketingExpenses'),
-            'growthOtherExpenses': record.get('growthOtherExpenses'),
-            'growthOperatingExpenses': record.get('growthOperatingExpenses'),
-            'growthCostAndExpenses': record.get('growthCostAndExpenses'),
-            'growthInterestExpense': record.get('growthInterestExpense'),
-            'is_growthDepreciationAndAmortization': record.get('growthDepreciationAndAmortization'),
-            'growthEBITDA': record.get('growthEBITDA'),
-            'growthEBITDARatio': record.get('growthEBITDARatio'),
-            'growthOperatingIncome': record.get('growthOperatingIncome'),
-            'growthOperatingIncomeRatio': record.get('growthOperatingIncomeRatio'),
-            'growthTotalOtherIncomeExpensesNet': record.get('growthTotalOtherIncomeExpensesNet'),
-            'growthIncomeBeforeTax': record.get('growthIncomeBeforeTax'),
-            'growthIncomeBeforeTaxRatio': record.get('growthIncomeBeforeTaxRatio'),
-            'growthIncomeTaxExpense': record.get('growthIncomeTaxExpense'),
-            'is_growthNetIncome': record.get('growthNetIncome'),
-            'growthNetIncomeRatio': record.get('growthNetIncomeRatio'),
-            'growthEPS': record.get('growthEPS'),
-            'growthEPSDiluted': record.get('growthEPSDiluted'),
-            'growthWeightedAverageShsOut': record.get('growthWeightedAverageShsOut'),
-            'growthWeightedAverageShsOutDil': record.get('growthWeightedAverageShsOutDil')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由新到舊）
-        df = df.sort_values('date', ascending=False).reset_index(drop=True)
+    Args:
+        balance_sheet_growth_data (list): JSON 中 balanceSheetStatementGrowth 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由新到舊）
+    """
+    return build_section_frame(balance_sheet_growth_data, SECTION_SCHEMAS['balanceSheetStatementGrowth'])
 
 def process_balance_sheet_growth(json_file_path):
     """
-    將 JSON 檔案中的 balanceSheetStatementGrowth 數據轉換為 DataFrame
+    將 JSON 檔案中的 balanceSheetStatementGrowth 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -373,79 +157,24 @@ def process_balance_sheet_growth(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_balance_sheet_growth(data['balanceSheetStatementGrowth'])
+
+def convert_tech5(tech5_data):
+    """
+    將已解析的 tech5 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得資產負債表成長數據
-    balance_sheet_growth_data = data['balanceSheetStatementGrowth']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in balance_sheet_growth_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': record.get('symbol'),
-            'calendarYear': record.get('calendarYear'),
-            'period': record.get('period'),
-            'growthCashAndCashEquivalents': record.get('growthCashAndCashEquivalents'),
-            'growthShortTermInvestments': record.get('growthShortTermInvestments'),
-            'growthCashAndShortTermInvestments': record.get('growthCashAndShortTermInvestments'),
-            'growthNetReceivables': record.get('growthNetReceivables'),
-            'bs_growthInventory': record.get('growthInventory'),
-            'growthOtherCurrentAssets': record.get('growthOtherCurrentAssets'),
-            'growthTotalCurrentAssets': record.get('growthTotalCurrentAssets'),
-            'growthPropertyPlantEquipmentNet': record.get('growthPropertyPlantEquipmentNet'),
-            'growthGoodwill': record.get('growthGoodwill'),
-            'growthIntangibleAssets': record.get('growthIntangibleAssets'),
-            'growthGoodwillAndIntangibleAssets': record.get('growthGoodwillAndIntangibleAssets'),
-            'growthLongTermInvestments': record.get('growthLongTermInvestments'),
-            'growthTaxAssets': record.get('growthTaxAssets'),
-            'growthOtherNonCurrentAssets': record.get('growthOtherNonCurrentAssets'),
-            'growthTotalNonCurrentAssets': record.get('growthTotalNonCurrentAssets'),
-            'growthOtherAssets': record.get('growthOtherAssets'),
-            'growthTotalAssets': record.get('growthTotalAssets'),
-            'growthAccountPayables': record.get('growthAccountPayables'),
-            'growthShortTermDebt': record.get('growthShortTermDebt'),
-            'growthTaxPayables': record.get('growthTaxPayables'),
-            'growthDeferredRevenue': record.get('growthDeferredRevenue'),
-            'growthOtherCurrentLiabilities': record.get('growthOtherCurrentLiabilities'),
-            'growthTotalCurrentLiabilities': record.get('growthTotalCurrentLiabilities'),
-            'growthLongTermDebt': record.get('growthLongTermDebt'),
-            'growthDeferredRevenueNonCurrent': record.get('growthDeferredRevenueNonCurrent'),
-            'growthDeferrredTaxLiabilitiesNonCurrent': record.get('growthDeferrredTaxLiabilitiesNonCurrent'),
-            'growthOtherNonCurrentLiabilities': record.get('growthOtherNonCurrentLiabilities'),
-            'growthTotalNonCurrentLiabilities': record.get('growthTotalNonCurrentLiabilities'),
-            'growthOtherLiabilities': record.get('growthOtherLiabilities'),
-            'growthTotalLiabilities': record.get('growthTotalLiabilities'),
-            'growthCommonStock': record.get('growthCommonStock'),
-            'growthRetainedEarnings': record.get('growthRetainedEarnings'),
-            'growthAccumulatedOtherComprehensiveIncomeLoss': record.get('growthAccumulatedOtherComprehensiveIncomeLoss'),
-            'growthOthertotalStockholdersEquity': record.get('growthOthertotalStockholdersEquity'),
-            'growthTotalStockholdersEquity': record.get('growthTotalStockholdersEquity'),
-            'growthTotalLiabilitiesAndStockholdersEquity': record.get('growthTotalLiabilitiesAndStockholdersEquity'),
-            'growthTotalInvestments': record.get('growthTotalInvestments'),
-            'growthTotalDebt': record.get('growthTotalDebt'),
-            'growthNetDebt': record.get('growthNetDebt')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由新到舊）
-        df = df.sort_values('date', ascending=False).reset_index(drop=True)
+    Args:
+        tech5_data (list): JSON 中 tech5 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由舊到新）
+    """
+    return build_section_frame(tech5_data, SECTION_SCHEMAS['tech5'])
 
 def process_tech5(json_file_path):
     """
-    將 JSON 檔案中的 tech5 數據轉換為 DataFrame
+    將 JSON 檔案中的 tech5 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -453,52 +182,24 @@ def process_tech5(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_tech5(data['tech5'])
+
+def convert_tech20(tech20_data):
+    """
+    將已解析的 tech20 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得 tech5 數據
-    tech5_data = data['tech5']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in tech5_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': "1101.TW",
-            'tech5Open': record.get('open'),
-            'tech5High': record.get('high'),
-            'tech5Low': record.get('low'),
-            'tech5Close': record.get('close'),
-            'tech5Volume': record.get('volume'),
-            'tech5SMA': record.get('sma'),
-            'tech5EMA': record.get('ema'),
-            'tech5WMA': record.get('wma'),
-            'tech5DEMA': record.get('dema'),
-            'tech5TEMA': record.get('tema'),
-            'tech5Williams': record.get('williams'),
-            'tech5RSI': record.get('rsi'),
-            'tech5ADX': record.get('adx'),
-            'tech5StandardDeviation': record.get('standardDeviation')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由舊到新）
-        df = df.sort_values('date').reset_index(drop=True)
+    Args:
+        tech20_data (list): JSON 中 tech20 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由舊到新）
+    """
+    return build_section_frame(tech20_data, SECTION_SCHEMAS['tech20'])
 
 def process_tech20(json_file_path):
     """
-    將 JSON 檔案中的 tech20 數據轉換為 DataFrame
+    將 JSON 檔案中的 tech20 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -506,52 +207,24 @@ def process_tech20(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_tech20(data['tech20'])
+
+def convert_tech60(tech60_data):
+    """
+    將已解析的 tech60 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得 tech20 數據
-    tech20_data = data['tech20']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in tech20_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': "1101.TW",
-            'tech20Open': record.get('open'),
-            'tech20High': record.get('high'),
-            'tech20Low': record.get('low'),
-            'tech20Close': record.get('close'),
-            'tech20Volume': record.get('volume'),
-            'tech20SMA': record.get('sma'),
-            'tech20EMA': record.get('ema'),
-            'tech20WMA': record.get('wma'),
-            'tech20DEMA': record.get('dema'),
-            'tech20TEMA': record.get('tema'),
-            'tech20Williams': record.get('williams'),
-            'tech20RSI': record.get('rsi'),
-            'tech20ADX': record.get('adx'),
-            'tech20StandardDeviation': record.get('standardDeviation')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由舊到新）
-        df = df.sort_values('date').reset_index(drop=True)
+    Args:
+        tech60_data (list): JSON 中 tech60 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由舊到新）
+    """
+    return build_section_frame(tech60_data, SECTION_SCHEMAS['tech60'])
 
 def process_tech60(json_file_path):
     """
-    將 JSON 檔案中的 tech60 數據轉換為 DataFrame
+    將 JSON 檔案中的 tech60 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -559,52 +232,24 @@ def process_tech60(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
+    data = load_json_data(json_file_path)
+    return convert_tech60(data['tech60'])
+
+def convert_tech252(tech252_data):
+    """
+    將已解析的 tech252 數據轉換為 DataFrame
     
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得 tech60 數據
-    tech60_data = data['tech60']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in tech60_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': "1101.TW",
-            'tech60Open': record.get('open'),
-            'tech60High': record.get('high'),
-            'tech60Low': record.get('low'),
-            'tech60Close': record.get('close'),
-            'tech60Volume': record.get('volume'),
-            'tech60SMA': record.get('sma'),
-            'tech60EMA': record.get('ema'),
-            'tech60WMA': record.get('wma'),
-            'tech60DEMA': record.get('dema'),
-            'tech60TEMA': record.get('tema'),
-            'tech60Williams': record.get('williams'),
-            'tech60RSI': record.get('rsi'),
-            'tech60ADX': record.get('adx'),
-            'tech60StandardDeviation': record.get('standardDeviation')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由舊到新）
-        df = df.sort_values('date').reset_index(drop=True)
+    Args:
+        tech252_data (list): JSON 中 tech252 區段的記錄列表
     
-    return df
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame（按日期由舊到新）
+    """
+    return build_section_frame(tech252_data, SECTION_SCHEMAS['tech252'])
 
 def process_tech252(json_file_path):
     """
-    將 JSON 檔案中的 tech252 數據轉換為 DataFrame
+    將 JSON 檔案中的 tech252 數據轉換為 DataFrame（讀取整個檔案，保留舊介面）
     
     Args:
         json_file_path (str): JSON 檔案路徑
@@ -612,48 +257,8 @@ def process_tech252(json_file_path):
     Returns:
         pd.DataFrame: 轉換後的 DataFrame
     """
-    
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # 取得 tech252 數據
-    tech252_data = data['tech252']
-    
-    # 創建 DataFrame
-    df_data = []
-    
-    for record in tech252_data:
-        row = {
-            'date': record.get('date'),
-            'symbol': "1101.TW",
-            'tech252Open': record.get('open'),
-            'tech252High': record.get('high'),
-            'tech252Low': record.get('low'),
-            'tech252Close': record.get('close'),
-            'tech252Volume': record.get('volume'),
-            'tech252SMA': record.get('sma'),
-            'tech252EMA': record.get('ema'),
-            'tech252WMA': record.get('wma'),
-            'tech252DEMA': record.get('dema'),
-            'tech252TEMA': record.get('tema'),
-            'tech252Williams': record.get('williams'),
-            'tech252RSI': record.get('rsi'),
-            'tech252ADX': record.get('adx'),
-            'tech252StandardDeviation': record.get('standardDeviation')
-        }
-        df_data.append(row)
-    
-    # 創建 DataFrame
-    df = pd.DataFrame(df_data)
-    
-    # 將 date 欄位轉換為日期格式（如果存在）
-    if 'date' in df.columns and df['date'].notna().any():
-        df['date'] = pd.to_datetime(df['date'])
-        # 按日期排序（由舊到新）
-        df = df.sort_values('date').reset_index(drop=True)
-    
-    return df
+    data = load_json_data(json_file_path)
+    return convert_tech252(data['tech252'])
 
 def load_json_data(file_path: str) -> dict:
     """讀取 JSON 檔案並回傳字典"""
@@ -665,77 +270,127 @@ def add_common_columns(df: pd.DataFrame, symbol: str) -> pd.DataFrame:
     df['symbol'] = symbol
     return df
 
-def save_dataframe(df: pd.DataFrame, filename: str, output_dir: str = "."):
-    """儲存 DataFrame 為 CSV 檔案"""
+def save_dataframe(df: pd.DataFrame, filename: str, output_dir: str = ".", fmt: str = None) -> str:
+    """儲存 DataFrame（預設依副檔名為 CSV；fmt 可指定 'parquet'、'feather' 或 'npcol'），回傳實際路徑"""
     output_path = os.path.join(output_dir, filename)
-    # 確保目錄存在
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False)
-    print(f"已儲存為 CSV 檔案: {output_path}")
+    # save_table 會確保目錄存在
+    output_path = save_table(df, output_path, fmt)
+    print(f"已儲存檔案: {output_path}")
+    return output_path
+
+# 各區段（記錄列表）對應的轉換函數，順序即輸出順序
+SECTION_CONVERTERS = {
+    'financialGrowth': convert_financial_growth,
+    'ratios': convert_ratios,
+    'cashFlowStatementGrowth': convert_cash_flow_growth,
+    'incomeStatementGrowth': convert_income_growth,
+    'balanceSheetStatementGrowth': convert_balance_sheet_growth,
+    'tech5': convert_tech5,
+    'tech20': convert_tech20,
+    'tech60': convert_tech60,
+    'tech252': convert_tech252,
+}
 
 def process_all_data(json_file_path: str) -> dict:
-    """處理所有 key 的數據，回傳包含所有 DataFrame 的字典"""
+    """處理所有 key 的數據，回傳包含所有 DataFrame 的字典（JSON 只解析一次）"""
     data = load_json_data(json_file_path)
+    return process_all_sections(data)
+
+def process_all_sections(data: dict) -> dict:
+    """將已解析的 JSON 字典逐一轉換為 DataFrame，回傳包含所有 DataFrame 的字典"""
     result = {}
     
     # 處理 historicalPriceFull
     if 'historicalPriceFull' in data and data['historicalPriceFull']['historical']:
-        df = process_historical_price_full(json_file_path)
-        result['historicalPriceFull'] = df
-    
-    # 處理 financialGrowth
-    if 'financialGrowth' in data and data['financialGrowth']:
-        df = process_financial_growth(json_file_path)
-        result['financialGrowth'] = df
-    
-    # 處理 ratios
-    if 'ratios' in data and data['ratios']:
-        df = process_ratios(json_file_path)
-        result['ratios'] = df
-    
-    # 處理 cashFlowStatementGrowth
-    if 'cashFlowStatementGrowth' in data and data['cashFlowStatementGrowth']:
-        df = process_cash_flow_growth(json_file_path)
-        result['cashFlowStatementGrowth'] = df
-    
-    # 處理 incomeStatementGrowth
-    if 'incomeStatementGrowth' in data and data['incomeStatementGrowth']:
-        df = process_income_growth(json_file_path)
-        result['incomeStatementGrowth'] = df
-    
-    # 處理 balanceSheetStatementGrowth
-    if 'balanceSheetStatementGrowth' in data and data['balanceSheetStatementGrowth']:
-        df = process_balance_sheet_growth(json_file_path)
-        result['balanceSheetStatementGrowth'] = df
-    
-    # 處理 tech5
-    if 'tech5' in data and data['tech5']:
-        df = process_tech5(json_file_path)
-        result['tech5'] = df
-    
-    # 處理 tech20
-    if 'tech20' in data and data['tech20']:
-        df = process_tech20(json_file_path)
-        result['tech20'] = df
-    
-    # 處理 tech60
-    if 'tech60' in data and data['tech60']:
-        df = process_tech60(json_file_path)
-        result['tech60'] = df
-    
-    # 處理 tech252
-    if 'tech252' in data and data['tech252']:
-        df = process_tech252(json_file_path)
-        result['tech252'] = df
+        result['historicalPriceFull'] = convert_historical_price_full(data['historicalPriceFull'])
+    
+    # 處理其餘區段（記錄列表）
+    for key, converter in SECTION_CONVERTERS.items():
+        if key in data and data[key]:
+            result[key] = converter(data[key])
+    
+    return result
+
+def concat_chunk_frames(frames: list, schema: dict) -> pd.DataFrame:
+    """合併分批轉換（未排序）的 DataFrame，並依整體日期排序一次"""
+    df = pd.concat(frames, ignore_index=True)
+    if 'date' in df.columns:
+        df = df.sort_values('date', ascending=schema['ascending']).reset_index(drop=True)
+    return df
+
+def process_all_data_streaming(json_file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, sections=None,
+                               symbol=None, since=None) -> dict:
+    """
+    串流讀取 JSON 檔案（或壓縮快照）並分批轉換所有區段，不需要將整份 JSON 載入記憶體
+    
+    Args:
+        json_file_path (str): JSON 檔案或 snapshot_store 快照的路徑；快照只會解壓 sections 指定的區段
+        chunk_size (int): 每批交給轉換函數的記錄數，決定解析階段的記憶體上限
+        sections (iterable): 只轉換指定的區段（None 表示全部）
+        symbol (str): 此 payload 的股票代碼，指定時所有區段都使用此代碼（None 表示使用 historicalPriceFull.symbol）
+        since (str or datetime): 只轉換日資料區段（historicalPriceFull 與 tech*）中日期晚於此日的記錄，
+                                 季度區段不受影響（None 表示全部）
+    
+    Returns:
+        dict: 與 process_all_data 相同格式的 DataFrame 字典
+    """
+    wanted = set(sections) if sections is not None else None
+    since = pd.Timestamp(since).strftime('%Y-%m-%d') if since is not None else None
+    chunk_frames = {}
+    payload_symbol = None
+    
+    for path, payload in iter_sections(json_file_path, wanted, chunk_size):
+        if path == 'historicalPriceFull.symbol':
+            payload_symbol = payload
+            continue
+        
+        if path == 'historicalPriceFull.historical':
+            key = 'historicalPriceFull'
+        elif path in SECTION_CONVERTERS:
+            key = path
+        else:
+            continue
+        
+        if wanted is not None and key not in wanted:
+            continue
+        
+        # 增量轉換: 日資料記錄在建立 DataFrame 前先依日期字串（前 10 字元為 YYYY-MM-DD）篩選
+        if since is not None and is_daily_section(key):
+            payload = [record for record in payload if str(record.get('date', ''))[:10] > since]
+            if not payload:
+                continue
+        
+        # 分批建立時先不排序，合併後再排序一次
+        df = build_section_frame(payload, SECTION_SCHEMAS[key], sort=False)
+        chunk_frames.setdefault(key, []).append(df)
+    
+    result = {}
+    for key in ['historicalPriceFull'] + list(SECTION_CONVERTERS):
+        if key in chunk_frames:
+            result[key] = concat_chunk_frames(chunk_frames.pop(key), SECTION_SCHEMAS[key])
+    
+    # 歷史價格與技術指標記錄本身沒有 symbol，統一填入此 payload 的 symbol
+    # （symbol 可能出現在 historical 陣列之後，因此在所有區段轉換完成後才填入）
+    fill_symbol = symbol or payload_symbol
+    if fill_symbol is not None:
+        for key, df in result.items():
+            if symbol is not None or (None, 'symbol', 'object') in SECTION_SCHEMAS[key]['columns']:
+                df['symbol'] = fill_symbol
+            else:
+                df['symbol'] = df['symbol'].fillna(fill_symbol)
     
     return result
 
 def main():
     # 指定 JSON 檔案路徑
     json_file_path = '/home/ubuntu/workspace/stark_test/output_data.json'
+    # main.py 產生的壓縮快照存在時優先使用
+    snapshot_path = '/home/ubuntu/workspace/stark_test/output_data.snap'
+    if os.path.exists(snapshot_path):
+        json_file_path = snapshot_path
     try:
-        # 可選擇處理全部 key 或單一 key
-        all_dataframes = process_all_data(json_file_path)
+        # 串流分批轉換，記憶體用量不隨 JSON 檔案大小成長
+        all_dataframes = process_all_data_streaming(json_file_path)
         
         # 取得 historicalPriceFull 的 DataFrame
         price_df = all_dataframes['historicalPriceFull'] if 'historicalPriceFull' in all_dataframes else None
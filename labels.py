@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前瞻報酬標籤模組
+在 merge_selected_data 合併完成後，依每檔股票的 adjClose 計算未來 N 個交易日的報酬與門檻標籤
+（例如「90 日後是否成長 10%」）。所有 (期間, 門檻) 組合一次計算: 依 (symbol, date) 排序後以位移的陣列取出
+未來價格，不逐列迴圈；期間超出該股票最後一個交易日的列沒有未來價格，報酬與標籤為 NaN
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from indicators import max_table, window_max
+
+# 模型訓練說明中的目標: 90 個交易日後成長 10%
+DEFAULT_LABEL_TARGETS = ((90, 0.10),)
+
+# 'end': 以期間最後一日的價格計算報酬; 'max': 以期間內的最高價格計算（期間內是否曾經達到門檻）
+LABEL_MODES = ('end', 'max')
+
+# label_columns 產生的欄位名稱（訓練時不可作為特徵）
+LABEL_COLUMN_PATTERN = re.compile(r'^(forward(Max)?Return\d+d|(gain|reach)(minus)?[\d_]+pct\d+d)$')
+
+
+def parse_label_targets(text):
+    """
+    解析 '90:0.1,20:0.05' 形式的 (期間, 門檻) 列表（格式錯誤或期間不是正整數時引發 ValueError）
+
+    Returns:
+        list: [(期間, 門檻)]
+    """
+    targets = []
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        horizon, _, threshold = item.partition(':')
+        targets.append((int(horizon), float(threshold)))
+    if not targets or any(horizon < 1 for horizon, _ in targets):
+        raise ValueError(f"無效的標籤: {text}")
+    return targets
+
+
+def label_columns(horizon, threshold, mode='end'):
+    """報酬與標籤的欄位名稱，例如 ('forwardReturn90d', 'gain10pct90d')"""
+    pct = f"{threshold * 100:g}".replace('.', '_').replace('-', 'minus')
+    if mode == 'max':
+        return f"forwardMaxReturn{horizon}d", f"reach{pct}pct{horizon}d"
+    return f"forwardReturn{horizon}d", f"gain{pct}pct{horizon}d"
+
+
+def is_label_column(name):
+    """是否為前瞻報酬或標籤欄位"""
+    return bool(LABEL_COLUMN_PATTERN.match(str(name)))
+
+
+def forward_prices(price, remaining, horizons, mode='end'):
+    """
+    依 (symbol, date) 排序後的價格陣列計算每個期間的未來價格
+
+    Args:
+        price (np.ndarray): 排序後的價格
+        remaining (np.ndarray): 每一列之後同一檔股票還有幾個交易日
+        horizons (list): 期間（交易日數）
+        mode (str): 'end' 取期間最後一日的價格，'max' 取期間內（不含當日）的最高價格
+
+    Returns:
+        dict: {期間: 未來價格陣列}，超出最後一個交易日的列為 NaN
+    """
+    rows = len(price)
+    position = np.arange(rows)
+    if mode == 'max':
+        # 反轉後的滾動最大值即為向前的滾動最大值，所有期間共用一個稀疏表
+        levels = max_table(price[None, ::-1], max(horizons))
+
+    futures = {}
+    for horizon in horizons:
+        if mode == 'max':
+            # ahead[i] = max(price[i..i + horizon - 1])，期間內（不含當日）的最高價為 ahead[i + 1]
+            ahead = window_max(levels, horizon, rows)[0, ::-1]
+            future = np.empty(rows)
+            future[:-1] = ahead[1:]
+            future[-1:] = np.nan
+        else:
+            future = price[np.minimum(position + horizon, rows - 1)]
+        futures[horizon] = np.where(remaining >= horizon, future, np.nan)
+    return futures
+
+
+def forward_labels(df, targets=DEFAULT_LABEL_TARGETS, price='adjClose', mode='end'):
+    """
+    計算多組 (期間, 門檻) 的前瞻報酬與標籤
+
+    Args:
+        df (pd.DataFrame): merge_selected_data 的合併結果（需包含 date、symbol 與價格欄位，順序不限）
+        targets (iterable): (期間, 門檻) 列表，期間為交易日數，門檻為報酬率（0.1 表示 10%）
+        price (str): 計算報酬的價格欄位
+        mode (str): 'end' 以期間最後一日的價格計算，'max' 以期間內的最高價格計算
+
+    Returns:
+        pd.DataFrame: 與 df 相同索引的報酬（forwardReturn{期間}d）與標籤（gain{門檻}pct{期間}d，1 / 0）欄位；
+            期間超出該股票數據範圍的列為 NaN
+    """
+    if mode not in LABEL_MODES:
+        raise ValueError(f"不支援的標籤方式: {mode}（可用: {', '.join(LABEL_MODES)}）")
+    if price not in df.columns:
+        raise KeyError(f"合併結果中沒有價格欄位 {price}，無法計算標籤")
+    targets = [(int(horizon), float(threshold)) for horizon, threshold in targets]
+    if any(horizon < 1 for horizon, _ in targets):
+        raise ValueError(f"期間必須是正整數: {targets}")
+
+    # 依 (symbol, date) 排序，同一檔股票的交易日連續排列
+    codes, _ = pd.factorize(df['symbol'])
+    dates = pd.to_datetime(df['date']).to_numpy()
+    order = np.lexsort((dates, codes))
+    sorted_codes = codes[order]
+    values = pd.to_numeric(df[price], errors='coerce').to_numpy(dtype='float64')[order]
+
+    # 每一列之後同一檔股票還有幾個交易日
+    rows = len(order)
+    position = np.arange(rows)
+    last = np.flatnonzero(np.r_[sorted_codes[1:] != sorted_codes[:-1], True])
+    remaining = last[np.searchsorted(last, position)] - position
+
+    horizons = list(dict.fromkeys(horizon for horizon, _ in targets))
+    futures = forward_prices(values, remaining, horizons, mode)
+
+    columns = {}
+    for horizon, threshold in targets:
+        return_column, label_column = label_columns(horizon, threshold, mode)
+        if return_column not in columns:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                returns = futures[horizon] / values - 1
+            columns[return_column] = np.empty(rows)
+            columns[return_column][order] = returns
+        returns = columns[return_column]
+        columns[label_column] = np.where(np.isnan(returns), np.nan, returns >= threshold)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def add_forward_labels(df, targets=DEFAULT_LABEL_TARGETS, price='adjClose', mode='end'):
+    """
+    在合併結果後加上前瞻報酬與標籤欄位（參數同 forward_labels）
+
+    Returns:
+        pd.DataFrame: 加上標籤欄位的新 DataFrame
+    """
+    labels = forward_labels(df, targets, price, mode)
+    return pd.concat([df.drop(columns=labels.columns, errors='ignore'), labels], axis=1)
@@ -11,9 +11,11 @@ import subprocess
 from datetime import datetime
 
 # 導入各個模組
-from get_json_data import fetch_json_from_url
+from snapshot_store import write_snapshot, read_snapshot_index
+from download_cache import DownloadCache
 import json_to_dataframe
 import merge_financial_data
+from table_io import ask_format, find_table
 
 def print_step_header(step_num, step_name):
     """打印步驟標題"""
@@ -25,6 +27,18 @@ def check_file_exists(file_path):
     """檢查文件是否存在"""
     return os.path.exists(file_path)
 
+def read_source_marker(marker_path):
+    """讀取上次轉換所用 JSON 的 sha256（不存在時回傳 None）"""
+    if not os.path.exists(marker_path):
+        return None
+    with open(marker_path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+def write_source_marker(marker_path, sha256):
+    """記錄本次轉換所用 JSON 的 sha256"""
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        f.write(sha256)
+
 def main():
     """
     主流程函數
@@ -48,67 +62,90 @@ def main():
         print(f"正在從 URL 獲取 JSON 數據...")
         print(f"URL: {notion_url[:100]}...")  # 只顯示前100個字符
         
-        # 獲取 JSON 數據
-        data = fetch_json_from_url(notion_url)
+        # 經由下載快取取得 JSON 數據（條件式請求，內容未變更時不重新下載）
+        snapshot_path = '/home/ubuntu/workspace/stark_test/output_data.snap'
+        cache = DownloadCache('/home/ubuntu/workspace/stark_test/.download_cache')
+        download = cache.fetch(notion_url)
         
-        if not data:
+        if not download:
             print("❌ 無法獲取 JSON 數據，程式結束")
             return
         
-        # 保存 JSON 數據到本地
-        json_file_path = '/home/ubuntu/workspace/stark_test/output_data.json'
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            import json
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        print("✅ JSON 數據獲取成功!")
-        print(f"數據已保存到: {json_file_path}")
-        
-        # 顯示 JSON 結構
+        # 將原始 JSON 轉為壓縮快照（各區段獨立壓縮，後續步驟只需解壓用到的區段）
+        # 快照旁記錄來源 JSON 的 sha256，與本次下載內容不同時（包括換了 URL）重新建立
+        snapshot_marker_path = snapshot_path + '.sha256'
+        if read_source_marker(snapshot_marker_path) != download['sha256'] or not check_file_exists(snapshot_path):
+            write_snapshot(download['path'], snapshot_path)
+            write_source_marker(snapshot_marker_path, download['sha256'])
+            print("✅ JSON 數據獲取成功!")
+        else:
+            print("✅ 遠端 JSON 數據未變更，使用快取")
+        print(f"數據已保存到: {snapshot_path}")
+        print(f"原始大小: {download['bytes']:,} bytes, 快照大小: {os.path.getsize(snapshot_path):,} bytes, "
+              f"sha256: {download['sha256']}")
+        
+        # 顯示 JSON 結構（直接讀取快照的區塊索引）
         print("\n📋 JSON 數據結構:")
-        for key in data.keys():
-            print(f"- {key}: {type(data[key])}")
-            if isinstance(data[key], list):
-                print(f"  長度: {len(data[key])}")
-            elif isinstance(data[key], dict):
-                print(f"  鍵數量: {len(data[key])}")
-        
+        for path, entry in read_snapshot_index(snapshot_path).items():
+            print(f"- {path}" + (f": 長度 {entry['count']}" if entry['kind'] == 'array' else ""))
+
         # ===== 步驟 2: 將 JSON 轉換成基礎 CSV 文件 =====
         print_step_header(2, "將 JSON 轉換成基礎 CSV 文件")
         
         # 確保 data 目錄存在
         os.makedirs('/home/ubuntu/workspace/stark_test/data', exist_ok=True)
         
-        print("正在處理所有數據並轉換為 CSV...")
-        
-        # 調用 json_to_dataframe 的 process_all_data 函數
-        all_dataframes = json_to_dataframe.process_all_data(json_file_path)
-        
-        if not all_dataframes:
-            print("❌ JSON 轉 CSV 失敗，程式結束")
-            return
-        
-        # 保存所有 DataFrame 為 CSV 文件
-        saved_files = []
-        
-        for key, df in all_dataframes.items():
-            if df is not None and not df.empty:
-                if key == 'historicalPriceFull':
-                    file_path = f"data/{key}.csv"
-                else:
-                    file_path = f"data/{key}.csv"
+        # 記錄上次轉換所用 JSON 的 sha256，內容相同時跳過轉換
+        marker_path = 'data/.source_sha256'
+        
+        # 本次轉換的 DataFrame 直接交給合併步驟，不需再從 data/ 讀回
+        all_dataframes = None
+        
+        # 基礎表格與合併結果使用相同的輸出格式
+        fmt = ask_format()
+        
+        if read_source_marker(marker_path) == download['sha256'] and find_table('data/historicalPriceFull.csv'):
+            print("✅ JSON 內容與上次轉換相同，沿用現有 CSV 文件")
+        else:
+            print("正在處理所有數據並轉換為 CSV...")
+            
+            # 串流分批轉換下載的 JSON 檔案
+            all_dataframes = json_to_dataframe.process_all_data_streaming(snapshot_path)
+            
+            if not all_dataframes:
+                print("❌ JSON 轉 CSV 失敗，程式結束")
+                return
+            
+            # 寫入 data/ 為選擇性的輸出，合併步驟直接使用記憶體中的 DataFrame
+            save_input = input("是否將基礎表格寫入 data/ 目錄？(y/n，預設為 y): ").strip().lower()
+            
+            # 保存所有 DataFrame 為 CSV 文件
+            saved_files = []
+            
+            if save_input not in ['n', 'no']:
+                for key, df in all_dataframes.items():
+                    if df is not None and not df.empty:
+                        if key == 'historicalPriceFull':
+                            file_path = f"data/{key}.csv"
+                        else:
+                            file_path = f"data/{key}.csv"
+                        
+                        # 依選擇的格式輸出（CSV 或保留型別的欄式格式）
+                        saved_files.append(json_to_dataframe.save_dataframe(df, file_path, fmt=fmt))
+            
+            if saved_files:
+                write_source_marker(marker_path, download['sha256'])
                 
-                json_to_dataframe.save_dataframe(df, file_path)
-                saved_files.append(file_path)
-        
-        print("✅ JSON 轉 CSV 完成!")
-        print(f"已生成 {len(saved_files)} 個 CSV 文件:")
-        for file in saved_files:
-            print(f"  - {file}")
-        
+                print("✅ JSON 轉 CSV 完成!")
+                print(f"已生成 {len(saved_files)} 個 CSV 文件:")
+                for file in saved_files:
+                    print(f"  - {file}")
+            else:
+                print("✅ JSON 轉換完成，基礎表格保留在記憶體中（未寫入 data/）")
+
         # 檢查必要的文件是否存在
         required_file = 'data/historicalPriceFull.csv'
-        if not check_file_exists(required_file):
+        if all_dataframes is None and not find_table(required_file):
             print(f"❌ 缺少必要文件: {required_file}")
             print("無法進行下一步合併，程式結束")
             return
@@ -129,8 +166,8 @@ def main():
         
         print("\n🔄 啟動數據合併工具...")
         
-        # 調用 merge_financial_data 的主函數
-        merge_financial_data.main()
+        # 調用 merge_financial_data 的主函數（本次有轉換時直接傳入記憶體中的 DataFrame）
+        merge_financial_data.main(tables=all_dataframes, fmt=fmt)
         
         print("\n🎉 主流程執行完成!")
         print("所有步驟已成功完成:")
@@ -5,10 +5,16 @@
 支援選擇性合併多個財務數據表到historicalPriceFull.csv（每日數據）
 """
 
+import os
+from fnmatch import fnmatchcase
 import pandas as pd
 from datetime import datetime, timedelta
 import numpy as np
 
+from table_io import ask_format, load_table, save_table, table_columns
+from feature_store import write_feature_store
+from labels import DEFAULT_LABEL_TARGETS, add_forward_labels, parse_label_targets
+
 def get_quarter_date_range(year, quarter):
     """
     根據年份和季度計算該季度的日期範圍
@@ -34,9 +40,9 @@ def get_quarter_date_range(year, quarter):
     
     return start_date, end_date
 
-def merge_daily_data_to_historical(historical_df, daily_df, daily_name):
+def align_daily_table(historical_df, daily_df, daily_name):
     """
-    將日資料合併到歷史數據中（基於日期直接匹配）
+    將日資料依 (date, symbol) 對齊到歷史數據的每一列（基於日期直接匹配）
     
     Args:
         historical_df: 歷史價格數據DataFrame
@@ -44,190 +50,451 @@ def merge_daily_data_to_historical(historical_df, daily_df, daily_name):
         daily_name: 日資料的名稱（用於顯示）
     
     Returns:
-        合併後的DataFrame
+        與 historical_df 同索引的日資料欄位DataFrame（沒有對應的列為 NaN）
     """
     print(f"正在合併 {daily_name} 數據...")
     
-    # 設定日期為索引以便進行合併
-    historical_df = historical_df.set_index(['date', 'symbol'])
-    daily_df = daily_df.set_index(['date', 'symbol'])
-    
     # 獲取日資料的所有列（除了date和symbol）
-    daily_cols = [col for col in daily_df.columns]
+    daily_cols = [col for col in daily_df.columns if col not in ['date', 'symbol']]
     
     print(f"  將合併 {len(daily_cols)} 個 {daily_name} 欄位")
     
-    # 使用left join合併數據
-    result_df = historical_df.join(daily_df, how='left')
+    # 以 (date, symbol) 找出每個交易日對應的日資料列
+    daily_keys = pd.MultiIndex.from_arrays([daily_df['date'].to_numpy(), daily_df['symbol'].to_numpy()])
+    duplicated = daily_keys.duplicated()
+    if duplicated.any():
+        print(f"  警告: {daily_name} 有 {duplicated.sum()} 筆重複的 (date, symbol)，只使用第一筆")
+        daily_df = daily_df[~duplicated]
+        daily_keys = daily_keys[~duplicated]
+    hist_keys = pd.MultiIndex.from_arrays([historical_df['date'].to_numpy(), historical_df['symbol'].to_numpy()])
+    positions = daily_keys.get_indexer(hist_keys)
     
-    # 重設索引
-    result_df = result_df.reset_index()
+    aligned = daily_df[daily_cols].reset_index(drop=True).reindex(positions)
+    aligned.index = historical_df.index
     
     # 計算數據覆蓋率
-    non_null_count = result_df[daily_cols].notna().any(axis=1).sum()
-    total_count = len(result_df)
-    coverage = (non_null_count / total_count) * 100
+    non_null_count = aligned.notna().any(axis=1).sum()
+    total_count = len(aligned)
+    coverage = (non_null_count / total_count) * 100 if total_count else 0.0
     
     print(f"  {daily_name} 數據覆蓋率: {coverage:.2f}% ({non_null_count}/{total_count})")
     
-    return result_df
+    return aligned
 
-def merge_quarterly_data_to_historical(historical_df, quarterly_df, quarterly_name):
+def merge_daily_data_to_historical(historical_df, daily_df, daily_name):
+    """
+    將日資料合併到歷史數據中（基於日期直接匹配）
+    
+    Args:
+        historical_df: 歷史價格數據DataFrame
+        daily_df: 日技術指標數據DataFrame
+        daily_name: 日資料的名稱（用於顯示）
+    
+    Returns:
+        合併後的DataFrame
+    """
+    aligned = align_daily_table(historical_df, daily_df, daily_name)
+    check_column_overlap(historical_df.columns, aligned.columns)
+    return combine_aligned_columns(historical_df, [(aligned, None)])
+
+# 季度代號對應的季度序號（Q1 為 0），與 get_quarter_date_range 的日曆季度劃分一致
+QUARTER_INDEX = {'Q1': 0, 'Q2': 1, 'Q3': 2, 'Q4': 3}
+
+def date_quarter_keys(dates):
+    """
+    將日期轉為季度鍵（年份 * 4 + 季度序號），同一日曆季度內的日期有相同的鍵
+    """
+    dates = pd.to_datetime(dates)
+    return (dates.dt.year * 4 + (dates.dt.month - 1) // 3).to_numpy()
+
+def quarterly_period_keys(quarterly_df):
+    """
+    由季度數據的 calendarYear 與 period 計算季度鍵，無法辨識的記錄回傳 -1
+    """
+    years = pd.to_numeric(quarterly_df['calendarYear'], errors='coerce')
+    quarters = quarterly_df['period'].map(QUARTER_INDEX)
+    invalid = years.isna() | quarters.isna()
+    for _, row in quarterly_df.loc[invalid, ['calendarYear', 'period']].iterrows():
+        print(f"    警告: Invalid quarter: {row['period']} ({row['calendarYear']}) - 跳過該記錄")
+    keys = (years.fillna(0) * 4 + quarters.fillna(0)).astype(np.int64).to_numpy()
+    keys[invalid.to_numpy()] = -1
+    return keys
+
+def calendar_quarter_positions(historical_df, quarterly_df):
+    """
+    日曆季度對應: 每個交易日與季度記錄各自計算季度鍵（年份 * 4 + 季度序號），以 (symbol, 季度鍵) 一次對應；
+    同一季度有多筆記錄時使用檔案中的第一筆
+    
+    Returns:
+        tuple: (季度數據查詢表, 每個交易日對應的查詢表列位置，-1 表示沒有對應)
+    """
+    lookup = quarterly_df.copy()
+    lookup.index = pd.MultiIndex.from_arrays([quarterly_df['symbol'].to_numpy(),
+                                              quarterly_period_keys(quarterly_df)])
+    lookup = lookup[lookup.index.get_level_values(1) >= 0]
+    lookup = lookup[~lookup.index.duplicated(keep='first')]
+    
+    hist_keys = pd.MultiIndex.from_arrays([historical_df['symbol'].to_numpy(),
+                                           date_quarter_keys(historical_df['date'])])
+    return lookup, lookup.index.get_indexer(hist_keys)
+
+def asof_quarter_positions(historical_df, quarterly_df, max_staleness=None):
     """
-    將季度數據合併到歷史數據中
+    公告日 as-of 對應: 每個交易日對應同一股票中 date 在該交易日當天或之前的最新一筆季度記錄，
+    每檔股票以排序後的公告日做二分搜尋，整體成本為 O(n log n)
+    
+    Returns:
+        tuple: (季度數據查詢表, 每個交易日對應的查詢表列位置，-1 表示沒有對應)
+    """
+    # 依 (symbol, 公告日) 排序；同一天有多筆公告時，排序後的最後一筆為檔案中的第一筆
+    quarterly = quarterly_df[quarterly_df['date'].notna()].iloc[::-1]
+    quarterly = quarterly.sort_values(['symbol', 'date'], kind='mergesort').reset_index(drop=True)
+    filing_dates = pd.to_datetime(quarterly['date']).to_numpy()
+    hist_dates = pd.to_datetime(historical_df['date']).to_numpy()
+    
+    # 每個交易日對應的季度記錄位置（-1 表示尚無已公告的季度數據）
+    positions = np.full(len(historical_df), -1, dtype=np.int64)
+    quarterly_groups = quarterly.groupby('symbol', sort=False).indices
+    for symbol, hist_rows in historical_df.groupby('symbol', sort=False).indices.items():
+        quarterly_rows = quarterly_groups.get(symbol)
+        if quarterly_rows is None:
+            continue
+        found = np.searchsorted(filing_dates[quarterly_rows], hist_dates[hist_rows], side='right') - 1
+        valid = found >= 0
+        positions[hist_rows[valid]] = quarterly_rows[found[valid]]
+    
+    if max_staleness is not None:
+        if not isinstance(max_staleness, pd.Timedelta):
+            max_staleness = pd.Timedelta(days=max_staleness)
+        matched = positions >= 0
+        age = hist_dates[matched] - filing_dates[positions[matched]]
+        stale = np.flatnonzero(matched)[age > max_staleness.to_timedelta64()]
+        positions[stale] = -1
+        print(f"  超過 {max_staleness.days} 天未更新而不填入: {len(stale)} 個交易日")
+    
+    return quarterly, positions
+
+def align_quarterly_table(historical_df, quarterly_df, quarterly_name, quarterly_mode='calendar', max_staleness=None,
+                          output_columns=None):
+    """
+    將季度數據對齊到歷史數據的每一列
     
     Args:
         historical_df: 歷史價格數據DataFrame
         quarterly_df: 季度財務數據DataFrame
         quarterly_name: 季度數據的名稱（用於顯示）
+        quarterly_mode: 'calendar' 填入同一日曆季度的交易日，'asof' 依公告日做時點正確的對應
+        max_staleness: as-of 模式下的最長有效期間（天數或 pd.Timedelta，None 表示不限制）
+        output_columns: 只輸出這些季度欄位（None 表示除了 date、symbol 以外的全部欄位）
     
     Returns:
-        合併後的DataFrame
+        tuple: (與 historical_df 同索引的季度欄位DataFrame, 每列是否有對應季度數據的布林陣列)
     """
-    print(f"正在合併 {quarterly_name} 數據...")
+    if quarterly_mode == 'asof':
+        print(f"正在以公告日 as-of 合併 {quarterly_name} 數據...")
+        lookup, positions = asof_quarter_positions(historical_df, quarterly_df, max_staleness)
+    else:
+        print(f"正在合併 {quarterly_name} 數據...")
+        lookup, positions = calendar_quarter_positions(historical_df, quarterly_df)
     
     # 獲取季度數據的所有列（除了date和symbol）
     quarterly_cols = [col for col in quarterly_df.columns if col not in ['date', 'symbol']]
+    if output_columns is not None:
+        quarterly_cols = [col for col in quarterly_cols if col in output_columns]
     
-    # 批量添加新列，避免逐一添加導致的性能問題
-    new_cols = [col for col in quarterly_cols if col not in historical_df.columns]
-    if new_cols:
-        # 創建包含新列的DataFrame並一次性合併
-        new_cols_df = pd.DataFrame(index=historical_df.index, columns=new_cols)
-        new_cols_df[:] = np.nan
-        historical_df = pd.concat([historical_df, new_cols_df], axis=1)
-    
-    # 按symbol分組處理
-    for symbol in historical_df['symbol'].unique():
-        if symbol not in quarterly_df['symbol'].values:
-            continue
-            
-        print(f"  處理股票 {symbol} 的 {quarterly_name} 數據...")
-        
-        # 獲取該股票的歷史數據和季度數據
-        hist_symbol_idx = historical_df['symbol'] == symbol
-        quarterly_symbol = quarterly_df[quarterly_df['symbol'] == symbol].copy()
-        
-        # 為每一行歷史數據找到對應的季度數據
-        for idx in historical_df[hist_symbol_idx].index:
-            hist_date = historical_df.loc[idx, 'date']
-            
-            # 找到包含這個日期的季度數據
-            for _, quarterly_row in quarterly_symbol.iterrows():
-                year = quarterly_row['calendarYear']
-                quarter = quarterly_row['period']
-                
-                # 計算該季度的日期範圍
-                try:
-                    quarter_start, quarter_end = get_quarter_date_range(year, quarter)
-                    
-                    # 檢查歷史日期是否在該季度範圍內
-                    if quarter_start <= hist_date <= quarter_end:
-                        # 將季度數據複製到結果DataFrame
-                        for col in quarterly_cols:
-                            historical_df.loc[idx, col] = quarterly_row[col]
-                        break
-                        
-                except ValueError as e:
-                    print(f"    警告: {e} - 跳過該記錄")
-                    continue
+    matched = positions >= 0
+    matched_symbols = pd.unique(historical_df['symbol'].to_numpy()[matched])
+    print(f"  已對應 {len(matched_symbols)} 檔股票，共 {matched.sum()}/{len(historical_df)} 個交易日")
+    
+    # 整數欄位改用可為空的 Int64，避免未對應的交易日把 calendarYear 等欄位變成浮點數
+    lookup = lookup[quarterly_cols].reset_index(drop=True)
+    lookup = lookup.astype({col: 'Int64' for col in quarterly_cols
+                            if pd.api.types.is_integer_dtype(lookup[col].dtype)})
+    aligned = lookup.reindex(positions)
+    aligned.index = historical_df.index
     
-    return historical_df
+    return aligned, matched
 
-def merge_selected_data(selected_tables, daily_tables=None, historical_file='data/historicalPriceFull.csv'):
+def merge_quarterly_data_to_historical(historical_df, quarterly_df, quarterly_name):
+    """
+    將季度數據合併到歷史數據中（填入該日曆季度內的所有交易日）
+    
+    Args:
+        historical_df: 歷史價格數據DataFrame
+        quarterly_df: 季度財務數據DataFrame
+        quarterly_name: 季度數據的名稱（用於顯示）
+    
+    Returns:
+        合併後的DataFrame
+    """
+    aligned, matched = align_quarterly_table(historical_df, quarterly_df, quarterly_name)
+    return combine_aligned_columns(historical_df, [(aligned, matched)])
+
+def merge_quarterly_data_asof(historical_df, quarterly_df, quarterly_name, max_staleness=None):
+    """
+    以公告日（季度數據的 date 欄位）進行時點正確（point-in-time）的 as-of 合併
+    
+    每個交易日只使用當天或之前已公告的最新一筆季度記錄，避免將尚未公告的財報數據填入公告日之前的交易日
+    
+    Args:
+        historical_df: 歷史價格數據DataFrame
+        quarterly_df: 季度財務數據DataFrame
+        quarterly_name: 季度數據的名稱（用於顯示）
+        max_staleness: 最長有效期間（天數或 pd.Timedelta），交易日距公告日超過此期間時不填入（None 表示不限制）
+    
+    Returns:
+        合併後的DataFrame
+    """
+    aligned, matched = align_quarterly_table(historical_df, quarterly_df, quarterly_name, 'asof', max_staleness)
+    return combine_aligned_columns(historical_df, [(aligned, matched)])
+
+def check_column_overlap(existing_columns, new_columns):
+    """日資料欄位不可與已有欄位重複（與 DataFrame.join 的行為一致）"""
+    overlap = [col for col in new_columns if col in set(existing_columns)]
+    if overlap:
+        raise ValueError(f"columns overlap but no suffix specified: {overlap}")
+
+def combine_aligned_columns(historical_df, aligned_tables):
+    """
+    將多個已對齊到歷史數據列的表格一次合併，只建立一次最終的寬表
+    
+    Args:
+        historical_df: 歷史價格數據DataFrame
+        aligned_tables: [(對齊後的DataFrame, matched)]，依合併順序排列；
+                        matched 為 None 時整欄加入，否則已存在的欄位只覆寫 matched 為 True 的列
+    
+    Returns:
+        合併後的DataFrame
+    """
+    columns = {}
+    for aligned, matched in aligned_tables:
+        for col in aligned.columns:
+            if matched is not None and (col in columns or col in historical_df.columns):
+                base = columns[col] if col in columns else historical_df[col]
+                columns[col] = aligned[col].where(matched, base)
+            else:
+                columns[col] = aligned[col]
+    
+    # 已存在的欄位原地替換，新欄位依首次出現的順序一次加入
+    replaced = [col for col in columns if col in historical_df.columns]
+    if replaced:
+        historical_df = historical_df.copy()
+        for col in replaced:
+            historical_df[col] = columns[col]
+    new_series = [series for col, series in columns.items() if col not in replaced]
+    if not new_series:
+        return historical_df
+    return pd.concat([historical_df] + new_series, axis=1)
+
+def table_key(source):
+    """由表格路徑取得表格名稱（例如 'data/ratios.csv' -> 'ratios'）"""
+    return os.path.splitext(os.path.basename(source.rstrip('/')))[0]
+
+def provided_table(source, tables=None):
+    """
+    回傳 source 對應的提供者表格，沒有時回傳 None 表示需從磁碟讀取
+    
+    提供者表格可以是 DataFrame、回傳 DataFrame 的函數，或具有 columns 屬性與 load(columns) 方法的物件
+    （例如 universe.PartitionedTable，可只讀取需要的欄位）
+    """
+    if isinstance(source, pd.DataFrame) or callable(source):
+        return source
+    if tables is not None:
+        return tables.get(table_key(source))
+    return None
+
+def resolve_table(source, tables=None, columns=None):
+    """
+    取得表格數據
+    
+    Args:
+        source: DataFrame、回傳 DataFrame 的函數，或表格路徑
+        tables: 表格提供者，{表格名稱: DataFrame 或回傳 DataFrame 的函數}；
+                source 為路徑且提供者中有同名表格時直接使用，不讀取磁碟
+        columns: 只取這些欄位（None 表示全部）；從磁碟讀取時只讀入這些欄位
+    
+    Returns:
+        pd.DataFrame: 表格數據
+    """
+    table = provided_table(source, tables)
+    if table is None:
+        return load_table(source, columns=columns)
+    if hasattr(table, 'load'):
+        return table.load(columns)
+    df = table() if callable(table) else table
+    return df if columns is None else df[columns]
+
+def source_columns(source, tables=None):
+    """不讀取數據，只取得表格的欄位名稱（記憶體中 DataFrame 的欄位或檔案的標頭 / 中繼資料）"""
+    table = provided_table(source, tables)
+    if table is None:
+        return table_columns(source)
+    if hasattr(table, 'load'):
+        return list(table.columns)
+    if callable(table):
+        table = table()
+    return list(table.columns)
+
+def column_requested(column, requested):
+    """欄位是否符合要求的欄位名稱或萬用字元樣式（例如 'tech20*'、'*growth'）"""
+    return any(fnmatchcase(column, pattern) for pattern in requested)
+
+def load_projected_table(source, tables, requested, key_columns):
+    """
+    依要求的欄位只讀取表格中需要的部分（鍵欄位 + 符合要求的欄位）
+    
+    Args:
+        source: 表格來源（路徑、DataFrame 或函數）
+        tables: 表格提供者
+        requested: 要求的欄位名稱或樣式列表（None 表示全部）
+        key_columns: 合併時需要的鍵欄位（存在時一定讀取，但不計入輸出欄位）
+    
+    Returns:
+        tuple: (DataFrame, 輸出欄位列表)；表格沒有任何被要求的欄位時回傳 (None, [])，不讀取數據
+    """
+    if requested is None:
+        df = resolve_table(source, tables)
+        return df, [col for col in df.columns if col not in ['date', 'symbol']]
+    
+    available = source_columns(source, tables)
+    output_columns = [col for col in available
+                      if col not in ['date', 'symbol'] and column_requested(col, requested)]
+    if not output_columns:
+        return None, []
+    needed = [col for col in available if col in key_columns or col in output_columns]
+    return resolve_table(source, tables, needed), output_columns
+
+def merge_selected_data(selected_tables, daily_tables=None, historical_file='data/historicalPriceFull.csv',
+                        quarterly_mode='calendar', max_staleness=None, tables=None, columns=None):
     """
     合併用戶選擇的數據表
     
+    每個表格先各自對齊到歷史數據的 (date, symbol)，最後一次組成寬表，
+    耗時與記憶體只與輸出大小成正比，不會隨表格數量重複複製整個寬表
+    
     Args:
-        selected_tables: 選擇的季度表格列表，每個元素為 (文件路徑, 表格名稱)
-        daily_tables: 選擇的日資料表格列表，每個元素為 (文件路徑, 表格名稱)
-        historical_file: 歷史價格數據文件路徑
+        selected_tables: 選擇的季度表格列表，每個元素為 (文件路徑或 DataFrame, 表格名稱)
+        daily_tables: 選擇的日資料表格列表，每個元素為 (文件路徑或 DataFrame, 表格名稱)
+        historical_file: 歷史價格數據文件路徑或 DataFrame
+        quarterly_mode: 季度數據對應方式，'calendar' 填入同一日曆季度的交易日，'asof' 依公告日做時點正確的合併
+        max_staleness: as-of 模式下的最長有效天數（None 表示不限制）
+        tables: 記憶體中的表格提供者 {表格名稱: DataFrame}（例如 json_to_dataframe 的轉換結果），
+                有同名表格時不從磁碟讀取
+        columns: 需要的欄位名稱或萬用字元樣式（例如 ['tech20RSI', 'returnOnEquity', '*growth']，None 表示全部）；
+                 每個表格只讀取鍵欄位與符合的欄位，沒有符合欄位的表格不會讀取
     
     Returns:
         合併後的DataFrame
     """
     
-    # 讀取歷史價格數據
+    # 讀取歷史價格數據（date、symbol 一定保留）
     print("正在讀取歷史價格數據...")
-    result_df = pd.read_csv(historical_file)
-    result_df['date'] = pd.to_datetime(result_df['date'])
+    result_df, _ = load_projected_table(historical_file, tables, columns, ['date', 'symbol'])
+    if result_df is None:
+        result_df = resolve_table(historical_file, tables, ['date', 'symbol'])
     
     print(f"歷史數據維度: {result_df.shape}")
     
-    # 首先合併季度表格
+    aligned_tables = []
+    merged_columns = list(result_df.columns)
+    
+    # 首先對齊季度表格
     for file_path, table_name in selected_tables:
         print(f"\n=== 開始合併 {table_name} (季度數據) ===")
         
         try:
-            # 讀取季度數據
-            quarterly_df = pd.read_csv(file_path)
-            quarterly_df['date'] = pd.to_datetime(quarterly_df['date'])
+            # 讀取季度數據（只讀取鍵欄位與需要的欄位）
+            quarterly_df, output_columns = load_projected_table(
+                file_path, tables, columns, ['date', 'symbol', 'calendarYear', 'period'])
+            if quarterly_df is None:
+                print(f"{table_name} 沒有需要的欄位，略過（未讀取數據）")
+                continue
             
             print(f"{table_name} 數據維度: {quarterly_df.shape}")
             
-            # 合併數據
-            result_df = merge_quarterly_data_to_historical(result_df, quarterly_df, table_name)
+            aligned, matched = align_quarterly_table(result_df, quarterly_df, table_name,
+                                                     quarterly_mode, max_staleness, output_columns)
+            aligned_tables.append((aligned, matched))
+            merged_columns.extend(col for col in aligned.columns if col not in merged_columns)
             
             print(f"{table_name} 合併完成")
-            
+        
         except FileNotFoundError:
             print(f"警告: 找不到文件 {file_path}，跳過 {table_name}")
         except Exception as e:
             print(f"合併 {table_name} 時發生錯誤: {e}")
     
-    # 然後合併日資料表格
+    # 然後對齊日資料表格
     if daily_tables:
         for file_path, table_name in daily_tables:
             print(f"\n=== 開始合併 {table_name} (日資料) ===")
             
             try:
-                # 讀取日資料
-                daily_df = pd.read_csv(file_path)
-                daily_df['date'] = pd.to_datetime(daily_df['date'])
+                # 讀取日資料（只讀取鍵欄位與需要的欄位）
+                daily_df, _ = load_projected_table(file_path, tables, columns, ['date', 'symbol'])
+                if daily_df is None:
+                    print(f"{table_name} 沒有需要的欄位，略過（未讀取數據）")
+                    continue
                 
                 print(f"{table_name} 數據維度: {daily_df.shape}")
                 
-                # 合併日資料
-                result_df = merge_daily_data_to_historical(result_df, daily_df, table_name)
+                aligned = align_daily_table(result_df, daily_df, table_name)
+                check_column_overlap(merged_columns, aligned.columns)
+                aligned_tables.append((aligned, None))
+                merged_columns.extend(aligned.columns)
                 
                 print(f"{table_name} 合併完成")
-                
+            
             except FileNotFoundError:
                 print(f"警告: 找不到文件 {file_path}，跳過 {table_name}")
             except Exception as e:
                 print(f"合併 {table_name} 時發生錯誤: {e}")
     
-    return result_df
+    if columns is not None:
+        unmatched = [pattern for pattern in columns
+                     if not any(fnmatchcase(col, pattern) for col in merged_columns)]
+        if unmatched:
+            print(f"\n警告: 以下要求的欄位沒有任何表格提供: {', '.join(unmatched)}")
+    
+    # 一次組成最終的寬表
+    return combine_aligned_columns(result_df, aligned_tables)
+
+# 定義可用的數據表
+AVAILABLE_TABLES = {
+    '1': ('data/financialGrowth.csv', '財務成長數據'),
+    '2': ('data/ratios.csv', '財務比率數據'),
+    '3': ('data/cashFlowStatementGrowth.csv', '現金流量表成長數據'),
+    '4': ('data/incomeStatementGrowth.csv', '損益表成長數據'),
+    '5': ('data/balanceSheetStatementGrowth.csv', '資產負債表成長數據'),
+    # 未來可以在這裡新增更多表格
+    # '6': ('data/newTable.csv', '新的財務數據'),
+}
+
+# 定義可用的日資料表
+DAILY_TABLES_AVAILABLE = {
+    'd1': ('data/tech5.csv', 'Tech5技術指標數據'),
+    'd2': ('data/tech20.csv', 'Tech20技術指標數據'),
+    'd3': ('data/tech60.csv', 'Tech60技術指標數據'),
+    'd4': ('data/tech252.csv', 'Tech252技術指標數據'),
+    # 未來可以在這裡新增更多日資料表格
+}
 
-def main():
+def main(tables=None, fmt=None):
     """
     主函數
+    
+    Args:
+        tables: 記憶體中的表格提供者 {表格名稱: DataFrame}；由 main.py 傳入時不需重新讀取 data/ 中的檔案
+        fmt (str): 輸出格式（'csv'、'parquet'、'feather' 或 'npcol'；None 表示執行時詢問，預設為 DEFAULT_FORMAT）
     """
-    # 定義可用的數據表
-    available_tables = {
-        '1': ('data/financialGrowth.csv', '財務成長數據'),
-        '2': ('data/ratios.csv', '財務比率數據'),
-        '3': ('data/cashFlowStatementGrowth.csv', '現金流量表成長數據'),
-        '4': ('data/incomeStatementGrowth.csv', '損益表成長數據'),
-        '5': ('data/balanceSheetStatementGrowth.csv', '資產負債表成長數據'),
-        # 未來可以在這裡新增更多表格
-        # '6': ('data/newTable.csv', '新的財務數據'),
-    }
-    
-    # 定義可用的日資料表
-    daily_tables_available = {
-        'd1': ('data/tech5.csv', 'Tech5技術指標數據'),
-        'd2': ('data/tech20.csv', 'Tech20技術指標數據'),
-        'd3': ('data/tech60.csv', 'Tech60技術指標數據'),
-        'd4': ('data/tech252.csv', 'Tech252技術指標數據'),
-        # 未來可以在這裡新增更多日資料表格
-    }
+    available_tables = AVAILABLE_TABLES
+    daily_tables_available = DAILY_TABLES_AVAILABLE
     
     print("=== 股票數據合併工具 ===")
     print("\n📊 主表說明:")
     print("• 主表: data/historicalPriceFull.csv (每日歷史股價數據)")
     print("• 合併方式: 優先合併季度財務數據，然後合併日技術指標數據")
-    print("• 季度數據會填入對應季度內的所有交易日")
+    print("• 季度數據會填入對應季度內的所有交易日（或選擇依公告日 as-of 合併，避免使用尚未公告的數據）")
     print("• 日資料數據基於日期直接匹配合併")
     
     print("📋 可用的財務數據表 (季度數據):")
@@ -245,6 +512,8 @@ def main():
     print("  例如: 輸入 'd1,d2' 表示同時合併Tech5和Tech20數據")
     print("• 可以同時選擇財務數據和技術指標")
     print("  例如: 財務選擇 '1,2'，技術指標選擇 'd1' 表示合併財務成長、財務比率和Tech5數據")
+    print("• 欄位: 可只指定需要的欄位（可用 * 萬用字元），只會讀取這些欄位，沒有需要欄位的表格不會讀取")
+    print("  例如: 輸入 'close,tech20RSI,returnOnEquity,*growth' 表示只保留這些欄位")
     
     # 選擇財務數據表
     financial_input = input("\n請選擇財務數據表（用逗號分隔，留空表示不選擇）: ").strip()
@@ -252,6 +521,10 @@ def main():
     # 選擇技術指標表
     daily_input = input("請選擇技術指標表（用逗號分隔，留空表示不選擇）: ").strip()
     
+    # 選擇需要的欄位
+    columns_input = input("請輸入需要的欄位（用逗號分隔，可用 * 萬用字元，留空表示全部欄位）: ").strip()
+    requested_columns = [col.strip() for col in columns_input.split(',') if col.strip()] or None
+    
     # 檢查是否都為空
     if not financial_input and not daily_input:
         print("未選擇任何數據表，程式結束")
@@ -294,10 +567,51 @@ def main():
             for _, name in selected_daily_tables:
                 print(f"- {name}")
         
+        # 選擇季度數據的對應方式
+        quarterly_mode = 'calendar'
+        max_staleness = None
+        if selected_tables:
+            print(f"\n📅 季度數據對應方式:")
+            print("• 1: 填入同一日曆季度內的所有交易日（預設）")
+            print("• 2: 依公告日 as-of 合併，每個交易日只使用當天或之前已公告的最新一季")
+            mode_input = input("請選擇 (1/2，預設為 1): ").strip()
+            if mode_input == '2':
+                quarterly_mode = 'asof'
+                staleness_input = input("公告後最長有效天數（留空表示不限制）: ").strip()
+                if staleness_input:
+                    if staleness_input.isdigit():
+                        max_staleness = int(staleness_input)
+                    else:
+                        print(f"警告: 無效的天數 '{staleness_input}'，不限制有效天數")
+        
+        # 詢問是否要加入前瞻報酬標籤（訓練目標），在合併前確認標籤需要的 adjClose 欄位會被讀取
+        default_targets = ','.join(f"{horizon}:{threshold:g}" for horizon, threshold in DEFAULT_LABEL_TARGETS)
+        print(f"\n🎯 訓練標籤選項:")
+        print("• 依 adjClose 計算未來 N 個交易日的報酬，以及是否達到門檻的標籤（1 / 0）")
+        print(f"• 格式為 期間:門檻，可多組，例如 '{default_targets},20:0.05'（90 個交易日後是否成長 10%）")
+        print("• 期間超出數據範圍的最後幾列沒有標籤（NaN），移除 NaN 時會一併移除")
+        label_input = input(f"請輸入標籤（輸入 y 使用 {default_targets}，留空表示不加入）: ").strip()
+        label_targets = []
+        if label_input.lower() in ['y', 'yes']:
+            label_targets = list(DEFAULT_LABEL_TARGETS)
+        elif label_input:
+            try:
+                label_targets = parse_label_targets(label_input)
+            except ValueError:
+                print(f"警告: 無效的標籤 '{label_input}'（格式為 期間:門檻），不加入標籤")
+        
+        # 只選擇部分欄位時一併讀取 adjClose，加入標籤後再移除未要求的 adjClose
+        drop_label_price = False
+        if label_targets and requested_columns is not None and not column_requested('adjClose', requested_columns):
+            requested_columns = requested_columns + ['adjClose']
+            drop_label_price = True
+        
         print(f"\n開始合併數據...")
         
         # 執行合併（包含日資料和季度數據）
-        result_df = merge_selected_data(selected_tables, selected_daily_tables)
+        result_df = merge_selected_data(selected_tables, selected_daily_tables,
+                                        quarterly_mode=quarterly_mode, max_staleness=max_staleness,
+                                        tables=tables, columns=requested_columns)
         
         # 顯示統計信息
         print(f"\n=== 合併完成! ===")
@@ -331,6 +645,16 @@ def main():
                 rows_with_tech = len(result_df.dropna(subset=tech_cols, how='all'))
                 print(f"技術指標覆蓋率: {rows_with_tech/total_rows*100:.2f}% ({rows_with_tech}/{total_rows})")
         
+        # 加入前瞻報酬標籤（計算失敗時只略過標籤，合併結果照常保存）
+        if label_targets:
+            try:
+                result_df = add_forward_labels(result_df, label_targets)
+                if drop_label_price:
+                    result_df = result_df.drop(columns='adjClose')
+                print(f"✅ 已加入 {len(label_targets)} 組標籤")
+            except (KeyError, ValueError) as e:
+                print(f"警告: 無法計算標籤（{e}），不加入標籤")
+        
         # 詢問是否要移除包含 NaN 值的行
         print(f"\n📋 數據清理選項:")
         print("是否要移除包含 NaN 值的行？")
@@ -347,6 +671,8 @@ def main():
             all_table_names.extend([name.replace('數據', '') for _, name in selected_daily_tables])
         
         output_file = f"merged_{'_'.join(all_table_names)}_data.csv"
+        if quarterly_mode == 'asof':
+            output_file = output_file.replace('_data.csv', '_asof_data.csv')
         
         if clean_input in ['y', 'yes']:
             original_count = len(result_df)
@@ -375,8 +701,15 @@ def main():
         print("✅ 數據已按日期由新到舊排序")
         
         # 保存結果
-        print(f"\n正在保存合併後的數據到: {output_file}")
-        result_df.to_csv(output_file, index=False)
+        if fmt is None:
+            fmt = ask_format()
+        output_file = save_table(result_df, output_file, fmt)
+        print(f"\n已保存合併後的數據到: {output_file}")
+        
+        # 同時寫入記憶體映射特徵庫，供訓練程式以零複製方式讀取
+        store_dir = os.path.splitext(output_file)[0] + '.store'
+        write_feature_store(result_df, store_dir)
+        print(f"已保存記憶體映射特徵庫到: {store_dir}")
         
         # 最終統計信息
         print(f"輸出文件: {output_file}")
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 區段欄位定義模組
+集中記錄每個區段的來源欄位、輸出欄位名稱與目標型別，並以欄為單位一次建立 DataFrame
+"""
+
+import numpy as np
+import pandas as pd
+
+# 欄位定義格式: (來源 key, 輸出欄位名稱, 目標型別)
+# 來源 key 為 None 表示該欄位不在記錄中，由呼叫端以常數提供（例如 symbol）
+# 目標型別: 'datetime'、'object' 或 numpy 數值型別名稱
+
+# 季度報表共用的識別欄位
+QUARTERLY_KEY_COLUMNS = [
+    ('date', 'date', 'datetime'),
+    ('symbol', 'symbol', 'object'),
+    ('calendarYear', 'calendarYear', 'int64'),
+    ('period', 'period', 'object'),
+]
+
+HISTORICAL_PRICE_COLUMNS = [
+    ('date', 'date', 'datetime'),
+    (None, 'symbol', 'object'),
+    ('open', 'open', 'float64'),
+    ('high', 'high', 'float64'),
+    ('low', 'low', 'float64'),
+    ('close', 'close', 'float64'),
+    ('adjClose', 'adjClose', 'float64'),
+    ('volume', 'volume', 'int64'),
+    ('unadjustedVolume', 'unadjustedVolume', 'int64'),
+    ('change', 'change', 'float64'),
+    ('changePercent', 'changePercent', 'float64'),
+    ('vwap', 'vwap', 'float64'),
+    ('label', 'label', 'object'),
+    ('changeOverTime', 'changeOverTime', 'float64'),
+]
+
+# 技術指標欄位: (來源 key, 輸出欄位後綴, 目標型別)，輸出名稱為 tech{窗口}{後綴}
+TECH_FIELDS = [
+    ('open', 'Open', 'float64'),
+    ('high', 'High', 'float64'),
+    ('low', 'Low', 'float64'),
+    ('close', 'Close', 'float64'),
+    ('volume', 'Volume', 'int64'),
+    ('sma', 'SMA', 'float64'),
+    ('ema', 'EMA', 'float64'),
+    ('wma', 'WMA', 'float64'),
+    ('dema', 'DEMA', 'float64'),
+    ('tema', 'TEMA', 'float64'),
+    ('williams', 'Williams', 'float64'),
+    ('rsi', 'RSI', 'float64'),
+    ('adx', 'ADX', 'float64'),
+    ('standardDeviation', 'StandardDeviation', 'float64'),
+]
+
+# 技術指標的窗口（每個窗口一個 tech{窗口} 區段）
+TECH_WINDOWS = (5, 20, 60, 252)
+
+# 技術指標的預設股票代碼（JSON 的 tech 區段沒有 symbol 欄位）
+DEFAULT_TECH_SYMBOL = "1101.TW"
+
+FINANCIAL_GROWTH_FIELDS = [
+    'revenueGrowth',
+    'grossProfitGrowth',
+    'ebitgrowth',
+    'operatingIncomeGrowth',
+    'netIncomeGrowth',
+    'epsgrowth',
+    'epsdilutedGrowth',
+    'weightedAverageSharesGrowth',
+    'weightedAverageSharesDilutedGrowth',
+    'dividendsperShareGrowth',
+    'operatingCashFlowGrowth',
+    'freeCashFlowGrowth',
+    'tenYRevenueGrowthPerShare',
+    'fiveYRevenueGrowthPerShare',
+    'threeYRevenueGrowthPerShare',
+    'tenYOperatingCFGrowthPerShare',
+    'fiveYOperatingCFGrowthPerShare',
+    'threeYOperatingCFGrowthPerShare',
+    'tenYNetIncomeGrowthPerShare',
+    'fiveYNetIncomeGrowthPerShare',
+    'threeYNetIncomeGrowthPerShare',
+    'tenYShareholdersEquityGrowthPerShare',
+    'fiveYShareholdersEquityGrowthPerShare',
+    'threeYShareholdersEquityGrowthPerShare',
+    'tenYDividendperShareGrowthPerShare',
+    'fiveYDividendperShareGrowthPerShare',
+    'threeYDividendperShareGrowthPerShare',
+    'receivablesGrowth',
+    'inventoryGrowth',
+    'assetGrowth',
+    'bookValueperShareGrowth',
+    'debtGrowth',
+    'rdexpenseGrowth',
+    'sgaexpensesGrowth',
+]
+
+RATIOS_FIELDS = [
+    'currentRatio',
+    'quickRatio',
+    'cashRatio',
+    'daysOfSalesOutstanding',
+    'daysOfInventoryOutstanding',
+    'operatingCycle',
+    'daysOfPayablesOutstanding',
+    'cashConversionCycle',
+    'grossProfitMargin',
+    'operatingProfitMargin',
+    'pretaxProfitMargin',
+    'netProfitMargin',
+    'effectiveTaxRate',
+    'returnOnAssets',
+    'returnOnEquity',
+    'returnOnCapitalEmployed',
+    'netIncomePerEBT',
+    'ebtPerEbit',
+    'ebitPerRevenue',
+    'debtRatio',
+    'debtEquityRatio',
+    'longTermDebtToCapitalization',
+    'totalDebtToCapitalization',
+    'interestCoverage',
+    'cashFlowToDebtRatio',
+    'companyEquityMultiplier',
+    'receivablesTurnover',
+    'payablesTurnover',
+    'inventoryTurnover',
+    'fixedAssetTurnover',
+    'assetTurnover',
+    'operatingCashFlowPerShare',
+    'freeCashFlowPerShare',
+    'cashPerShare',
+    'payoutRatio',
+    'operatingCashFlowSalesRatio',
+    'freeCashFlowOperatingCashFlowRatio',
+    'cashFlowCoverageRatios',
+    'shortTermCoverageRatios',
+    'capitalExpenditureCoverageRatio',
+    'dividendPaidAndCapexCoverageRatio',
+    'dividendPayoutRatio',
+    'priceBookValueRatio',
+    'priceToBookRatio',
+    'priceToSalesRatio',
+    'priceEarningsRatio',
+    'priceToFreeCashFlowsRatio',
+    'priceToOperatingCashFlowsRatio',
+    'priceCashFlowRatio',
+    'priceEarningsToGrowthRatio',
+    'priceSalesRatio',
+    'dividendYield',
+    'enterpriseValueMultiple',
+    'priceFairValue',
+]
+
+CASH_FLOW_GROWTH_FIELDS = [
+    'growthNetIncome',
+    'growthDepreciationAndAmortization',
+    'growthDeferredIncomeTax',
+    'growthStockBasedCompensation',
+    'growthChangeInWorkingCapital',
+    'growthAccountsReceivables',
+    'growthInventory',
+    'growthAccountsPayables',
+    'growthOtherWorkingCapital',
+    'growthOtherNonCashItems',
+    'growthNetCashProvidedByOperatingActivites',
+    'growthInvestmentsInPropertyPlantAndEquipment',
+    'growthAcquisitionsNet',
+    'growthPurchasesOfInvestments',
+    'growthSalesMaturitiesOfInvestments',
+    'growthOtherInvestingActivites',
+    'growthNetCashUsedForInvestingActivites',
+    'growthDebtRepayment',
+    'growthCommonStockIssued',
+    'growthCommonStockRepurchased',
+    'growthDividendsPaid',
+    'growthOtherFinancingActivites',
+    'growthNetCashUsedProvidedByFinancingActivities',
+    'growthEffectOfForexChangesOnCash',
+    'growthNetChangeInCash',
+    'growthCashAtEndOfPeriod',
+    'growthCashAtBeginningOfPeriod',
+    'growthOperatingCashFlow',
+    'growthCapitalExpenditure',
+    'growthFreeCashFlow',
+]
+
+INCOME_GROWTH_FIELDS = [
+    'growthRevenue',
+    'growthCostOfRevenue',
+    'growthGrossProfit',
+    'growthGrossProfitRatio',
+    'growthResearchAndDevelopmentExpenses',
+    'growthGeneralAndAdministrativeExpenses',
+    'growthSellingAndMarketingExpenses',
+    'growthOtherExpenses',
+    'growthOperatingExpenses',
+    'growthCostAndExpenses',
+    'growthInterestExpense',
+    'growthDepreciationAndAmortization',
+    'growthEBITDA',
+    'growthEBITDARatio',
+    'growthOperatingIncome',
+    'growthOperatingIncomeRatio',
+    'growthTotalOtherIncomeExpensesNet',
+    'growthIncomeBeforeTax',
+    'growthIncomeBeforeTaxRatio',
+    'growthIncomeTaxExpense',
+    'growthNetIncome',
+    'growthNetIncomeRatio',
+    'growthEPS',
+    'growthEPSDiluted',
+    'growthWeightedAverageShsOut',
+    'growthWeightedAverageShsOutDil',
+]
+
+BALANCE_SHEET_GROWTH_FIELDS = [
+    'growthCashAndCashEquivalents',
+    'growthShortTermInvestments',
+    'growthCashAndShortTermInvestments',
+    'growthNetReceivables',
+    'growthInventory',
+    'growthOtherCurrentAssets',
+    'growthTotalCurrentAssets',
+    'growthPropertyPlantEquipmentNet',
+    'growthGoodwill',
+    'growthIntangibleAssets',
+    'growthGoodwillAndIntangibleAssets',
+    'growthLongTermInvestments',
+    'growthTaxAssets',
+    'growthOtherNonCurrentAssets',
+    'growthTotalNonCurrentAssets',
+    'growthOtherAssets',
+    'growthTotalAssets',
+    'growthAccountPayables',
+    'growthShortTermDebt',
+    'growthTaxPayables',
+    'growthDeferredRevenue',
+    'growthOtherCurrentLiabilities',
+    'growthTotalCurrentLiabilities',
+    'growthLongTermDebt',
+    'growthDeferredRevenueNonCurrent',
+    'growthDeferrredTaxLiabilitiesNonCurrent',
+    'growthOtherNonCurrentLiabilities',
+    'growthTotalNonCurrentLiabilities',
+    'growthOtherLiabilities',
+    'growthTotalLiabilities',
+    'growthCommonStock',
+    'growthRetainedEarnings',
+    'growthAccumulatedOtherComprehensiveIncomeLoss',
+    'growthOthertotalStockholdersEquity',
+    'growthTotalStockholdersEquity',
+    'growthTotalLiabilitiesAndStockholdersEquity',
+    'growthTotalInvestments',
+    'growthTotalDebt',
+    'growthNetDebt',
+]
+
+def float_columns(sources, renames=None):
+    """將來源 key 列表轉為 float64 欄位定義，renames 用於避免不同報表間的欄位名稱衝突"""
+    renames = renames or {}
+    return [(source, renames.get(source, source), 'float64') for source in sources]
+
+def tech_columns(window):
+    """產生 tech{window} 區段的欄位定義"""
+    return [('date', 'date', 'datetime'), (None, 'symbol', 'object')] + [
+        (source, f"tech{window}{suffix}", dtype) for source, suffix, dtype in TECH_FIELDS
+    ]
+
+def tech_extra_name(window):
+    """回傳將未定義欄位命名為 tech{window}Xxx 的函數"""
+    return lambda source: f"tech{window}{source[:1].upper()}{source[1:]}"
+
+# 各區段的欄位定義
+# columns: 欄位定義列表；ascending: 依日期排序方向；
+# extra_name: 未列在 columns 中的來源欄位的命名方式（保留而不是丟棄）
+SECTION_SCHEMAS = {
+    'historicalPriceFull': {
+        'columns': HISTORICAL_PRICE_COLUMNS,
+        'ascending': True,
+        'extra_name': lambda source: source,
+    },
+    'financialGrowth': {
+        'columns': QUARTERLY_KEY_COLUMNS + float_columns(FINANCIAL_GROWTH_FIELDS),
+        'ascending': False,
+        'extra_name': lambda source: source,
+    },
+    'ratios': {
+        'columns': QUARTERLY_KEY_COLUMNS + float_columns(RATIOS_FIELDS),
+        'ascending': False,
+        'extra_name': lambda source: source,
+    },
+    'cashFlowStatementGrowth': {
+        'columns': QUARTERLY_KEY_COLUMNS + float_columns(CASH_FLOW_GROWTH_FIELDS, {
+            'growthNetIncome': 'cf_growthNetIncome',
+            'growthDepreciationAndAmortization': 'cf_growthDepreciationAndAmortization',
+            'growthInventory': 'cf_growthInventory',
+        }),
+        'ascending': False,
+        'extra_name': lambda source: f"cf_{source}",
+    },
+    'incomeStatementGrowth': {
+        'columns': QUARTERLY_KEY_COLUMNS + float_columns(INCOME_GROWTH_FIELDS, {
+            'growthDepreciationAndAmortization': 'is_growthDepreciationAndAmortization',
+            'growthNetIncome': 'is_growthNetIncome',
+        }),
+        'ascending': False,
+        'extra_name': lambda source: f"is_{source}",
+    },
+    'balanceSheetStatementGrowth': {
+        'columns': QUARTERLY_KEY_COLUMNS + float_columns(BALANCE_SHEET_GROWTH_FIELDS, {
+            'growthInventory': 'bs_growthInventory',
+        }),
+        'ascending': False,
+        'extra_name': lambda source: f"bs_{source}",
+    },
+}
+
+for _window in TECH_WINDOWS:
+    SECTION_SCHEMAS[f'tech{_window}'] = {
+        'columns': tech_columns(_window),
+        'ascending': True,
+        'extra_name': tech_extra_name(_window),
+        'constants': {'symbol': DEFAULT_TECH_SYMBOL},
+    }
+
+def is_daily_section(key):
+    """是否為日資料區段（historicalPriceFull 與 tech*，每個交易日一筆；其餘為季度區段）"""
+    return (None, 'symbol', 'object') in SECTION_SCHEMAS[key]['columns']
+
+def numeric_block(raw, sources):
+    """將多個來源欄位一次轉為 float64 二維陣列；缺少的欄位為 NaN，無法轉換的值視為 NaN"""
+    block = raw.reindex(columns=sources)
+    try:
+        return block.to_numpy(dtype='float64', na_value=np.nan)
+    except (TypeError, ValueError):
+        return block.apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+def build_section_frame(records, schema, constants=None, sort=True, keep_extra=True):
+    """
+    依欄位定義將記錄列表以欄為單位轉換為 DataFrame
+    
+    Args:
+        records (list): JSON 區段的記錄列表
+        schema (dict): SECTION_SCHEMAS 中的區段定義
+        constants (dict): 來源 key 為 None 的欄位值（覆蓋 schema 中的 constants）
+        sort (bool): 是否依日期排序
+        keep_extra (bool): 是否保留未列在欄位定義中的來源欄位
+    
+    Returns:
+        pd.DataFrame: 轉換後的 DataFrame
+    """
+    # 一次將所有記錄轉為原始欄位，再依定義挑選、改名與轉型
+    raw = pd.DataFrame.from_records(records) if records else pd.DataFrame()
+    row_count = len(raw)
+    values_for = {**schema.get('constants', {}), **(constants or {})}
+    columns = schema['columns']
+    
+    # 數值欄位整塊轉換，避免逐欄呼叫 pandas 的轉型開銷
+    numeric = [(i, source, dtype) for i, (source, _, dtype) in enumerate(columns)
+               if source is not None and dtype not in ('datetime', 'object')]
+    block = numeric_block(raw, [source for _, source, _ in numeric])
+    converted = {}
+    for offset, (i, _, dtype) in enumerate(numeric):
+        values = block[:, offset]
+        # 整數欄位含缺失值時保留 float64
+        if dtype != 'float64' and not np.isnan(values).any():
+            values = values.astype(dtype)
+        converted[i] = values
+    
+    data = {}
+    for i, (source, name, dtype) in enumerate(columns):
+        if i in converted:
+            data[name] = converted[i]
+        elif source is None:
+            data[name] = np.full(row_count, values_for.get(name), dtype=object)
+        elif dtype == 'datetime':
+            data[name] = pd.to_datetime(raw[source]) if source in raw.columns else pd.NaT
+        else:
+            data[name] = raw[source].astype(object) if source in raw.columns else None
+    
+    if keep_extra:
+        known_sources = {source for source, _, _ in columns}
+        for source in raw.columns:
+            if source in known_sources:
+                continue
+            name = schema['extra_name'](source)
+            if name in data:
+                print(f"警告: 未定義欄位 {source} 與既有欄位 {name} 衝突，已略過")
+                continue
+            data[name] = raw[source]
+    
+    df = pd.DataFrame(data, index=raw.index)
+    
+    if sort and 'date' in df.columns:
+        df = df.sort_values('date', ascending=schema['ascending']).reset_index(drop=True)
+    
+    return df
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LSTM 訓練序列模組
+依模型說明的 y(t) = f(x(t-1), ..., x(t-n))，每個樣本為同一檔股票第 t 列之前 n 列的特徵與第 t 列的標籤。
+
+每檔股票的特徵矩陣（交易日數 x 特徵數）只建立一次，(樣本數 x 回看期間 x 特徵數) 的序列是該矩陣上的
+滑動窗口視圖（stride tricks），不會把每一列複製 n 次。數據大於記憶體時可逐檔讀取記憶體映射特徵庫，
+將序列分片寫成 .npy 記憶體映射檔:
+
+    output_dir/manifest.json
+    output_dir/shard00000.x.npy       (樣本數, 回看期間, 特徵數)
+    output_dir/shard00000.y.npy       (樣本數,)
+    output_dir/shard00000.date.npy    (樣本數,) 標籤列的日期
+    output_dir/shard00000.symbol.npy  (樣本數,) 股票代碼在 manifest symbols 中的位置
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from feature_store import FeatureStore, open_feature_store
+from labels import DEFAULT_LABEL_TARGETS, is_label_column, label_columns
+
+SEQUENCE_MANIFEST_FILE = 'manifest.json'
+SEQUENCE_VERSION = 1
+
+DEFAULT_LOOKBACK = 60
+
+# 每個分片的目標大小（MB）
+DEFAULT_SHARD_MB = 256
+
+
+def default_features(source):
+    """預設特徵: date、symbol 與標籤欄位以外的所有數值欄位"""
+    if isinstance(source, FeatureStore):
+        numeric = [entry['name'] for entry in source.manifest['columns']
+                   if entry['kind'] == 'native' and np.dtype(entry['dtype']).kind in 'biuf']
+    else:
+        numeric = [col for col in source.columns if pd.api.types.is_numeric_dtype(source[col])]
+    return [col for col in numeric if col not in ('date', 'symbol') and not is_label_column(col)]
+
+
+def iter_symbol_matrices(source, features, target=None, dtype='float32'):
+    """
+    逐檔股票取出依日期排序的特徵矩陣、標籤與日期
+
+    Args:
+        source: merge_selected_data 的合併結果（DataFrame），或記憶體映射特徵庫（FeatureStore）
+        features (list): 特徵欄位
+        target (str): 標籤欄位（None 表示沒有標籤）
+        dtype: 特徵矩陣的型別
+
+    Yields:
+        tuple: (symbol, 特徵矩陣 (交易日數, 特徵數), 標籤 (交易日數,) 或 None, 日期 (交易日數,))
+    """
+    if isinstance(source, FeatureStore):
+        # 特徵庫已依 symbol、date 排序，每次只讀入一檔股票的欄位範圍
+        for symbol in source.symbols:
+            rows = source.rows(symbol)
+            matrix = np.empty((rows.stop - rows.start, len(features)), dtype=dtype)
+            for j, name in enumerate(features):
+                matrix[:, j] = source.column(name)[rows]
+            targets = np.asarray(source.column(target)[rows], dtype='float64') if target else None
+            yield symbol, matrix, targets, np.asarray(source.column('date')[rows])
+        return
+
+    df = source.sort_values(['symbol', 'date'], kind='stable')
+    # 整個特徵矩陣只建立一次，各股票的矩陣是其中連續列範圍的視圖
+    matrix = np.ascontiguousarray(df[features].to_numpy(dtype=dtype))
+    targets = df[target].to_numpy(dtype='float64') if target else None
+    dates = pd.to_datetime(df['date']).to_numpy()
+    symbols = df['symbol'].astype(str).to_numpy()
+    boundaries = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+    for start, stop in zip(np.r_[0, boundaries], np.r_[boundaries, len(df)]):
+        if stop > start:
+            yield (symbols[start], matrix[start:stop], targets[start:stop] if targets is not None else None,
+                   dates[start:stop])
+
+
+def window_view(matrix, lookback):
+    """
+    特徵矩陣上的滑動窗口視圖（不複製數據）
+
+    Returns:
+        np.ndarray: (交易日數 - lookback, lookback, 特徵數) 的唯讀視圖，第 k 個樣本為第 k .. k + lookback - 1 列，
+            對應第 k + lookback 列的標籤
+    """
+    rows = matrix.shape[0]
+    if rows <= lookback:
+        return np.empty((0, lookback, matrix.shape[1]), dtype=matrix.dtype)
+    windows = np.lib.stride_tricks.sliding_window_view(matrix, lookback, axis=0)
+    return windows[:rows - lookback].transpose(0, 2, 1)
+
+
+def sample_range(rows, lookback, targets=None):
+    """
+    可用樣本的標籤列範圍 [start, stop): 至少有 lookback 列歷史，且去除頭尾沒有標籤（NaN）的列
+
+    前瞻標籤只有最後幾列是 NaN，去除後仍是連續範圍，因此樣本仍是窗口視圖的切片
+    """
+    start, stop = lookback, rows
+    if targets is not None:
+        valid = np.flatnonzero(~np.isnan(targets))
+        if not len(valid):
+            return start, start
+        start = max(start, int(valid[0]))
+        stop = int(valid[-1]) + 1
+    return start, max(start, stop)
+
+
+def iter_sequences(source, features=None, target=None, lookback=DEFAULT_LOOKBACK, dtype='float32'):
+    """
+    逐檔股票產生 LSTM 訓練序列
+
+    Args:
+        source: 合併結果（DataFrame）或記憶體映射特徵庫（FeatureStore）
+        features (list): 特徵欄位（None 表示 default_features）
+        target (str): 標籤欄位（例如 labels 產生的 'gain10pct90d'；None 表示沒有標籤）
+        lookback (int): 回看期間 n
+        dtype: 特徵型別
+
+    Yields:
+        tuple: (symbol, X, y, dates)；X 為 (樣本數, lookback, 特徵數) 的窗口視圖，y 與 dates 為第 t 列的標籤與日期
+    """
+    features = default_features(source) if features is None else list(features)
+    for symbol, matrix, targets, dates in iter_symbol_matrices(source, features, target, dtype):
+        start, stop = sample_range(len(matrix), lookback, targets)
+        windows = window_view(matrix, lookback)[start - lookback:stop - lookback]
+        yield symbol, windows, targets[start:stop] if targets is not None else None, dates[start:stop]
+
+
+def write_sequence_shards(source, output_dir, features=None, target=None, lookback=DEFAULT_LOOKBACK,
+                          dtype='float32', shard_mb=DEFAULT_SHARD_MB):
+    """
+    將序列分片寫成 .npy 記憶體映射檔；由特徵庫讀取時，記憶體中只有一檔股票的特徵矩陣與目前的分片頁面
+
+    Args:
+        source: 合併結果（DataFrame）或記憶體映射特徵庫（FeatureStore / 特徵庫目錄）
+        output_dir (str): 輸出目錄
+        features, target, lookback, dtype: 同 iter_sequences
+        shard_mb (int): 每個分片的目標大小（MB）
+
+    Returns:
+        dict: manifest 內容
+    """
+    if isinstance(source, str):
+        source = open_feature_store(source)
+    features = default_features(source) if features is None else list(features)
+    sample_bytes = lookback * len(features) * np.dtype(dtype).itemsize
+    shard_samples = max(1, int(shard_mb * 1024 * 1024) // max(1, sample_bytes))
+
+    tmp_dir = output_dir.rstrip('/') + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    symbols = []
+    shards = []
+    shard = None
+
+    def open_shard():
+        prefix = os.path.join(tmp_dir, f"shard{len(shards):05d}")
+        arrays = {
+            'x': np.lib.format.open_memmap(prefix + '.x.npy', 'w+', dtype, (shard_samples, lookback, len(features))),
+            'y': np.lib.format.open_memmap(prefix + '.y.npy', 'w+', 'float64', (shard_samples,)),
+            'date': np.lib.format.open_memmap(prefix + '.date.npy', 'w+', 'datetime64[ns]', (shard_samples,)),
+            'symbol': np.lib.format.open_memmap(prefix + '.symbol.npy', 'w+', 'int32', (shard_samples,)),
+        }
+        shards.append({'prefix': os.path.basename(prefix), 'samples': 0})
+        return arrays
+
+    for symbol, windows, targets, dates in iter_sequences(source, features, target, lookback, dtype):
+        symbols.append(symbol)
+        position = 0
+        while position < len(windows):
+            if shard is None or shards[-1]['samples'] == shard_samples:
+                shard = open_shard()
+            offset = shards[-1]['samples']
+            count = min(len(windows) - position, shard_samples - offset)
+            # 只在寫入分片時複製一次，每個樣本直接由窗口視圖寫入記憶體映射檔
+            shard['x'][offset:offset + count] = windows[position:position + count]
+            shard['y'][offset:offset + count] = targets[position:position + count] if targets is not None else np.nan
+            shard['date'][offset:offset + count] = dates[position:position + count]
+            shard['symbol'][offset:offset + count] = len(symbols) - 1
+            shards[-1]['samples'] += count
+            position += count
+    del shard
+
+    # 最後一個分片依實際樣本數重新寫出（只有這個分片需要複製）
+    if shards and shards[-1]['samples'] < shard_samples:
+        prefix = os.path.join(tmp_dir, shards[-1]['prefix'])
+        for key in ('x', 'y', 'date', 'symbol'):
+            path = f"{prefix}.{key}.npy"
+            np.save(path + '.tmp.npy', np.load(path, mmap_mode='r')[:shards[-1]['samples']])
+            os.replace(path + '.tmp.npy', path)
+
+    manifest = {
+        'version': SEQUENCE_VERSION,
+        'lookback': lookback,
+        'features': features,
+        'target': target,
+        'dtype': str(np.dtype(dtype)),
+        'samples': sum(info['samples'] for info in shards),
+        'symbols': symbols,
+        'shards': shards,
+    }
+    with open(os.path.join(tmp_dir, SEQUENCE_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.replace(tmp_dir, output_dir)
+    return manifest
+
+
+class SequenceShards:
+    """
+    唯讀的序列分片
+
+    分片在第一次存取時才以 mmap 開啟；batches() 回傳的是記憶體映射檔的切片，只有讀到的頁面會載入
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        with open(os.path.join(output_dir, SEQUENCE_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != SEQUENCE_VERSION:
+            raise ValueError(f"不支援的序列版本: {self.manifest.get('version')}")
+        self.arrays = {}
+
+    def __len__(self):
+        return self.manifest['samples']
+
+    @property
+    def features(self):
+        return self.manifest['features']
+
+    def shard(self, index):
+        """回傳第 index 個分片的 {'x', 'y', 'date', 'symbol'} 記憶體映射陣列"""
+        if index not in self.arrays:
+            prefix = os.path.join(self.output_dir, self.manifest['shards'][index]['prefix'])
+            self.arrays[index] = {key: np.load(f"{prefix}.{key}.npy", mmap_mode='r')
+                                  for key in ('x', 'y', 'date', 'symbol')}
+        return self.arrays[index]
+
+    def batches(self, batch_size):
+        """
+        依序產生 (X, y) 批次（不跨分片，每個分片最後一批可能較小）
+
+        Yields:
+            tuple: ((批次大小, lookback, 特徵數), (批次大小,))
+        """
+        for index in range(len(self.manifest['shards'])):
+            arrays = self.shard(index)
+            for start in range(0, len(arrays['x']), batch_size):
+                yield arrays['x'][start:start + batch_size], arrays['y'][start:start + batch_size]
+
+
+def open_sequence_shards(output_dir):
+    """開啟序列分片"""
+    return SequenceShards(output_dir)
+
+
+def main():
+    """
+    由記憶體映射特徵庫產生 LSTM 訓練序列分片
+    """
+    store_dir = input("請輸入特徵庫目錄（merged_*.store）: ").strip()
+    if not os.path.exists(os.path.join(store_dir, 'manifest.json')):
+        print(f"❌ {store_dir} 不是特徵庫目錄")
+        return
+    store = open_feature_store(store_dir)
+
+    default_target = label_columns(*DEFAULT_LABEL_TARGETS[0])[1]
+    target = input(f"請輸入標籤欄位（預設為 {default_target}）: ").strip() or default_target
+    if target not in store.columns:
+        print(f"❌ 特徵庫中沒有標籤欄位 {target}（請在 merge_financial_data.py 合併時加入標籤）")
+        return
+    lookback_input = input(f"回看期間（預設為 {DEFAULT_LOOKBACK}）: ").strip()
+    lookback = int(lookback_input) if lookback_input.isdigit() else DEFAULT_LOOKBACK
+    output_dir = input("請輸入輸出目錄（預設為 sequences）: ").strip() or 'sequences'
+
+    manifest = write_sequence_shards(store, output_dir, target=target, lookback=lookback)
+    print(f"已寫出 {manifest['samples']:,} 個樣本（{len(manifest['features'])} 個特徵 x {lookback} 日，"
+          f"{len(manifest['shards'])} 個分片）到: {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+壓縮快照格式模組
+將原始 JSON 的每個區段以精簡（無縮排）JSON 各自壓縮成獨立區塊，並在檔尾記錄區塊索引，
+讀取時可只解壓需要的區段
+
+檔案格式:
+    MAGIC | 區塊 1 | 區塊 2 | ... | 索引 JSON | 索引長度 (8 bytes, little-endian) | MAGIC
+"""
+
+import gzip
+import io
+import json
+import lzma
+import os
+import struct
+
+from json_stream_reader import JsonStream, iter_json_sections, DEFAULT_CHUNK_SIZE
+
+MAGIC = b'STKSNAP1'
+
+# 支援的壓縮方式: (壓縮函數工廠, 解壓檔案物件工廠)
+CODECS = {
+    'gzip': (lambda: _GzipCompressor(), lambda raw: gzip.GzipFile(fileobj=raw)),
+    'lzma': (lambda: lzma.LZMACompressor(preset=6), lambda raw: lzma.LZMAFile(raw)),
+}
+
+
+class _GzipCompressor:
+    """提供與 LZMACompressor 相同 compress/flush 介面的 gzip 壓縮器"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.file = gzip.GzipFile(fileobj=self.buffer, mode='wb', compresslevel=6, mtime=0)
+
+    def _drain(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def compress(self, data):
+        self.file.write(data)
+        return self._drain()
+
+    def flush(self):
+        self.file.close()
+        return self._drain()
+
+
+def is_snapshot(file_path):
+    """檢查檔案是否為快照格式"""
+    with open(file_path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _BlockWriter:
+    """將一個區段的 JSON 文字分段壓縮寫入檔案，並記錄其位移與長度"""
+
+    def __init__(self, file, codec):
+        self.file = file
+        self.offset = file.tell()
+        self.compressor = CODECS[codec][0]()
+        self.count = 0
+
+    def write(self, text):
+        self.file.write(self.compressor.compress(text.encode('utf-8')))
+
+    def close(self):
+        self.file.write(self.compressor.flush())
+        return self.offset, self.file.tell() - self.offset
+
+
+def write_snapshot(json_file_path, snapshot_path, codec='gzip', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    將 JSON 檔案串流轉換為壓縮快照
+
+    每個區段（陣列區段或物件區段下的子鍵，例如 historicalPriceFull.historical）成為一個獨立區塊
+
+    Args:
+        json_file_path (str): 原始 JSON 檔案路徑
+        snapshot_path (str): 快照輸出路徑
+        codec (str): 壓縮方式，'gzip' 或 'lzma'
+        chunk_size (int): 串流讀取時每批的記錄數
+
+    Returns:
+        dict: 區塊索引 {區段路徑: {'offset', 'length', 'codec', 'kind', 'count'}}
+    """
+    if codec not in CODECS:
+        raise ValueError(f"不支援的壓縮方式: {codec}")
+
+    index = {}
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        writer = None
+        current = None
+
+        def finish_block():
+            offset, length = writer.close()
+            index[current]['offset'] = offset
+            index[current]['length'] = length
+            if index[current]['kind'] == 'array':
+                index[current]['count'] = writer.count
+
+        for path, payload in iter_json_sections(json_file_path, chunk_size):
+            is_array = isinstance(payload, list)
+            # 同一陣列區段的後續批次接在目前區塊之後
+            if path == current and is_array and index[current]['kind'] == 'array':
+                for record in payload:
+                    writer.write(',' + json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                writer.count += len(payload)
+                continue
+
+            if writer is not None:
+                if index[current]['kind'] == 'array':
+                    writer.write(']')
+                finish_block()
+
+            current = path
+            writer = _BlockWriter(f, codec)
+            if is_array:
+                index[path] = {'codec': codec, 'kind': 'array', 'count': 0}
+                writer.write('[' + ','.join(json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+                                            for record in payload))
+                writer.count += len(payload)
+            else:
+                index[path] = {'codec': codec, 'kind': 'value', 'count': None}
+                writer.write(json.dumps(payload, ensure_ascii=False, separators=(',', ':')))
+
+        if writer is not None:
+            if index[current]['kind'] == 'array':
+                writer.write(']')
+            finish_block()
+
+        index_bytes = json.dumps(index, ensure_ascii=False).encode('utf-8')
+        f.write(index_bytes)
+        f.write(struct.pack('<Q', len(index_bytes)))
+        f.write(MAGIC)
+
+    os.replace(tmp_path, snapshot_path)
+    return index
+
+
+def read_snapshot_index(snapshot_path):
+    """讀取快照檔尾的區塊索引"""
+    with open(snapshot_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是快照格式的檔案: {snapshot_path}")
+        f.seek(-(len(MAGIC) + 8), os.SEEK_END)
+        index_length = struct.unpack('<Q', f.read(8))[0]
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"快照檔案不完整: {snapshot_path}")
+        f.seek(-(len(MAGIC) + 8 + index_length), os.SEEK_END)
+        return json.loads(f.read(index_length).decode('utf-8'))
+
+
+def _open_block(file, entry):
+    """回傳區塊解壓後的文字串流（只讀入該區塊的壓縮內容）"""
+    file.seek(entry['offset'])
+    raw = io.BytesIO(file.read(entry['length']))
+    return io.TextIOWrapper(CODECS[entry['codec']][1](raw), encoding='utf-8')
+
+
+def iter_snapshot_sections(snapshot_path, sections=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    依區塊索引串流讀取快照，介面與 json_stream_reader.iter_json_sections 相同
+
+    Args:
+        snapshot_path (str): 快照檔案路徑
+        sections (iterable): 只讀取這些頂層 key 的區塊（None 表示全部），其餘區塊不會解壓
+        chunk_size (int): 每個批次的最大記錄數
+
+    Yields:
+        tuple: (區段路徑, 記錄批次 list 或單一值)
+    """
+    wanted = set(sections) if sections is not None else None
+    index = read_snapshot_index(snapshot_path)
+
+    with open(snapshot_path, 'rb') as f:
+        for path, entry in sorted(index.items(), key=lambda item: item[1]['offset']):
+            if wanted is not None and path.split('.')[0] not in wanted:
+                continue
+            with _open_block(f, entry) as text:
+                stream = JsonStream(text)
+                if entry['kind'] == 'array':
+                    for chunk in stream.iter_array_chunks(chunk_size):
+                        yield path, chunk
+                else:
+                    yield path, stream.decode_value()
+
+
+def iter_sections(file_path, sections=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """依檔案格式（快照或 JSON）選擇對應的串流讀取方式"""
+    if is_snapshot(file_path):
+        return iter_snapshot_sections(file_path, sections, chunk_size)
+    return iter_json_sections(file_path, chunk_size)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Walk-forward 驗證切分模組
+將合併後的數據依交易日切成多組 (訓練, 驗證) fold，每組以整數索引陣列表示，不複製任何特徵數據。
+
+前瞻標籤（labels.py）的第 t 列使用到 t + 期間 的價格，驗證期間開始前的最後幾列標籤會與驗證期間重疊，
+直接切分會把驗證期間的資訊洩漏到訓練資料:
+- purge: 移除標籤期間結束日不早於驗證期間開始日的訓練列
+- embargo: 在 purge 之外，再空出驗證期間開始前的 embargo 個交易日不作為訓練資料
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import FeatureStore, open_feature_store
+from labels import DEFAULT_LABEL_TARGETS
+
+DEFAULT_SPLITS = 5
+
+
+def split_keys(source):
+    """
+    取出切分需要的日期與股票代碼（不讀取特徵欄位）
+
+    Args:
+        source: 合併結果（DataFrame）或記憶體映射特徵庫（FeatureStore）
+
+    Returns:
+        tuple: (日期 datetime64 陣列, 股票代碼的整數編碼)
+    """
+    if isinstance(source, FeatureStore):
+        return np.asarray(source.column('date')), np.asarray(source.column('symbol'))
+    codes, _ = pd.factorize(source['symbol'])
+    return pd.to_datetime(source['date']).to_numpy(), codes
+
+
+def label_end_days(days, codes, horizon):
+    """
+    每一列標籤期間結束的交易日序號（同一檔股票往後第 horizon 列的交易日）
+
+    Args:
+        days (np.ndarray): 每一列的交易日序號（所有股票共用的交易日編號）
+        codes (np.ndarray): 股票代碼的整數編碼
+        horizon (int): 標籤期間（交易日數，與 labels.forward_labels 相同）
+
+    Returns:
+        np.ndarray: 結束交易日序號；期間超出該股票數據範圍的列（沒有標籤）為交易日總數
+    """
+    order = np.lexsort((days, codes))
+    sorted_codes = codes[order]
+    sorted_days = days[order]
+    rows = len(order)
+    position = np.arange(rows)
+    last = np.flatnonzero(np.r_[sorted_codes[1:] != sorted_codes[:-1], True])
+    remaining = last[np.searchsorted(last, position)] - position
+
+    unknown = sorted_days.max() + 1 if rows else 0
+    ends = np.where(remaining >= horizon, sorted_days[np.minimum(position + horizon, rows - 1)], unknown)
+    result = np.empty(rows, dtype=np.int64)
+    result[order] = ends
+    return result
+
+
+def walk_forward_splits(source, n_splits=DEFAULT_SPLITS, horizon=DEFAULT_LABEL_TARGETS[0][0], embargo=0,
+                        test_size=None, max_train_size=None):
+    """
+    產生 walk-forward 的 (訓練, 驗證) fold
+
+    最後 n_splits 個長度為 test_size 的交易日區段依序作為驗證期間，訓練資料為驗證期間之前的列（擴展窗口；
+    指定 max_train_size 時只取最近的交易日），並移除標籤期間與驗證期間重疊的列（purge）及 embargo 的交易日。
+    驗證資料不包含沒有標籤（期間超出數據範圍）的列
+
+    Args:
+        source: 合併結果（DataFrame）或記憶體映射特徵庫（FeatureStore），多檔股票依交易日一起切分
+        n_splits (int): fold 數量
+        horizon (int): 標籤期間（交易日數）
+        embargo (int): 驗證期間開始前額外空出的交易日數
+        test_size (int): 每個驗證期間的交易日數（None 表示 交易日總數 // (n_splits + 1)）
+        max_train_size (int): 只取 embargo 之前最近的交易日數作為訓練期間（purge 在此範圍內進行；None 表示從第一個交易日開始）
+
+    Yields:
+        tuple: (訓練列索引, 驗證列索引)，為 source 的位置索引（可直接用於 iloc、np.take 或記憶體映射陣列）
+    """
+    dates, codes = split_keys(source)
+    unique_dates, days = np.unique(dates, return_inverse=True)
+    days = days.astype(np.int64)
+    total_days = len(unique_dates)
+    ends = label_end_days(days, codes, horizon)
+
+    test_size = test_size or total_days // (n_splits + 1)
+    first_test = total_days - n_splits * test_size
+    if test_size < 1 or first_test - embargo - horizon <= 0:
+        raise ValueError(f"交易日數不足: {total_days} 個交易日無法切成 {n_splits} 個驗證期間"
+                         f"（期間 {horizon}、embargo {embargo}）")
+
+    for split in range(n_splits):
+        test_start = first_test + split * test_size
+        test_stop = test_start + test_size
+        # 標籤期間結束日必定不早於該列的交易日，因此只需比較結束日
+        cutoff = test_start - embargo
+        train_mask = ends < cutoff
+        if max_train_size is not None:
+            train_mask &= days >= cutoff - max_train_size
+        test_mask = (days >= test_start) & (days < test_stop) & (ends < total_days)
+        yield np.flatnonzero(train_mask), np.flatnonzero(test_mask)
+
+
+def describe_splits(source, splits):
+    """
+    每個 fold 的日期範圍與列數
+
+    Returns:
+        pd.DataFrame: fold、train_start、train_end、test_start、test_end、train_rows、test_rows
+    """
+    dates, _ = split_keys(source)
+    records = []
+    for fold, (train, test) in enumerate(splits):
+        train_dates = dates[train]
+        test_dates = dates[test]
+        records.append({
+            'fold': fold,
+            'train_start': train_dates.min() if len(train) else pd.NaT,
+            'train_end': train_dates.max() if len(train) else pd.NaT,
+            'test_start': test_dates.min() if len(test) else pd.NaT,
+            'test_end': test_dates.max() if len(test) else pd.NaT,
+            'train_rows': len(train),
+            'test_rows': len(test),
+        })
+    return pd.DataFrame(records)
+
+
+def main():
+    """
+    顯示特徵庫的 walk-forward fold
+    """
+    store_dir = input("請輸入特徵庫目錄（merged_*.store）: ").strip()
+    if not os.path.exists(os.path.join(store_dir, 'manifest.json')):
+        print(f"❌ {store_dir} 不是特徵庫目錄")
+        return
+    store = open_feature_store(store_dir)
+
+    splits_input = input(f"fold 數量（預設為 {DEFAULT_SPLITS}）: ").strip()
+    horizon_input = input(f"標籤期間（交易日，預設為 {DEFAULT_LABEL_TARGETS[0][0]}）: ").strip()
+    embargo_input = input("embargo 交易日數（預設為 0）: ").strip()
+    try:
+        splits = list(walk_forward_splits(
+            store,
+            n_splits=int(splits_input) if splits_input.isdigit() else DEFAULT_SPLITS,
+            horizon=int(horizon_input) if horizon_input.isdigit() else DEFAULT_LABEL_TARGETS[0][0],
+            embargo=int(embargo_input) if embargo_input.isdigit() else 0,
+        ))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print(describe_splits(store, splits).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表格讀寫模組
+提供 CSV、Parquet、Feather 與 NumPy 欄式目錄（npcol）等輸出格式，
+依副檔名自動選擇讀取方式，並保留欄位型別與原生日期
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# 預設輸出格式（可改為 'parquet'、'feather' 或 'npcol'）
+DEFAULT_FORMAT = 'csv'
+
+# 各格式的副檔名
+FORMAT_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'npcol': '.npcol',
+}
+
+# npcol 目錄中的欄位清單檔案
+NPCOL_META = 'meta.json'
+
+
+def require_pyarrow(fmt):
+    """Parquet / Feather 需要 pyarrow，未安裝時給出明確的錯誤訊息"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"{fmt} 格式需要安裝 pyarrow（pip install pyarrow），或改用 'csv' / 'npcol' 格式")
+
+
+def format_from_path(path):
+    """依副檔名判斷格式"""
+    ext = os.path.splitext(path.rstrip('/'))[1].lower()
+    for fmt, fmt_ext in FORMAT_EXTENSIONS.items():
+        if ext == fmt_ext:
+            return fmt
+    raise ValueError(f"無法判斷檔案格式: {path}")
+
+
+def with_format(path, fmt):
+    """將路徑的副檔名換成指定格式的副檔名"""
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"不支援的輸出格式: {fmt}")
+    return os.path.splitext(path.rstrip('/'))[0] + FORMAT_EXTENSIONS[fmt]
+
+
+def parse_format(text, default=DEFAULT_FORMAT):
+    """
+    解析使用者輸入的輸出格式（留空表示 default），並確認該格式需要的套件已安裝
+
+    Returns:
+        str: 格式名稱
+    """
+    fmt = text.strip().lower() or default
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"不支援的輸出格式: {fmt}（可用: {', '.join(FORMAT_EXTENSIONS)}）")
+    if fmt in ('parquet', 'feather'):
+        require_pyarrow(fmt)
+    return fmt
+
+
+def ask_format(default=DEFAULT_FORMAT):
+    """詢問輸出格式；輸入的格式無法使用時顯示警告並改用 default"""
+    text = input(f"請選擇輸出格式（{' / '.join(FORMAT_EXTENSIONS)}，預設為 {default}）: ")
+    try:
+        return parse_format(text, default)
+    except (ValueError, ImportError) as e:
+        print(f"⚠️  {e}，改用 {default} 格式")
+        return default
+
+
+def find_table(path):
+    """
+    找到實際存在的表格檔案；若指定路徑不存在，嘗試同名但不同格式的檔案
+
+    Returns:
+        str: 存在的檔案路徑，找不到時回傳 None
+    """
+    if os.path.exists(path):
+        return path
+    for fmt in FORMAT_EXTENSIONS:
+        candidate = with_format(path, fmt)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def write_npcol(df, path):
+    """
+    以 NumPy 原生格式將每個欄位寫成獨立的 .npy 檔案，並以 meta.json 記錄欄位與型別
+
+    字串欄位存為定長 unicode 陣列，缺失值另存為布林遮罩
+    """
+    tmp_path = path.rstrip('/') + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        file_name = f"c{i:04d}.npy"
+        entry = {'name': name, 'file': file_name, 'mask': None}
+        is_extension = isinstance(series.dtype, pd.api.extensions.ExtensionDtype)
+        if is_extension and pd.api.types.is_integer_dtype(series.dtype):
+            # 可為空的整數（Int64 等）存為原生整數陣列，缺失值另存為布林遮罩
+            mask = series.isna().to_numpy()
+            values = series.to_numpy(dtype=series.dtype.numpy_dtype, na_value=0)
+            if mask.any():
+                entry['mask'] = f"c{i:04d}.mask.npy"
+                np.save(os.path.join(tmp_path, entry['mask']), mask)
+            entry['kind'] = 'nullable'
+        elif is_extension and pd.api.types.is_numeric_dtype(series.dtype):
+            values = series.to_numpy(dtype='float64', na_value=np.nan)
+            entry['kind'] = 'native'
+        elif series.dtype == object:
+            mask = series.isna().to_numpy()
+            values = series.where(~mask, '').astype(str).to_numpy(dtype=str)
+            if mask.any():
+                entry['mask'] = f"c{i:04d}.mask.npy"
+                np.save(os.path.join(tmp_path, entry['mask']), mask)
+            entry['kind'] = 'str'
+        else:
+            values = series.to_numpy()
+            entry['kind'] = 'native'
+        entry['dtype'] = str(values.dtype)
+        np.save(os.path.join(tmp_path, file_name), values)
+        columns.append(entry)
+
+    with open(os.path.join(tmp_path, NPCOL_META), 'w', encoding='utf-8') as f:
+        json.dump({'rows': len(df), 'columns': columns}, f, ensure_ascii=False, indent=1)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def open_npcol(path, columns=None, mmap=False):
+    """
+    開啟 npcol 目錄中的欄位陣列（尚未轉換為 DataFrame），需要多次讀取不同列範圍時只開啟一次
+
+    Returns:
+        list: [(欄位記錄, 數值陣列, 缺失值遮罩或 None)]，依 columns 的順序（None 表示檔案中的順序）
+    """
+    with open(os.path.join(path, NPCOL_META), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    entries = {entry['name']: entry for entry in meta['columns']}
+    names = [entry['name'] for entry in meta['columns']] if columns is None else [
+        col for col in columns if col in entries]
+    mmap_mode = 'r' if mmap else None
+    arrays = []
+    for name in names:
+        entry = entries[name]
+        values = np.load(os.path.join(path, entry['file']), mmap_mode=mmap_mode)
+        mask = np.load(os.path.join(path, entry['mask']), mmap_mode=mmap_mode) if entry['mask'] else None
+        arrays.append((entry, values, mask))
+    return arrays
+
+
+def npcol_frame(arrays, rows=None):
+    """
+    將 open_npcol 開啟的欄位陣列組成 DataFrame
+
+    Args:
+        arrays (list): open_npcol 的回傳值
+        rows (slice): 只取這些列；陣列為記憶體映射時只有這些列會載入記憶體（None 表示全部）
+    """
+    data = {}
+    for entry, values, mask in arrays:
+        if rows is not None:
+            values = values[rows]
+            mask = mask[rows] if mask is not None else None
+        if entry['kind'] == 'str':
+            values = values.astype(object)
+            if mask is not None:
+                values[np.asarray(mask)] = None
+        elif entry['kind'] == 'nullable':
+            mask = np.array(mask) if mask is not None else np.zeros(len(values), dtype=bool)
+            values = pd.arrays.IntegerArray(np.array(values), mask)
+        data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def read_npcol(path, columns=None, mmap=False, rows=None):
+    """
+    讀取 npcol 目錄
+
+    Args:
+        path (str): npcol 目錄路徑
+        columns (list): 只讀取這些欄位（None 表示全部）
+        mmap (bool): 數值欄位是否以記憶體映射方式開啟（不複製資料）
+        rows (slice): 只讀取這些列；搭配 mmap 時只有這些列會載入記憶體（None 表示全部）
+    """
+    return npcol_frame(open_npcol(path, columns, mmap), rows)
+
+
+def save_table(df, path, fmt=None):
+    """
+    依格式儲存 DataFrame
+
+    Args:
+        df (pd.DataFrame): 要儲存的數據
+        path (str): 輸出路徑（fmt 指定時會替換副檔名）
+        fmt (str): 'csv'、'parquet'、'feather' 或 'npcol'（None 表示依副檔名判斷）
+
+    Returns:
+        str: 實際寫入的路徑
+    """
+    if fmt is not None:
+        path = with_format(path, fmt)
+    fmt = format_from_path(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        require_pyarrow(fmt)
+        df.to_parquet(path, index=False)
+    elif fmt == 'feather':
+        require_pyarrow(fmt)
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        write_npcol(df, path)
+    return path
+
+
+def table_columns(path):
+    """
+    只讀取表格的欄位名稱（CSV 標頭、npcol 的 meta.json 或 Parquet / Feather 的 schema），不讀取數據
+
+    Returns:
+        list: 欄位名稱
+    """
+    actual = find_table(path)
+    if actual is None:
+        raise FileNotFoundError(path)
+    fmt = format_from_path(actual)
+
+    if fmt == 'csv':
+        return list(pd.read_csv(actual, nrows=0).columns)
+    if fmt == 'parquet':
+        require_pyarrow(fmt)
+        import pyarrow.parquet
+        return list(pyarrow.parquet.read_schema(actual).names)
+    if fmt == 'feather':
+        require_pyarrow(fmt)
+        import pyarrow.ipc
+        with pyarrow.ipc.open_file(actual) as reader:
+            return list(reader.schema.names)
+    with open(os.path.join(actual, NPCOL_META), 'r', encoding='utf-8') as f:
+        return [entry['name'] for entry in json.load(f)['columns']]
+
+
+def load_table(path, columns=None, parse_dates=('date',)):
+    """
+    依副檔名讀取表格；指定路徑不存在時自動尋找同名的其他格式
+
+    Args:
+        path (str): 表格路徑
+        columns (list): 只讀取這些欄位（None 表示全部）
+        parse_dates (tuple): CSV 中要轉為日期的欄位（其他格式原生保存日期）
+
+    Returns:
+        pd.DataFrame: 讀取的數據
+    """
+    actual = find_table(path)
+    if actual is None:
+        raise FileNotFoundError(path)
+    fmt = format_from_path(actual)
+
+    if fmt == 'csv':
+        df = pd.read_csv(actual, usecols=columns)
+        for col in parse_dates:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col])
+        return df
+    if fmt == 'parquet':
+        require_pyarrow(fmt)
+        return pd.read_parquet(actual, columns=columns)
+    if fmt == 'feather':
+        require_pyarrow(fmt)
+        return pd.read_feather(actual, columns=columns)
+    return read_npcol(actual, columns)
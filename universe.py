@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多股票（universe）處理模組
+每檔股票的 payload 各自串流轉換後，依 symbol 分區寫入資料集目錄:
+
+    dataset_dir/symbol=<股票代碼>/<表格名稱>.<副檔名>
+    dataset_dir/symbol=<股票代碼>/year=<年份>/<表格名稱>.<副檔名>   （by_year 時的日資料表格）
+
+合併時以分區表格提供者讀入所有（或指定）股票的表格，由 merge_selected_data 以 (symbol, date) 一次完成
+分組的向量化合併，成本隨股票數量線性成長；合併結果也可依 symbol（與年份）分區寫出，各分區直接串接即為完整結果。
+讀取時依 symbols 與日期範圍裁剪分區，不在範圍內的股票與年份目錄不會被讀取
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from json_to_dataframe import process_all_data_streaming
+from merge_financial_data import AVAILABLE_TABLES, DAILY_TABLES_AVAILABLE, merge_selected_data
+from section_schema import is_daily_section
+from table_io import DEFAULT_FORMAT, FORMAT_EXTENSIONS, ask_format, load_table, save_table, table_columns
+
+PARTITION_PREFIX = 'symbol='
+YEAR_PREFIX = 'year='
+
+# 平行處理時由父程序合併各工作程序結果寫出的分區清單
+MANIFEST_FILE = 'manifest.json'
+
+# payload 檔案的副檔名，同一檔股票同時存在時優先使用快照
+PAYLOAD_EXTENSIONS = ('.snap', '.json')
+
+# 表格的追加分段檔名: <表格名稱>-part<序號>.<副檔名>（例如增量更新寫入的 merged-part00003.npcol）
+PART_MARKER = '-part'
+
+
+def partition_dir(dataset_dir, symbol):
+    """股票分區目錄的路徑"""
+    return os.path.join(dataset_dir, f"{PARTITION_PREFIX}{symbol}")
+
+
+def list_symbols(dataset_dir):
+    """列出資料集中所有股票分區的代碼（依代碼排序）"""
+    if not os.path.isdir(dataset_dir):
+        return []
+    return sorted(name[len(PARTITION_PREFIX):] for name in os.listdir(dataset_dir)
+                  if name.startswith(PARTITION_PREFIX) and os.path.isdir(os.path.join(dataset_dir, name)))
+
+
+def year_dir(directory, year):
+    """年份分區目錄的路徑"""
+    return os.path.join(directory, f"{YEAR_PREFIX}{year}")
+
+
+def list_years(directory):
+    """列出目錄下所有年份分區（依年份排序）"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[len(YEAR_PREFIX):]) for name in os.listdir(directory)
+                  if name.startswith(YEAR_PREFIX) and name[len(YEAR_PREFIX):].isdigit()
+                  and os.path.isdir(os.path.join(directory, name)))
+
+
+def in_date_range(dates, start=None, end=None):
+    """日期欄位是否落在 [start, end]（包含兩端，None 表示不限制）的布林 Series"""
+    dates = pd.to_datetime(dates)
+    mask = pd.Series(True, index=dates.index)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates <= pd.Timestamp(end)
+    return mask
+
+
+def part_name(name, number):
+    """表格第 number 個分段的檔名（不含副檔名），第 0 段即表格本身"""
+    return name if number == 0 else f"{name}{PART_MARKER}{number:05d}"
+
+
+def table_parts(directory, name):
+    """
+    列出目錄中某個表格的所有分段（表格本身與之後追加的分段），依序號排序；
+    同一分段有多種格式時與 find_table 相同，依 FORMAT_EXTENSIONS 的順序取第一個
+
+    Returns:
+        list: 分段檔案路徑
+    """
+    if not os.path.isdir(directory):
+        return []
+    extensions = list(FORMAT_EXTENSIONS.values())
+    prefix = name + PART_MARKER
+    parts = {}
+    for file_name in os.listdir(directory):
+        stem, ext = os.path.splitext(file_name)
+        if ext not in extensions:
+            continue
+        if stem == name:
+            number = 0
+        elif stem.startswith(prefix) and stem[len(prefix):].isdigit():
+            number = int(stem[len(prefix):])
+        else:
+            continue
+        if number not in parts or extensions.index(ext) < extensions.index(os.path.splitext(parts[number])[1]):
+            parts[number] = file_name
+    return [os.path.join(directory, parts[number]) for number in sorted(parts)]
+
+
+def table_files(symbol_dir, name, start=None, end=None):
+    """
+    列出一檔股票分區中某個表格的所有檔案
+
+    依年份分區的表格只列出與 [start, end] 重疊的年份目錄（分區裁剪），不在範圍內的年份目錄不會被讀取
+
+    Returns:
+        list: [(檔案路徑, 年份)]，未依年份分區的檔案年份為 None
+    """
+    first_year = pd.Timestamp(start).year if start is not None else None
+    last_year = pd.Timestamp(end).year if end is not None else None
+    files = [(path, None) for path in table_parts(symbol_dir, name)]
+    for year in list_years(symbol_dir):
+        if (first_year is not None and year < first_year) or (last_year is not None and year > last_year):
+            continue
+        files.extend((path, year) for path in table_parts(year_dir(symbol_dir, year), name))
+    return files
+
+
+def remove_table(symbol_dir, name):
+    """刪除股票分區中某個表格的所有檔案（包含各年份分區），避免改變分區方式後新舊檔案同時被讀取"""
+    for path, _ in table_files(symbol_dir, name):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def write_table_partitions(df, symbol_dir, name, fmt=DEFAULT_FORMAT, by_year=False):
+    """
+    將一檔股票的表格寫入其分區；by_year 時依 date 的年份寫入 year=<年份> 子目錄
+
+    Returns:
+        list: 寫入的路徑
+    """
+    remove_table(symbol_dir, name)
+    if not by_year:
+        return [save_table(df, os.path.join(symbol_dir, name), fmt)]
+    years = pd.to_datetime(df['date']).dt.year.to_numpy()
+    return [save_table(df.iloc[rows], os.path.join(year_dir(symbol_dir, year), name), fmt)
+            for year, rows in pd.Series(years).groupby(years, sort=True).indices.items()]
+
+
+def discover_payloads(payload_dir):
+    """
+    找出目錄中每檔股票的 payload（例如 get_json_data.fetch_many 以 output_dir 下載的 {symbol}.json）
+
+    Returns:
+        dict: {股票代碼: payload 路徑}
+    """
+    payloads = {}
+    for name in sorted(os.listdir(payload_dir)):
+        symbol, ext = os.path.splitext(name)
+        if ext not in PAYLOAD_EXTENSIONS:
+            continue
+        if symbol in payloads and PAYLOAD_EXTENSIONS.index(ext) > PAYLOAD_EXTENSIONS.index(
+                os.path.splitext(payloads[symbol])[1]):
+            continue
+        payloads[symbol] = os.path.join(payload_dir, name)
+    return payloads
+
+
+def convert_payload(symbol, payload_path, dataset_dir, fmt=DEFAULT_FORMAT, by_year=False):
+    """
+    轉換單一股票的 payload，並將每個區段寫入該股票的分區
+
+    by_year 時日資料區段（historicalPriceFull、tech*）再依年份分區；季度區段數據量小，
+    且 as-of 合併需要較早年份的公告，因此不依年份分區
+
+    Returns:
+        list: 寫入的表格路徑
+    """
+    tables = process_all_data_streaming(payload_path, symbol=symbol)
+    target_dir = partition_dir(dataset_dir, symbol)
+    written = []
+    for key, df in tables.items():
+        if df is not None and not df.empty:
+            written.extend(write_table_partitions(df, target_dir, key, fmt, by_year and is_daily_section(key)))
+    return written
+
+
+def convert_universe(payloads, dataset_dir, fmt=DEFAULT_FORMAT, by_year=False):
+    """
+    逐檔轉換多檔股票的 payload 為依 symbol 分區的資料集
+
+    Args:
+        payloads (dict): {股票代碼: payload 路徑}（JSON 或快照）
+        dataset_dir (str): 資料集目錄
+        fmt (str): 表格輸出格式
+        by_year (bool): 日資料表格是否再依年份分區
+
+    Returns:
+        dict: {股票代碼: 寫入的表格路徑列表}，轉換失敗的股票不會出現在結果中
+    """
+    converted = {}
+    for i, (symbol, payload_path) in enumerate(payloads.items(), 1):
+        try:
+            converted[symbol] = convert_payload(symbol, payload_path, dataset_dir, fmt, by_year)
+            print(f"[{i}/{len(payloads)}] {symbol}: 已寫入 {len(converted[symbol])} 個表格")
+        except Exception as e:
+            print(f"[{i}/{len(payloads)}] {symbol}: 轉換失敗 ({e})")
+    return converted
+
+
+class PartitionedTable:
+    """
+    跨股票分區的單一表格，作為 merge_selected_data 的提供者表格
+
+    columns 只讀取各分區的標頭；load(columns) 只讀取需要的欄位並依分區順序串接
+    （分區中有追加的分段時依序號一併讀取）。指定 start / end 時，依年份分區的表格只讀取範圍內的年份，
+    並篩選掉範圍外的列；未依年份分區的表格（例如季度數據）完整讀取
+    """
+
+    def __init__(self, dataset_dir, name, symbols, start=None, end=None):
+        self.dataset_dir = dataset_dir
+        self.name = name
+        self.symbols = list(symbols)
+        self.start = start
+        self.end = end
+        self.files = [entry for symbol in self.symbols
+                      for entry in table_files(partition_dir(dataset_dir, symbol), name, start, end)]
+        self.paths = [path for path, _ in self.files]
+
+    def template_path(self):
+        """裁剪後沒有任何檔案時，取得欄位名稱用的任一年份檔案（表格完全不存在時回傳 None）"""
+        for symbol in self.symbols:
+            files = table_files(partition_dir(self.dataset_dir, symbol), self.name)
+            if files:
+                return files[0][0]
+        return None
+
+    @property
+    def columns(self):
+        paths = self.paths or [path for path in [self.template_path()] if path]
+        if not paths:
+            raise FileNotFoundError(self.name)
+        columns = []
+        for path in paths:
+            columns.extend(col for col in table_columns(path) if col not in columns)
+        return columns
+
+    def load(self, columns=None):
+        if not self.files:
+            # 表格存在但範圍內沒有任何分區時回傳空表格
+            if self.template_path() is None:
+                raise FileNotFoundError(self.name)
+            return pd.DataFrame(columns=self.columns if columns is None else columns)
+        filtering = self.start is not None or self.end is not None
+        frames = []
+        for path, year in self.files:
+            available = table_columns(path)
+            wanted = available if columns is None else [col for col in columns if col in available]
+            filter_rows = filtering and year is not None and 'date' in available
+            read_columns = wanted if not filter_rows or 'date' in wanted else wanted + ['date']
+            df = load_table(path, columns=read_columns if columns is not None or filter_rows else None)
+            if filter_rows:
+                df = df[in_date_range(df['date'], self.start, self.end)][wanted]
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+
+class PartitionedTables:
+    """
+    依 symbol 分區資料集的表格提供者，get(表格名稱) 回傳 PartitionedTable
+
+    Args:
+        dataset_dir (str): 資料集目錄
+        symbols (list): 只使用這些股票（None 表示全部）
+        start, end: 日期範圍（包含兩端），依年份分區的表格只讀取範圍內的年份
+    """
+
+    def __init__(self, dataset_dir, symbols=None, start=None, end=None):
+        self.dataset_dir = dataset_dir
+        self.symbols = list(symbols) if symbols is not None else list_symbols(dataset_dir)
+        self.start = start
+        self.end = end
+
+    def get(self, name, default=None):
+        return PartitionedTable(self.dataset_dir, name, self.symbols, self.start, self.end)
+
+
+def write_symbol_partitions(df, output_dir, name, fmt=DEFAULT_FORMAT, by_year=False):
+    """
+    將 DataFrame 依 symbol 分區寫出（output_dir/symbol=<代碼>/<name>.<副檔名>），
+    by_year 時再依年份分區（output_dir/symbol=<代碼>/year=<年份>/<name>.<副檔名>）
+
+    Returns:
+        dict: {股票代碼: 寫入的路徑列表}
+    """
+    written = {}
+    for symbol, rows in df.groupby('symbol', sort=False).indices.items():
+        written[symbol] = write_table_partitions(df.iloc[rows], partition_dir(output_dir, symbol), name, fmt, by_year)
+    return written
+
+
+def read_symbol_partitions(output_dir, name, symbols=None, columns=None, start=None, end=None):
+    """
+    讀取並串接 write_symbol_partitions 寫出的分區
+
+    Args:
+        symbols (list): 只讀取這些股票（其他股票的分區不會被讀取）
+        columns (list): 只讀取這些欄位
+        start, end: 日期範圍（包含兩端）；依年份分區時範圍外的年份不會被讀取
+    """
+    symbols = symbols if symbols is not None else list_symbols(output_dir)
+    df = PartitionedTables(output_dir, symbols, start, end).get(name).load(columns)
+    if (start is not None or end is not None) and 'date' in df.columns:
+        df = df[in_date_range(df['date'], start, end)].reset_index(drop=True)
+    return df
+
+
+def merge_universe(dataset_dir, selected_tables, daily_tables=None, symbols=None, output_dir=None,
+                   fmt=DEFAULT_FORMAT, start=None, end=None, by_year=False, **merge_options):
+    """
+    對資料集中所有（或指定）股票一次執行分組的向量化合併
+
+    Args:
+        dataset_dir (str): convert_universe 產生的資料集目錄
+        selected_tables (list): 季度表格 (路徑, 名稱) 列表，依路徑的表格名稱從各分區讀取
+        daily_tables (list): 日資料表格 (路徑, 名稱) 列表
+        symbols (list): 只合併這些股票（None 表示全部）
+        output_dir (str): 若指定，合併結果依 symbol 分區寫出到此目錄（檔名 merged）
+        fmt (str): 分區輸出格式
+        start, end: 只合併此日期範圍（包含兩端）的交易日；日資料依年份分區時只讀取範圍內的年份，
+                    季度表格仍完整讀取（as-of 合併需要範圍之前的公告）
+        by_year (bool): 合併結果是否再依年份分區寫出
+        **merge_options: 傳給 merge_selected_data 的其他參數（quarterly_mode、max_staleness、columns）
+
+    Returns:
+        pd.DataFrame: 所有股票的合併結果
+    """
+    tables = PartitionedTables(dataset_dir, symbols, start, end)
+    print(f"合併 {len(tables.symbols)} 檔股票...")
+    result_df = merge_selected_data(selected_tables, daily_tables, historical_file='historicalPriceFull',
+                                    tables=tables, **merge_options)
+    if start is not None or end is not None:
+        # 未依年份分區的日資料無法裁剪，合併後再篩選一次
+        result_df = result_df[in_date_range(result_df['date'], start, end)].reset_index(drop=True)
+    if output_dir:
+        written = write_symbol_partitions(result_df, output_dir, 'merged', fmt, by_year)
+        print(f"已依 symbol 分區寫出 {len(written)} 檔股票的合併結果到: {output_dir}")
+    return result_df
+
+
+def shard_symbols(symbols, shard_count):
+    """將股票代碼依序輪流分配到 shard_count 個分片（各分片數量最多相差 1）"""
+    shards = [symbols[i::shard_count] for i in range(shard_count)]
+    return [shard for shard in shards if shard]
+
+
+def process_shard(shard_payloads, dataset_dir, output_dir, selected_tables, daily_tables, fmt, merge_options,
+                  by_year=False):
+    """
+    工作程序: 轉換並合併一個分片的股票，結果直接寫成分區檔案，只回傳精簡的分區清單
+
+    Returns:
+        dict: {'symbols': {股票代碼: {'paths', 'rows'}}, 'columns': 欄位列表, 'failed': 失敗的股票, 'seconds': 耗時}
+    """
+    start = time.perf_counter()
+    # 各工作程序的逐表進度訊息不輸出，避免多程序輸出交錯
+    with contextlib.redirect_stdout(io.StringIO()):
+        converted = convert_universe(shard_payloads, dataset_dir, fmt, by_year)
+        failed = [symbol for symbol in shard_payloads if symbol not in converted]
+        entries = {}
+        columns = []
+        if converted:
+            result_df = merge_universe(dataset_dir, selected_tables, daily_tables, symbols=list(converted),
+                                       **merge_options)
+            written = write_symbol_partitions(result_df, output_dir, 'merged', fmt, by_year)
+            counts = result_df['symbol'].value_counts()
+            entries = {symbol: {'paths': [os.path.relpath(path, output_dir) for path in paths],
+                                'rows': int(counts[symbol])}
+                       for symbol, paths in written.items()}
+            columns = list(result_df.columns)
+    return {'symbols': entries, 'columns': columns, 'failed': failed, 'seconds': time.perf_counter() - start}
+
+
+def write_manifest(output_dir, manifest):
+    """以暫存檔替換的方式寫入分區清單"""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(output_dir):
+    """讀取 run_universe_parallel 寫出的分區清單"""
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_universe_parallel(payloads, dataset_dir, output_dir, selected_tables, daily_tables=None, workers=None,
+                          shards_per_worker=4, fmt=DEFAULT_FORMAT, by_year=False, **merge_options):
+    """
+    以多個工作程序平行執行各股票的「轉換 → 合併」流程
+
+    每個工作程序處理一個股票分片，將轉換結果與合併結果直接寫成分區檔案，只回傳精簡的分區清單，
+    不會將整個 DataFrame 序列化傳回父程序；父程序最後將各分片的清單合併寫成 output_dir/manifest.json
+
+    Args:
+        payloads (dict): {股票代碼: payload 路徑}
+        dataset_dir (str): 轉換後的表格資料集目錄
+        output_dir (str): 合併結果的分區輸出目錄
+        selected_tables (list): 季度表格 (路徑, 名稱) 列表
+        daily_tables (list): 日資料表格 (路徑, 名稱) 列表
+        workers (int): 工作程序數量（None 表示 CPU 核心數）
+        shards_per_worker (int): 每個工作程序平均分到的分片數，分片越多負載越平均
+        fmt (str): 分區輸出格式
+        by_year (bool): 日資料表格與合併結果是否再依年份分區
+        **merge_options: 傳給 merge_selected_data 的其他參數
+
+    Returns:
+        dict: 分區清單 {'rows', 'columns', 'symbols', 'failed', 'workers'}
+    """
+    workers = workers or os.cpu_count() or 1
+    symbols = sorted(payloads)
+    shards = shard_symbols(symbols, max(1, min(len(symbols), workers * shards_per_worker)))
+    print(f"以 {workers} 個工作程序處理 {len(symbols)} 檔股票（{len(shards)} 個分片）...")
+
+    results = []
+    args = [(({symbol: payloads[symbol] for symbol in shard}), dataset_dir, output_dir,
+             selected_tables, daily_tables, fmt, merge_options, by_year) for shard in shards]
+    if workers == 1:
+        results = [process_shard(*shard_args) for shard_args in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process_shard, *shard_args): i for i, shard_args in enumerate(args)}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    shard = shards[futures[future]]
+                    print(f"分片 {shard[0]}... 處理失敗: {e}")
+                    results.append({'symbols': {}, 'columns': [], 'failed': shard, 'seconds': 0.0})
+
+    # 合併各分片的清單
+    manifest = {'rows': 0, 'columns': [], 'symbols': {}, 'failed': [], 'workers': workers}
+    for result in results:
+        manifest['symbols'].update(result['symbols'])
+        manifest['failed'].extend(result['failed'])
+        manifest['columns'].extend(col for col in result['columns'] if col not in manifest['columns'])
+    manifest['symbols'] = dict(sorted(manifest['symbols'].items()))
+    manifest['rows'] = sum(entry['rows'] for entry in manifest['symbols'].values())
+    manifest['failed'].sort()
+
+    os.makedirs(output_dir, exist_ok=True)
+    write_manifest(output_dir, manifest)
+    print(f"完成 {len(manifest['symbols'])} 檔股票，共 {manifest['rows']:,} 列"
+          + (f"，失敗 {len(manifest['failed'])} 檔: {', '.join(manifest['failed'])}" if manifest['failed'] else ""))
+    return manifest
+
+
+def main():
+    """
+    轉換 payload 目錄中所有股票並合併全部財務數據與技術指標
+    """
+    payload_dir = input("請輸入 payload 目錄（每檔股票一個 {symbol}.json）: ").strip()
+    dataset_dir = input("請輸入資料集輸出目錄（預設為 universe）: ").strip() or 'universe'
+
+    workers_input = input(f"平行處理的程序數（預設為 {os.cpu_count() or 1}）: ").strip()
+    fmt = ask_format()
+
+    payloads = discover_payloads(payload_dir)
+    if not payloads:
+        print(f"❌ {payload_dir} 中沒有 payload 檔案")
+        return
+    print(f"找到 {len(payloads)} 檔股票的 payload")
+
+    manifest = run_universe_parallel(payloads, os.path.join(dataset_dir, 'tables'),
+                                     os.path.join(dataset_dir, 'merged'), list(AVAILABLE_TABLES.values()),
+                                     list(DAILY_TABLES_AVAILABLE.values()),
+                                     workers=int(workers_input) if workers_input.isdigit() else None, fmt=fmt,
+                                     by_year=True)
+    print(f"最終數據維度: ({manifest['rows']}, {len(manifest['columns'])})")
+
+
+if __name__ == "__main__":
+    main()